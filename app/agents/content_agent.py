@@ -4,9 +4,11 @@
 """
 ContentAgent (전체 글 생성)
 - 공통 목표: test/use 모두 최종 스키마 동일 + case_id 업서트 + 날짜별 로그
-- 입력: input_result + plan + title
+- 입력: input_result + plan + title (PipelineContext 직접 전달 또는 최신 로그 파일)
 - 출력: content (전체 글)
 - 로그: test_logs/{mode}/{YYYYMMDD}/{YYYYMMDD_HHMMSS}_content_logs.json (배열 append)
+- 섹션 초안은 동시에 생성(draft_sections, 파이프라인 DAG에서는 draft:{section} 단계)하고
+  이모티콘 동물(case_id 시드)·이미지 dedup은 섹션 순서대로 확정 → 같은 입력이면 같은 결과
 """
 
 from __future__ import annotations
@@ -19,13 +21,18 @@ import shutil
 import pickle
 import hashlib
 import difflib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Dict, List, Tuple, Any
+from typing import Optional, Callable, Dict, List, Tuple, Any, TYPE_CHECKING
 
 import pandas as pd
 from dotenv import load_dotenv
-import google.generativeai as genai
+
+if TYPE_CHECKING:
+    from app.agents.pipeline_context import PipelineContext
+    from app.agents.reference_data import ReferenceData
 
 # =========================
 # 경로/시간 유틸 & JSON 헬퍼
@@ -134,53 +141,24 @@ def convert_legacy_case_to_new_schema(legacy_case: dict) -> dict:
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 from utils.html_converter import convert_content_to_html
+from app.agents import stage_cache
+from app.agents.prompt_registry import CompiledTemplate, compile_template, prompts
+from app.agents import prompt_context
+from app.agents.llm_client import LLM_BACKEND, GeminiClient
+from app.agents.image_index import image_index
+from app.utils.tracing import traced
 
 # =========================
 # 환경설정 / 모델
 # =========================
 load_dotenv()
 API_KEY = os.getenv("GEMINI_API_KEY")
-if not API_KEY:
+if not API_KEY and LLM_BACKEND != "replay":
     raise RuntimeError("GEMINI_API_KEY가 필요합니다(.env)")
-genai.configure(api_key=API_KEY)
-
-class GeminiClient:
-    def __init__(self, model="models/gemini-1.5-flash", temperature=0.65, max_output_tokens=4096):
-        self.model = model
-        self.temperature = temperature
-        self.max_output_tokens = max_output_tokens
-        self.max_retries = 3
-        self.retry_delay = 1.0
-
-    def generate(self, prompt: str, temperature: Optional[float] = None) -> str:
-        for attempt in range(self.max_retries):
-            try:
-                m = genai.GenerativeModel(self.model)
-                resp = m.generate_content(
-                    prompt,
-                    generation_config=genai.types.GenerationConfig(
-                        temperature=self.temperature if temperature is None else temperature,
-                        max_output_tokens=self.max_output_tokens,
-                        candidate_count=1,
-                        top_p=0.95,
-                        top_k=40,
-                    ),
-                )
-                if getattr(resp, "text", None):
-                    return resp.text
-                if getattr(resp, "candidates", None):
-                    parts = getattr(resp.candidates[0].content, "parts", [])
-                    if parts and getattr(parts[0], "text", ""):
-                        return parts[0].text
-                raise ValueError("응답에 text 없음")
-            except Exception as e:
-                if attempt == self.max_retries - 1:
-                    raise
-                print(f"⚠️ Gemini 호출 실패 (시도 {attempt+1}/{self.max_retries}): {e}")
-                time.sleep(self.retry_delay * (2 ** attempt))
-
-gem = GeminiClient()
+
+gem = GeminiClient(agent="content", task="content.section", temperature=0.65, max_output_tokens=4096)
 
 # =========================
 # 유틸 (시간/경로/로딩)
@@ -196,10 +174,6 @@ def _mtime(p: Path) -> float:
     try: return p.stat().st_mtime
     except Exception: return 0.0
 
-def _read(path: Path, default=""):
-    try: return path.read_text(encoding="utf-8")
-    except Exception: return default
-
 def _json_load(path: Path):
     return json.loads(path.read_text(encoding="utf-8"))
 
@@ -213,6 +187,7 @@ def _get(d: Dict[str, Any], path: str, default=None):
     return cur
 
 # 최신 input 탐색 (신규/구형 모두)
+@traced("file.scan")
 def _latest_input(mode: str) -> Tuple[Optional[Path], Optional[dict]]:
     day = Path(f"test_logs/{mode}/{_today()}")
     patterns = ["*_input_logs.json", "*_input_log.json"]
@@ -238,6 +213,7 @@ def _latest_input(mode: str) -> Tuple[Optional[Path], Optional[dict]]:
     if isinstance(data, dict): return p, data
     return None, None
 
+@traced("file.scan")
 def _latest_plan(mode: str) -> Optional[Path]:
     day = Path(f"test_logs/{mode}/{_today()}")
     hits = sorted(day.glob("*_plan.json"), key=_mtime, reverse=True)
@@ -247,6 +223,7 @@ def _latest_plan(mode: str) -> Optional[Path]:
     hits = sorted(root.rglob("*_plan.json"), key=_mtime, reverse=True)
     return hits[0] if hits else None
 
+@traced("file.scan")
 def _latest_title(mode: str) -> Optional[Path]:
     day = Path(f"test_logs/{mode}/{_today()}")
     hits = sorted(day.glob("*_title.json"), key=_mtime, reverse=True)
@@ -272,19 +249,6 @@ PROMPTS = {
 ### 디버그용 프롬프트 로딩
 print("프롬프트 로딩:", ", ".join(f"{k}={v.name}" for k, v in PROMPTS.items()))
 
-def _render_template(tpl: str, ctx_vars: Dict[str, Any]) -> str:
-    # 보호용: 이중 중괄호는 살림
-    L, R = "§§L§§", "§§R§§"
-    work = tpl.replace("{{", L).replace("}}", R)
-
-    # {변수}만 안전 치환
-    keys = list(ctx_vars.keys())
-    if keys:
-        pattern = re.compile(r"\{(" + "|".join(map(re.escape, keys)) + r")\}")
-        work = pattern.sub(lambda m: str(ctx_vars.get(m.group(1), "")), work)
-
-    return work.replace(L, "{{").replace(R, "}}")
-
 # =========================
 # JSON 파싱 & 텍스트 필터
 # =========================
@@ -339,6 +303,51 @@ def _improve_readability(text: str) -> str:
     
     return result.strip()
 
+# =========================
+# 스트리밍 미리보기 (완성된 문장까지만 후처리해 구독자에게 전달)
+# =========================
+CONTENT_STREAM_EMIT_INTERVAL_SEC = float(os.getenv("CONTENT_STREAM_EMIT_INTERVAL_SEC", "0.5"))
+# run()에서 직접 생성하는 섹션 초안 동시 호출 수 (1이면 순차)
+CONTENT_SECTION_CONCURRENCY = int(os.getenv("CONTENT_SECTION_CONCURRENCY", "7"))
+_SENTENCE_END_RE = re.compile(r"[.?!…](?=\s)|\n")
+
+def _completed_prefix(raw: str) -> str:
+    """마지막으로 끝난 문장(또는 줄)까지의 원문"""
+    last = None
+    for last in _SENTENCE_END_RE.finditer(raw):
+        pass
+    return raw[:last.end()] if last else ""
+
+def _preview_text(raw: str) -> str:
+    """완성된 문장에 정리/가독성 후처리 적용 (이모티콘 마커는 최종 확정 시 치환하므로 미리보기에서 제거)"""
+    done = _completed_prefix(raw)
+    if not done:
+        return ""
+    return _EMOTICON_MARK_RE.sub("", _improve_readability(_clean_output(done))).strip()
+
+def _section_stream_callback(on_partial: Callable[[str], None]) -> Callable[[str], None]:
+    """
+    LLM 스트림(누적 원문) → 미리보기 콜백
+    - 새 문장이 완성됐을 때만 후처리 (조각마다 재처리하지 않음)
+    - 첫 미리보기는 즉시, 이후는 CONTENT_STREAM_EMIT_INTERVAL_SEC 간격으로 전달
+    """
+    state = {"done_len": 0, "last_emit": 0.0, "last_text": ""}
+
+    def _on_text(raw: str) -> None:
+        done = _completed_prefix(raw)
+        if len(done) == state["done_len"]:
+            return
+        state["done_len"] = len(done)
+        now = time.monotonic()
+        if state["last_text"] and now - state["last_emit"] < CONTENT_STREAM_EMIT_INTERVAL_SEC:
+            return
+        text = _preview_text(done)
+        if text and text != state["last_text"]:
+            state["last_emit"], state["last_text"] = now, text
+            on_partial(text)
+
+    return _on_text
+
 def _strip_quotes(s: str) -> str:
     s = (s or "").strip()
     if len(s) >= 2 and ((s[0] == s[-1] == '"') or (s[0] == s[-1] == "'")):
@@ -350,9 +359,10 @@ import random
 GIF_DIR = Path("app/test_data/test_image/gif")
 
 _EMOTICON_MARK_RE = re.compile(r"\((행복|슬픔|신남|화남|일반|마무리)\)")
-# 게시글 단위로 동물 고정 & 풀 캐시
-_SESSION: Dict[str, Any] = {"animal": None, "pool": None}
+# GIF 풀 캐시 (프로세스 공용, 읽기 전용) — 동물/파일 선택은 글(case_id) 단위로 결정 (전역 상태 없음)
+_SESSION: Dict[str, Any] = {"pool": None}
 
+@traced("file.scan")
 def _scan_gif_pool() -> Dict[str, Dict[str, List[Path]]]:
     """
     pool[animal][category] = [Path, ...]
@@ -372,73 +382,85 @@ def _scan_gif_pool() -> Dict[str, Dict[str, List[Path]]]:
         animal = animal.strip()
         d = pool.setdefault(animal, {})
         d.setdefault(category, []).append(p)
+    for d in pool.values():
+        for files in d.values():
+            files.sort()  # glob 순서는 파일시스템 의존 → 같은 시드면 같은 파일
     return pool
 
-def _pick_animal_once(state: Dict[str, Any], pool: Dict[str, Dict[str, List[Path]]], preferred: Optional[str] = None) -> Optional[str]:
-    if state.get("chosen_animal"):
-        return state["chosen_animal"]
-    candidates = list(pool.keys())
-    if not candidates:
+def _article_seed(input_row: Dict[str, Any]) -> str:
+    """글 단위 시드 — case_id (없으면 병원 저장명)"""
+    return str(_get(input_row, "case_id", "") or _get(input_row, "hospital.save_name", "") or "")
+
+def _article_rng(seed: str, *salt: str) -> random.Random:
+    """글·섹션별 결정적 난수 (섹션을 어떤 순서/스레드에서 처리해도 같은 선택)"""
+    return random.Random(":".join((seed,) + salt))
+
+def article_animal(seed: str, pool: Dict[str, Dict[str, List[Path]]], preferred: Optional[str] = None) -> Optional[str]:
+    """글 단위 이모티콘 동물 — 선호 동물이 풀에 있으면 그것, 아니면 시드 해시로 1종 고정"""
+    if not pool:
         return None
-    if preferred and preferred in candidates:
-        state["chosen_animal"] = preferred
+    if preferred and preferred in pool:
         return preferred
-    # 랜덤 고정
-    animal = random.choice(candidates)
-    state["chosen_animal"] = animal
-    return animal
+    names = sorted(pool)
+    return names[int(hashlib.md5(seed.encode("utf-8")).hexdigest(), 16) % len(names)]
 
-def _pick_gif_by(animal: str, category: str, pool: Dict[str, Dict[str, List[Path]]]) -> Optional[Path]:
+def _pick_gif_by(animal: str, category: str, pool: Dict[str, Dict[str, List[Path]]],
+                 rng: Optional[random.Random] = None) -> Optional[Path]:
     cand = (pool.get(animal, {}) or {}).get(category, [])
     if not cand:
         return None
-    return random.choice(cand)
+    return (rng or random).choice(cand)
 
 def _gif_pool_cached() -> Dict[str, Dict[str, List[Path]]]:
     if _SESSION["pool"] is None:
         _SESSION["pool"] = _scan_gif_pool()
     return _SESSION["pool"]
 
-def _inject_emoticons_inline(text: str, sec_key: str) -> Tuple[str, List[Dict[str, str]]]:
+def emoticon_state(input_row: Dict[str, Any]) -> Dict[str, Any]:
+    """글 1건의 이모티콘 상태 — 동물은 시작 전에 결정, used는 섹션 순서대로 확정하며 갱신"""
+    seed = _article_seed(input_row)
+    return {"seed": seed, "animal": article_animal(seed, _gif_pool_cached()), "used": False}
+
+def _inject_emoticons_inline(text: str, sec_key: str, state: Dict[str, Any]) -> Tuple[str, List[Dict[str, str]]]:
     """
     (행복/슬픔/놀람/신남/화남/일반/마무리) 마커를 같은 동물 GIF로 치환.
-    - 섹션 1~6: 첫 마커에서 동물 랜덤 고정. 카테고리 없으면 '일반' 폴백 허용.
-    - 섹션 7: (마무리)만 처리, '마무리_동물*' 없거나 동물 미고정이면 삽입하지 않음.
+    - 동물은 글 단위로 고정(state["animal"], case_id 시드), GIF 파일 선택도 (case_id, 섹션) 시드로 결정
+    - 섹션 1~6: 카테고리 없으면 '일반' 폴백 허용. 마커가 나오면 state["used"] = True
+    - 섹션 7: (마무리)만 처리, '마무리_동물*' 없거나 앞 섹션에 마커가 없었으면 삽입하지 않음.
     """
     if not text:
         return text, []
 
     pool = _gif_pool_cached()
+    rng = _article_rng(state.get("seed", ""), "emoticon", sec_key)
     images_log: List[Dict[str, str]] = []
 
     def repl(m: re.Match) -> str:
         tag = m.group(1)
+        animal = state.get("animal")
 
         # 섹션7 전용 규칙
         if sec_key == "7_conclusion":
             if tag != "마무리":
                 return ""  # 다른 마커는 제거
-            animal = _SESSION.get("animal")
-            if not animal:
+            if not animal or not state.get("used"):
                 return ""  # 앞 섹션에서 동물 확정 안 됨 → 삽입 안 함
-            media = _pick_gif_by(animal, "마무리", pool)
+            media = _pick_gif_by(animal, "마무리", pool, rng)
             if not media:
                 return ""  # 마무리_동물 파일 없음 → 삽입 안 함
             alt = f"마무리 {animal} 이모티콘"
             images_log.append({"filename": media.name, "path": str(media), "alt": alt, "position": "inline"})
             return f"({str(media)})"
 
-        # 섹션 1~6: 동물 없으면 지금 랜덤 고정
-        animal = _SESSION.get("animal")
+        # 섹션 1~6
         if not animal:
-            if not pool:
-                return ""  # 풀 비어있으면 제거
-            animal = random.choice(list(pool.keys()))
-            _SESSION["animal"] = animal
+            return ""  # 풀 비어있으면 제거
+        state["used"] = True
 
         # 카테고리 선택: '마무리' 마커가 1~6에 오면 '일반'로 처리
         desired = "일반" if tag == "마무리" else tag
-        media = _pick_gif_by(animal, desired, pool) or (None if desired == "일반" else _pick_gif_by(animal, "일반", pool))
+        media = (_pick_gif_by(animal, desired, pool, rng)
+                 or (None if desired == "일반" else _pick_gif_by(animal, "일반", pool, rng)))
         if not media:
             return ""  # 해당/일반 모두 없으면 제거
 
@@ -459,21 +481,21 @@ def _norm_path(p: str) -> str:  # [NEW]
     p = re.sub(r"[?#].*$", "", p)  # 쿼리/프래그먼트 제거
     return p.lower()
 
-def _file_hash_safe(p: str) -> Optional[str]:  # [NEW]
+# 근사 이미지(dHash) 병합을 적용하지 않는 섹션 — 같은 구도로 찍은 치료 전/후 사진이 한 장으로 합쳐지지 않도록
+_EXACT_DEDUP_SECTIONS = {"7_conclusion"}
+
+def _dedup_keys_for_image(im: Dict[str, str]) -> Tuple[str, Optional[str]]:  # [NEW]
     """
-    동일 파일이 경로만 다른 복사본일 수 있어, 해시를 우선 키로 사용(선택).
-    실패 시 None 반환하여 경로 기반으로 대체.
+    (정확 키, 근사 키) — 동일 파일이 경로만 다른 복사본일 수 있어 지문(image_index)을 우선 키로 사용.
+    (경로·크기·mtime 기준 영속 인덱스 — 바뀌지 않은 파일은 다시 읽지 않음)
+    근사 키는 dHash 그룹 (IMAGE_DHASH_MAX_DISTANCE > 0 이고 Pillow가 있을 때만 정확 키와 다를 수 있음).
+    실패 시 경로 기반으로 대체 (근사 키 없음).
     """
-    try:
-        with open(p, "rb") as f:
-            return hashlib.md5(f.read()).hexdigest()
-    except Exception:
-        return None
-
-def _dedup_key_for_image(im: Dict[str, str]) -> str:  # [NEW]
-    path = _norm_path(im.get("path", ""))
-    h = _file_hash_safe(path)
-    return f"hash:{h}" if h else f"path:{path}"
+    raw = re.sub(r"[?#].*$", "", (im.get("path") or "").strip())
+    fp = image_index.fingerprint(raw) if raw else None
+    if not fp:
+        return f"path:{_norm_path(raw)}", None
+    return f"hash:{fp['md5']}", f"near:{fp['group']}"
 
 def _limit_for_section(sec_key: str) -> int:  # [NEW]
     return {
@@ -515,7 +537,7 @@ def _dedup_and_limit_images(section_key: str,
                             used_keys: set) -> List[Dict[str, str]]:  # [NEW]
     """
     - inline 이미지는 렌더 대상 아님 → 배열에서 제외(로그는 별개)
-    - 전역 dedup(해시 우선, 실패 시 경로)
+    - 전역 dedup(파일 지문 우선, 실패 시 경로 · 근사 이미지 병합은 Q7 제외)
     - 섹션별 상한 적용
     - Q7은 전/후 페어링 정렬
     """
@@ -531,10 +553,14 @@ def _dedup_and_limit_images(section_key: str,
             p = f"test_data/test_image/{im['filename']}"
             im["path"] = p
 
-        key = _dedup_key_for_image(im)
-        if key in used_keys:
+        exact, near = _dedup_keys_for_image(im)
+        if exact in used_keys:
+            continue
+        if near and section_key not in _EXACT_DEDUP_SECTIONS and near in used_keys:
             continue
-        used_keys.add(key)
+        used_keys.add(exact)
+        if near:
+            used_keys.add(near)
         unique.append(im)
 
     # 2) Q7 페어링
@@ -551,19 +577,23 @@ def _dedup_and_limit_images(section_key: str,
 # =========================
 # 이미지 바인딩 해석
 # =========================
-def _resolve_images_for_section(plan_sec: Dict[str, Any], input_row: Dict[str, Any]) -> List[Dict[str, str]]:
+def _resolve_images_for_section(plan_sec: Dict[str, Any], input_row: Dict[str, Any],
+                                sec_key: str = "") -> List[Dict[str, str]]:
     """
     확장 사항:
     - 배열 소스에 random 선택 지원: image_binding 항목에 "random": true
     - GIF 자동 선택 지원:
         * image_binding 항목에 {"from":"gif_pool", "category":"행복", "position":"bottom", "animal":"토끼"} 등
         * category 미지정 시 ["일반"] 시도, 섹션7(마무리)는 plan에서 category="마무리" 주길 권장
-        * animal 미지정 시 글 단위로 랜덤 1종 고정
+        * animal 미지정 시 글 단위로 1종 고정 (case_id 시드 — article_animal)
+    - random/GIF 선택은 (case_id, 섹션) 시드로 결정 → 섹션 처리 순서와 무관하게 같은 결과
         * 여러 후보 카테고리를 시도하려면 "category_try": ["행복","일반"] 사용
     - 기존 동작(명함/hospital.business_card, question*_images 배열)은 그대로 유지
     """
     binds = plan_sec.get("image_binding") or []
     out: List[Dict[str, str]] = []
+    seed = _article_seed(input_row)
+    rng = _article_rng(seed, "images", sec_key)
 
     for b in binds:
         src = b.get("from", "")
@@ -572,13 +602,11 @@ def _resolve_images_for_section(plan_sec: Dict[str, Any], input_row: Dict[str, A
 
         # 1) GIF 풀에서 선택 (감정/일반/마무리 등)
         if src == "gif_pool":
-            # 풀 캐시 확보
-            pool = _SESSION.get("pool") or _scan_gif_pool()
-            _SESSION["pool"] = pool
+            pool = _gif_pool_cached()
 
-            # 동물 한 번 고정 (선호 동물이 오면 그걸 우선)
+            # 글 단위 동물 (선호 동물이 오면 그걸 우선)
             preferred_animal = b.get("animal")  # 예: "토끼" / "햄스터" 등
-            animal = _pick_animal_once(_SESSION, pool, preferred=preferred_animal)
+            animal = article_animal(seed, pool, preferred=preferred_animal)
             if animal:
                 # 카테고리 후보: category_try > category > 기본 ["일반"]
                 cat_try = b.get("category_try") or []
@@ -588,7 +616,7 @@ def _resolve_images_for_section(plan_sec: Dict[str, Any], input_row: Dict[str, A
 
                 picked = None
                 for cat in cat_try:
-                    picked = _pick_gif_by(animal, cat, pool)  # ← 함수명 교정
+                    picked = _pick_gif_by(animal, cat, pool, rng)
                     if picked:
                         break
 
@@ -624,7 +652,7 @@ def _resolve_images_for_section(plan_sec: Dict[str, Any], input_row: Dict[str, A
         # 랜덤 옵션: {"random": true}
         is_random = bool(b.get("random", False))
         sliced_arr = arr[start_idx:end_idx] if not is_random else arr[start_idx:]
-        chosen = (random.sample(sliced_arr, min(limit, len(sliced_arr))) if is_random else sliced_arr)
+        chosen = (rng.sample(sliced_arr, min(limit, len(sliced_arr))) if is_random else sliced_arr)
 
         for it in chosen:
             fn = it.get("filename", "")
@@ -682,11 +710,41 @@ def _build_ctx_vars(plan: Dict[str, Any], input_row: Dict[str, Any], title_obj:
 
     }
 
-def _build_section_prompt(sec_key: str, sec_plan: Dict[str, Any], base_ctx: Dict[str, Any]) -> str:
-    # 외부 프롬프트 + 컨텍스트(JSON) + 섹션 가이드(요약/금지/필수)
+# 섹션 CONTEXT(JSON)에 항상 넣는 환자/치료 필드 — 질문 답변은 섹션과 무관하게 모두 유지
+# (병원명·지역 등 나머지 필드는 섹션 템플릿이 {변수} 슬롯으로 참조할 때만)
+SECTION_CONTEXT_FIELDS = (
+    "category", "selected_symptom", "selected_procedure", "selected_treatment", "tooth_numbers",
+    "question1_concept", "question2_condition", "question4_treatment", "question6_result", "question8_extra",
+    "representative_persona", "region_phrase",
+)
+
+def _section_context(base_ctx: Dict[str, Any], slots) -> Dict[str, Any]:
+    """환자/치료 필드 + 섹션 템플릿 슬롯만 남긴 CONTEXT (빈 값·중복 필드 제거)"""
+    fields = list(SECTION_CONTEXT_FIELDS) + sorted(s for s in slots if s in base_ctx)
+    return prompt_context.compact(base_ctx, fields)
+
+def _section_template(sec_key: str, reference: Optional["ReferenceData"] = None) -> CompiledTemplate:
+    """컴파일된 섹션 프롬프트 — 파일은 prompts 레지스트리에서 수정 시에만 다시 읽음 (참조 데이터가 있으면 그 원문)"""
     p_path = PROMPTS.get(sec_key)
-    prompt_txt = _read(p_path, default=f"[{sec_key}]에 대한 본문을 한국어로 작성하세요.")
-    prompt_txt = _render_template(prompt_txt, base_ctx)
+    default_txt = f"[{sec_key}]에 대한 본문을 한국어로 작성하세요."
+    if not p_path:
+        return compile_template(default_txt)
+    if reference is not None:
+        return compile_template(reference.prompt(p_path, default=default_txt))
+    return prompts.get(p_path, default=default_txt)
+
+def section_needs_title(sec_key: str, reference: Optional["ReferenceData"] = None) -> bool:
+    """섹션 프롬프트가 {title}을 참조하는지 — 아니면 제목 확정 전에 초안 생성 가능"""
+    return "title" in _section_template(sec_key, reference).slots
+
+def _build_section_prompt(sec_key: str, sec_plan: Dict[str, Any], base_ctx: Dict[str, Any],
+                          reference: Optional["ReferenceData"] = None) -> str:
+    # 외부 프롬프트 + 컨텍스트(JSON) + 섹션 가이드(요약/금지/필수)
+    template = _section_template(sec_key, reference)
+    needs_title = "title" in template.slots
+    prompt_txt = template.render(base_ctx)
+    # 제목을 참조하지 않는 섹션은 CONTEXT에서 title 제외 → 제목과 무관한 동일 프롬프트(선행 초안/캐시 키 일치)
+    sec_ctx = base_ctx if needs_title else {k: v for k, v in base_ctx.items() if k != "title"}
 
     guide = {
         "section_key": sec_key,
@@ -709,7 +767,15 @@ def _build_section_prompt(sec_key: str, sec_plan: Dict[str, Any], base_ctx: Dict
       "You are a Korean medical blog writer. Follow all rules. "
       "Return PLAIN TEXT only (no JSON, no backticks)."
     )
-    final = f"{sys_dir}\n\nINSTRUCTION\n{prompt_txt}\n\nCONTEXT(JSON)\n{json.dumps(base_ctx, ensure_ascii=False, indent=2)}\n\nSECTION_GUIDE(JSON)\n{json.dumps(guide, ensure_ascii=False, indent=2)}\n\nWrite the section now:"
+    full = f"{sys_dir}\n\nINSTRUCTION\n{prompt_txt}\n\nCONTEXT(JSON)\n{json.dumps(sec_ctx, ensure_ascii=False, indent=2)}\n\nSECTION_GUIDE(JSON)\n{json.dumps(guide, ensure_ascii=False, indent=2)}\n\nWrite the section now:"
+    if not prompt_context.PROMPT_CONTEXT_COMPACT:
+        return full
+
+    # 압축: 환자/치료 필드 + 템플릿 슬롯 · 빈 값/중복 제거 · 들여쓰기 없는 JSON
+    ctx_json = prompt_context.dumps(_section_context(sec_ctx, template.slots))
+    guide_json = prompt_context.dumps(prompt_context.prune(guide))
+    final = f"{sys_dir}\n\nINSTRUCTION\n{prompt_txt}\n\nCONTEXT(JSON)\n{ctx_json}\n\nSECTION_GUIDE(JSON)\n{guide_json}\n\nWrite the section now:"
+    prompt_context.report(f"content.{sec_key}", full, final)
     return final
 
 # =========================
@@ -788,12 +854,11 @@ def _save_json(mode: str, name: str, payload: dict) -> Path:
 # =========================
 # 실행
 # =========================
-def run(mode: str = DEF_MODE,
-        input_path: Optional[str|Path] = None,
-        plan_path: Optional[str|Path] = None,
-        title_path: Optional[str|Path] = None) -> Dict[str, Any]:
-
-    # 1) 입력 수집
+def _load_inputs_from_files(mode: str,
+                            input_path: Optional[str|Path],
+                            plan_path: Optional[str|Path],
+                            title_path: Optional[str|Path]):
+    """CLI 단독 실행용: 경로 지정 또는 최신 로그 파일 탐색"""
     if input_path:
         inp_path = Path(input_path); inp_row = _json_load(inp_path)
         if isinstance(inp_row, list) and inp_row: inp_row = inp_row[-1]
@@ -818,28 +883,134 @@ def run(mode: str = DEF_MODE,
         if not t: raise FileNotFoundError("최신 *_title.json을 찾지 못했습니다. 먼저 TitleAgent를 실행하세요.")
         title_obj = _json_load(t); title_src = str(t)
 
+    return inp_row, inp_src, plan, plan_src, title_obj, title_src
+
+DEFAULT_SECTIONS_ORDER = ["1_intro","2_visit","3_inspection","4_doctor_tip","5_treatment","6_check_point","7_conclusion"]
+
+def sections_order(plan: Dict[str, Any]) -> List[str]:
+    return _get(plan, "content_plan.sections_order", []) or DEFAULT_SECTIONS_ORDER
+
+def draft_section(sec_key: str, plan: Dict[str, Any], inp_row: Dict[str, Any],
+                  title_obj: Optional[Dict[str, Any]] = None,
+                  reference: Optional["ReferenceData"] = None,
+                  force: bool = False,
+                  on_partial: Optional[Callable[[str], None]] = None) -> Dict[str, str]:
+    """
+    섹션 초안(LLM 원문) 생성 — 정리/이모티콘/이미지 확정은 run()에서 섹션 순서대로 수행
+    - 제목을 참조하지 않는 섹션은 title_obj 없이 호출 가능 (파이프라인 DAG에서 제목 생성과 병행)
+    - on_partial 지정 시 스트리밍 호출: 완성된 문장까지 후처리한 미리보기 text를 전달
+    """
+    sec_plan = (_get(plan, "content_plan.sections", {}) or {}).get(sec_key, {})
+    base_ctx = _build_ctx_vars(plan, inp_row, title_obj or {})
+    prompt = _build_section_prompt(sec_key, sec_plan, base_ctx, reference=reference)
+    # 단계 캐시: 섹션별 렌더링 프롬프트(템플릿 원문 포함) + 모델 설정
+    cache_key = stage_cache.make_key(
+        "content",
+        section=sec_key,
+        prompt=prompt,
+        model=gem.model,
+        temperature=gem.temperature,
+        max_output_tokens=gem.output_limit(),
+    )
+    raw = stage_cache.get("content", cache_key, force=force)
+    if raw is None:
+        attrs = {"section": sec_key, "prompt_file": PROMPTS[sec_key].name if sec_key in PROMPTS else None}
+        if on_partial is not None:
+            raw = gem.stream(prompt, _section_stream_callback(on_partial), **attrs)
+        else:
+            raw = gem.generate(prompt, **attrs)
+        if raw.strip():
+            stage_cache.put("content", cache_key, raw)
+    elif on_partial is not None:
+        on_partial(_preview_text(raw + "\n"))
+    return {"prompt": prompt, "raw": raw, "prompt_version": _section_template(sec_key, reference).version}
+
+def draft_sections(keys: List[str], plan: Dict[str, Any], inp_row: Dict[str, Any],
+                   title_obj: Optional[Dict[str, Any]] = None,
+                   reference: Optional["ReferenceData"] = None,
+                   force: bool = False,
+                   ctx: Optional["PipelineContext"] = None) -> Dict[str, Dict[str, str]]:
+    """
+    여러 섹션 초안을 동시에 생성 (CONTENT_SECTION_CONCURRENCY개씩) — 섹션 지연 합 → 최댓값
+    - 섹션 간 공유 상태(이모티콘 동물, 이미지 dedup)는 초안에 없고 run()에서 순서대로 확정
+    - 한 섹션이라도 실패하면 예외 전파 (순차 생성과 동일)
+    """
+    def _one(k: str) -> Dict[str, str]:
+        return draft_section(
+            k, plan, inp_row, title_obj, reference=reference, force=force,
+            on_partial=section_partial_emitter(ctx, k) if ctx is not None and ctx.stream else None,
+        )
+
+    workers = max(1, min(CONTENT_SECTION_CONCURRENCY, len(keys)))
+    if workers == 1:
+        return {k: _one(k) for k in keys}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="content-section") as pool:
+        # 호출 스레드 컨텍스트(trace span, 모델 티어 덮어쓰기, 마감 시간, LLM 사용량 집계)를 섹션별로 복사
+        futures = {k: pool.submit(contextvars.copy_context().run, _one, k) for k in keys}
+        return {k: fut.result() for k, fut in futures.items()}
+
+def section_partial_emitter(ctx: "PipelineContext", sec_key: str) -> Callable[[str], None]:
+    """섹션 미리보기 → section_partial 이벤트"""
+    return lambda text: ctx.emit("section_partial", {"section": sec_key, "text": text})
+
+def resolve_section_images(plan: Dict[str, Any], inp_row: Dict[str, Any]) -> Dict[str, List[Dict[str, str]]]:
+    """섹션별 후보 이미지(image_binding) 해석 — 제목과 무관"""
+    sections_plan: Dict[str, Any] = _get(plan, "content_plan.sections", {}) or {}
+    return {k: _resolve_images_for_section(sections_plan.get(k, {}), inp_row, k) for k in sections_order(plan)}
+
+def run(mode: str = DEF_MODE,
+        input_path: Optional[str|Path] = None,
+        plan_path: Optional[str|Path] = None,
+        title_path: Optional[str|Path] = None,
+        ctx: Optional["PipelineContext"] = None) -> Dict[str, Any]:
+
+    persist, force = True, False
+    # 1) 입력 수집 — PipelineContext가 있으면 파일 탐색 없이 그대로 사용
+    if ctx is not None:
+        ctx.require("input_row", "plan", "title")
+        mode, persist, force = ctx.mode, ctx.persist, ctx.force
+        inp_row, plan, title_obj = ctx.input_row, ctx.plan, ctx.title
+        inp_src = plan_src = title_src = "(pipeline context)"
+    else:
+        inp_row, inp_src, plan, plan_src, title_obj, title_src = _load_inputs_from_files(
+            mode, input_path, plan_path, title_path
+        )
+
     # 2) 컨텍스트 준비
     base_ctx = _build_ctx_vars(plan, inp_row, title_obj)
-    order = _get(plan, "content_plan.sections_order", []) or ["1_intro","2_visit","3_inspection","4_doctor_tip","5_treatment","6_check_point","7_conclusion"]
+    order = sections_order(plan)
     sections_plan: Dict[str, Any] = _get(plan, "content_plan.sections", {}) or {}
+    reference = ctx.reference if ctx is not None else None
+    # 파이프라인 DAG에서 미리 생성된 섹션 초안/후보 이미지 (없으면 여기서 생성)
+    drafts = ctx.section_drafts if ctx is not None else {}
+    section_images = ctx.section_images if ctx is not None else None
+
+    # 3) 섹션 초안 동시 생성(미리 생성되지 않은 섹션만) → 순서대로 확정(정리/이모티콘/이미지 dedup)
+    missing = [k for k in order if not drafts.get(k)]
+    if missing:
+        drafts = {**drafts, **draft_sections(missing, plan, inp_row, title_obj, reference=reference,
+                                             force=force, ctx=ctx)}
 
-    # 3) 섹션별 생성
     sections_out: Dict[str, Dict[str, Any]] = {}
     log_detail: Dict[str, Any] = {"sections": {}}
 
-    used_image_keys: set = set()  # [NEW] 전역 dedup 키 저장소
+    used_image_keys: set = set()  # [NEW] 전역 dedup 키 저장소 — 섹션 순서대로 확정하므로 결과가 결정적
+    emoticons = emoticon_state(inp_row)  # 글 단위 동물 (case_id 시드)
 
-    for k in order:
+    for idx, k in enumerate(order, 1):
         sec_plan = sections_plan.get(k, {})
-        prompt = _build_section_prompt(k, sec_plan, base_ctx)
-        raw = gem.generate(prompt)
+        draft = drafts[k]
+        prompt, raw = draft["prompt"], draft["raw"]
         text = _clean_output(raw)
         text = _improve_readability(text)  # ← 추가
         # ✅ 이모티콘 마커 치환을 섹션별로 적용
-        text, emoticon_imgs = _inject_emoticons_inline(text, k)
+        text, emoticon_imgs = _inject_emoticons_inline(text, k, emoticons)
 
         # 후보 이미지 수집
-        images = _resolve_images_for_section(sec_plan, inp_row)
+        if section_images is not None and k in section_images:
+            images = list(section_images[k])
+        else:
+            images = _resolve_images_for_section(sec_plan, inp_row, k)
 
         # 로그용 inline도 합치되, 렌더 중복 방지를 위해 dedup 단계에서 inline 제거
         if emoticon_imgs:
@@ -855,11 +1026,19 @@ def run(mode: str = DEF_MODE,
         }
         log_detail["sections"][k] = {
             "prompt_path": str(PROMPTS.get(k, "")),
+            "prompt_version": draft.get("prompt_version", ""),
             "prompt_rendered_preview": prompt[:1200],
             "llm_raw_preview": raw[:1200],
             "used_summary": sec_plan.get("summary", ""),
             "resolved_images": images,
         }
+        if ctx is not None:
+            ctx.emit("section_done", {
+                "section": k,
+                "index": idx,
+                "total": len(order),
+                **sections_out[k],
+            })
 
     # 4) 최종 조립 → 복붙용 문자열 생성
     md = _assemble_markdown(sections_out)
@@ -872,7 +1051,7 @@ def run(mode: str = DEF_MODE,
             "timestamp": _now(),
             "model": gem.model,
             "temperature": gem.temperature,
-            "max_output_tokens": gem.max_output_tokens,
+            "max_output_tokens": gem.output_limit(),
             "plan_source": plan_src,
             "input_source": inp_src,
             "title_source": title_src,
@@ -882,6 +1061,11 @@ def run(mode: str = DEF_MODE,
         "sections": sections_out,
         "assembled_markdown": title_content_result,  # ✅ 복붙용 문자열로 교체
     }
+    if ctx is not None:
+        ctx.content = result
+    if not persist:
+        return result
+
     out_path = _save_json(mode, "content", result)
     # HTML 버전 저장
     html_path = convert_content_to_html(out_path)
@@ -912,6 +1096,8 @@ def run(mode: str = DEF_MODE,
     print(f"✅ Content 저장: {out_path}")
     print(f"🧾 로그 저장: {log_path}")
     print(f"📝 복붙용 TXT 저장: {txt_path}")
+    if ctx is not None:
+        ctx.artifacts["content"] = str(out_path)
     return result
 
 def format_full_article(content, input_data):
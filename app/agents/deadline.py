@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Deadline (요청 단위 마감 시간 전파)
+- scope(budget_sec): 이 컨텍스트의 마감 시간 설정 (contextvar — copy_context로 단계 스레드/LLM 호출까지 전달)
+    * 중첩 시 더 이른 마감 시간 유지 (배치 전체 마감 안의 건별 마감 등)
+- 각 단계는 남은 시간을 보고 더 빠른 경로를 선택
+    * remaining < DEADLINE_DEGRADE_SEC  : 모든 작업 lite 티어(model_router) · 제목 후보 호출 축소
+    * remaining < DEADLINE_FALLBACK_SEC : plan 코드 기반 fallback · 제목 선택 LLM 생략(첫 후보)
+    * 만료 후 새 단계/LLM 시도는 DeadlineExceeded — 게이트웨이 타임아웃 전에 실패를 반환
+- LLM/Airtable 호출 타임아웃은 timeout(기본값) = min(기본값, 남은 시간) (최소 DEADLINE_MIN_CALL_SEC)
+- 어떤 단계가 무엇을 줄였는지는 Deadline.degraded 에 기록 (응답의 deadline 필드)
+- 환경변수: DEADLINE_DEGRADE_SEC(기본 120), DEADLINE_FALLBACK_SEC(기본 45), DEADLINE_MIN_CALL_SEC(기본 5)
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+DEADLINE_DEGRADE_SEC = float(os.getenv("DEADLINE_DEGRADE_SEC", "120"))
+DEADLINE_FALLBACK_SEC = float(os.getenv("DEADLINE_FALLBACK_SEC", "45"))
+DEADLINE_MIN_CALL_SEC = float(os.getenv("DEADLINE_MIN_CALL_SEC", "5"))
+
+
+class DeadlineExceeded(TimeoutError):
+    """요청 마감 시간 초과 — 남은 단계를 시작하지 않음"""
+
+
+class Deadline:
+    def __init__(self, budget_sec: float):
+        self.budget_sec = float(budget_sec)
+        self.expires_at = time.monotonic() + self.budget_sec
+        self.degraded: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def short(self, threshold_sec: float) -> bool:
+        return self.remaining() < threshold_sec
+
+    def note(self, stage: str, action: str) -> None:
+        """단계별 축소 내역 기록 (단계당 첫 기록만)"""
+        with self._lock:
+            if stage in self.degraded:
+                return
+            self.degraded[stage] = action
+        print(f"⏳ 마감 임박({self.remaining():.0f}s 남음) — {stage}: {action}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            degraded = dict(self.degraded)
+        return {"budgetSec": self.budget_sec, "remainingSec": round(self.remaining(), 2), "degraded": degraded}
+
+
+_current: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+@contextmanager
+def scope(budget_sec: Optional[float]):
+    """마감 시간 설정 (budget_sec가 없거나 0 이하면 기존 마감 유지) — 적용된 Deadline(또는 None) 반환"""
+    cur = _current.get()
+    if not budget_sec or budget_sec <= 0:
+        yield cur
+        return
+    new = Deadline(budget_sec)
+    dl = cur if cur is not None and cur.expires_at <= new.expires_at else new
+    token = _current.set(dl)
+    try:
+        yield dl
+    finally:
+        _current.reset(token)
+
+
+def current() -> Optional[Deadline]:
+    return _current.get()
+
+
+def remaining() -> Optional[float]:
+    dl = _current.get()
+    return dl.remaining() if dl is not None else None
+
+
+def timeout(default: Optional[float]) -> Optional[float]:
+    """호출 타임아웃 — 마감이 없으면 default, 있으면 남은 시간으로 제한 (default=None이면 남은 시간)"""
+    dl = _current.get()
+    if dl is None:
+        return default
+    left = max(dl.remaining(), DEADLINE_MIN_CALL_SEC)
+    return left if default is None else min(default, left)
+
+
+def check(stage: str) -> None:
+    dl = _current.get()
+    if dl is not None and dl.expired:
+        raise DeadlineExceeded(f"요청 마감 시간 초과 ({stage}, 예산 {dl.budget_sec:.0f}s)")
+
+
+def _pressed(threshold_sec: float, stage: str, action: str) -> bool:
+    dl = _current.get()
+    if dl is None or not dl.short(threshold_sec):
+        return False
+    dl.note(stage, action)
+    return True
+
+
+def degrade(stage: str, action: str) -> bool:
+    """남은 시간 < DEADLINE_DEGRADE_SEC 이면 True (축소 내역 기록)"""
+    return _pressed(DEADLINE_DEGRADE_SEC, stage, action)
+
+
+def fallback(stage: str, action: str) -> bool:
+    """남은 시간 < DEADLINE_FALLBACK_SEC 이면 True (축소 내역 기록)"""
+    return _pressed(DEADLINE_FALLBACK_SEC, stage, action)
@@ -10,7 +10,7 @@ EvaluationAgent (FINAL)
 기능 요약
 1) title/content 강인 추출(재귀)
 2) 규칙 스코어러: medical_ad_checklist.csv → 정규식/키워드 자동화 → rule_score(0~5)
-3) LLM 평가: 평가 프롬프트(JSON) → llm_score(0~5)
+3) LLM 평가: 평가 프롬프트(JSON 모드 · EvaluationResponse 스키마 검증) → llm_score(0~5)
 4) 스코어 융합: final_score = max(rule_score, llm_score)
 5) 우선순위 가중 총점: medical-ad-report.md 테이블 기반(weighted_total 0~100)
 6) 임계 비교: evaluation_criteria.json(엄격/표준/유연) → 위반 판정
@@ -28,15 +28,22 @@ CLI
 
 import os
 import re
+import sys
 import csv
 import json
 import argparse
 from pathlib import Path
 from datetime import datetime
-from typing import Any, Dict, List, Tuple, Union, Iterable
+from typing import Any, Dict, List, Optional, Tuple, Type, Union, Iterable
 
-import google.generativeai as genai
 from dotenv import load_dotenv
+from pydantic import BaseModel
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # 스크립트 실행 시에도 app.* import 가능하도록
+from app.agents.reference_registry import registry
+from app.agents.llm_client import LLM_BACKEND, GeminiClient
+from app.agents.schemas import EvaluationResponse, RegenerationPatch
+from app.utils.tracing import traced
 
 
 
@@ -696,6 +703,7 @@ def _write_json(p: Path, obj: Any):
     p.parent.mkdir(parents=True, exist_ok=True)
     p.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
 
+@traced("file.scan")
 def _latest(log_dir: Path, glob_pat: Union[str, List[str]]) -> Path:
     # log_dir 안의 최신 날짜 폴더 선택
     date_dirs = [p for p in log_dir.iterdir() if p.is_dir()]
@@ -724,38 +732,17 @@ def _latest(log_dir: Path, glob_pat: Union[str, List[str]]) -> Path:
 def _setup_llm():
     load_dotenv()
     api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
+    if not api_key and LLM_BACKEND != "replay":
         raise RuntimeError("GEMINI_API_KEY가 .env에 없습니다.")
-    genai.configure(api_key=api_key)
-    return genai.GenerativeModel("gemini-1.5-pro")
-
-def _extract_json(raw: str) -> Dict[str, Any]:
-    if not raw:
-        raise ValueError("LLM 응답이 비어 있습니다.")
-    text = raw.strip()
-    if text.startswith("```"):
-        text = re.sub(r"^```[a-zA-Z0-9]*\s*", "", text)
-        text = re.sub(r"\s*```$", "", text)
-    start = text.find("{")
-    end = text.rfind("}")
-    if start != -1 and end != -1 and end > start:
-        text = text[start:end+1]
-    text = text.strip().strip("`").strip()
-    return json.loads(text)
-
-def _call_llm(model, prompt: str) -> Dict[str, Any]:
-    resp = model.generate_content(prompt)
-    text = getattr(resp, "text", "") or ""
-    if not text:
-        try:
-            cand0 = resp.candidates[0]
-            parts = getattr(getattr(cand0, "content", None), "parts", []) or []
-            text = "".join(getattr(p, "text", "") for p in parts if getattr(p, "text", ""))
-        except Exception:
-            pass
-    if not text:
-        raise RuntimeError("LLM 응답 파싱 실패(빈 응답). 프롬프트 또는 안전필터 확인.")
-    return _extract_json(text)
+    # 생성 설정은 모델 기본값 사용 (공용 클라이언트가 모델 객체/연결 재사용)
+    return GeminiClient(agent="evaluation", task="evaluation.compliance", temperature=None,
+                        max_output_tokens=None, top_p=None, top_k=None)
+
+def _call_llm(model, prompt: str, prompt_file: Optional[Path] = None, task: Optional[str] = None,
+              schema: Type[BaseModel] = EvaluationResponse) -> Dict[str, Any]:
+    # 빈 응답은 공용 클라이언트에서 재시도 후 예외 / task 지정 시 해당 작업 티어의 모델 사용
+    # JSON 모드 + 스키마 검증 (실패 시 lite 모델 리페어 1회, 그래도 실패하면 StructuredOutputError)
+    return model.generate_json(prompt, schema, prompt_file=prompt_file.name if prompt_file else None, task=task)
 
 # ===== 재귀 탐색 도구 =====
 def _iter_paths(obj: Any, prefix: Tuple=()) -> Iterable[Tuple[Tuple, Any]]:
@@ -890,6 +877,14 @@ def load_checklist_csv(path: Path) -> List[Dict[str, str]]:
             rows.append({k.strip(): (v.strip() if isinstance(v,str) else v) for k,v in r.items()})
     return rows
 
+def load_checklist_patterns(path: Path) -> Dict[int, List[re.Pattern]]:
+    """체크리스트 CSV → 컴파일된 패턴 (레지스트리 공유, CSV 변경 시에만 재컴파일)"""
+    return registry.get(("checklist_patterns", str(path)), [path],
+                        lambda: compile_patterns(load_checklist_csv(path)))
+
+def load_criteria(path: Path) -> Dict[str, Any]:
+    return registry.get(("criteria", str(path)), [path], lambda: _read_json(path))
+
 def compile_patterns(rows: List[Dict[str,str]]) -> Dict[int, List[re.Pattern]]:
     patterns: Dict[int, List[re.Pattern]] = {}
     for r in rows:
@@ -1037,7 +1032,7 @@ def apply_patches(title: str, content: str, patch_obj: Dict[str, Any]) -> Tuple[
 
 # ===== 프롬프트 빌드 =====
 def build_eval_prompt(title: str, content: str, prompt_path: Path = EVAL_PROMPT_PATH, seo_metrics: Dict[int, int] = None) -> str:
-    base = _read_text(prompt_path)
+    base = registry.text(prompt_path)
 
     # SEO 모드에서 실제 측정값과 정답을 프롬프트에 포함
     if seo_metrics and "seo_evaluation_prompt" in str(prompt_path):
@@ -1111,7 +1106,7 @@ def build_eval_prompt(title: str, content: str, prompt_path: Path = EVAL_PROMPT_
 
 def build_regen_prompt(title: str, content: str, criteria_mode: str,
                        violations: List[int], hints: List[str]) -> str:
-    base = _read_text(REGEN_PROMPT_PATH)
+    base = registry.text(REGEN_PROMPT_PATH)
     vnames = [f"{CHECKLIST_NAMES[i]}({i})" for i in violations]
     violations_json = json.dumps(vnames, ensure_ascii=False)
     hints_json = json.dumps(hints or [], ensure_ascii=False)
@@ -1246,17 +1241,17 @@ def run(criteria_mode: str = "표준",
 
     # 1) 기준/CSV/리포트 가중치 로드
     if evaluation_mode == "seo":
-        criteria = _read_json(SEO_CRITERIA_PATH)
+        criteria = load_criteria(SEO_CRITERIA_PATH)
         eval_prompt_path = SEO_PROMPT_PATH
     else:
-        criteria = _read_json(CRITERIA_PATH)
+        criteria = load_criteria(CRITERIA_PATH)
         eval_prompt_path = EVAL_PROMPT_PATH
     if evaluation_mode == "medical":
         csv_file = Path(csv_path) if csv_path else _find_existing(DEFAULT_CSV_PATHS)
-        rows = load_checklist_csv(csv_file)
-        pats = compile_patterns(rows)
+        pats = load_checklist_patterns(csv_file)
         report_file = Path(report_path) if report_path else _find_existing(DEFAULT_REPORT_PATHS)
-        weights = parse_report_weights(report_file)
+        weights = registry.get(("report_weights", str(report_file)), [report_file],
+                               lambda: parse_report_weights(report_file))
         # 2) 규칙 기반 사전 스코어
         rule_all = rule_score_all(title, content, pats)
     else:
@@ -1270,7 +1265,7 @@ def run(criteria_mode: str = "표준",
         eval_prompt = build_eval_prompt(title, content, eval_prompt_path, seo_metrics)
     else:
         eval_prompt = build_eval_prompt(title, content, eval_prompt_path)
-    result = _call_llm(model, eval_prompt)
+    result = _call_llm(model, eval_prompt, eval_prompt_path)
     llm_scores: Dict[str, int] = result.get("평가결과", {}) or {}
     analysis: str = result.get("상세분석", "") or ""
     tips: List[str] = result.get("권고수정", []) or []
@@ -1447,7 +1442,8 @@ def run(criteria_mode: str = "표준",
         # 재생성 → 패치
         stage = map_stage(violations_before)
         regen_prompt = build_regen_prompt(title, content, criteria_mode, violations_before, tips)
-        patch_obj = _call_llm(model, regen_prompt)
+        patch_obj = _call_llm(model, regen_prompt, REGEN_PROMPT_PATH, task="evaluation.regenerate",
+                              schema=RegenerationPatch)
         title, content = apply_patches(title, content, patch_obj)
         patched_once = True
 
@@ -1460,7 +1456,7 @@ def run(criteria_mode: str = "표준",
             eval_prompt = build_eval_prompt(title, content, eval_prompt_path, seo_metrics)
         else:
             eval_prompt = build_eval_prompt(title, content, eval_prompt_path)
-        result = _call_llm(model, eval_prompt)
+        result = _call_llm(model, eval_prompt, eval_prompt_path)
         llm_scores = result.get("평가결과", {}) or {}
         analysis = result.get("상세분석", "") or ""
         tips = result.get("권고수정", []) or []
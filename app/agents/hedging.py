@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Hedging (LLM 꼬리 지연 완화용 중복 요청)
+- 호출이 에이전트 최근 지연의 LLM_HEDGE_PERCENTILE 백분위(llm_metrics.latency_percentile)를 넘기도록
+  끝나지 않으면 같은 요청을 1건 더 보내고, 먼저 성공한 응답을 사용
+- 예산: 중복 요청 수 ≤ LLM_HEDGE_BUDGET × 전체 호출 수 (기본 10%) — 넘으면 중복 요청 없이 원 호출만 대기
+- 모델 호출 한도(rate_limiter)에 빈 슬롯/토큰이 있을 때만 중복 요청 (스로틀링 중에는 부하를 늘리지 않음)
+- 진 쪽: 아직 시작 전이면 취소, 이미 전송된 블로킹 호출은 중단할 수 없어 결과를 버리고 완료 시 슬롯 반환
+- 비스트리밍 · 후보 1개 호출에만 적용 (스트리밍은 첫 조각부터 구독자에게 전달되므로 제외)
+- 환경변수
+    LLM_HEDGE_ENABLED(기본 false), LLM_HEDGE_AGENTS(기본 content, 빈 값이면 모든 에이전트),
+    LLM_HEDGE_PERCENTILE(기본 95), LLM_HEDGE_BUDGET(기본 0.1), LLM_HEDGE_MIN_DELAY_MS(기본 1000)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.agents.llm_metrics import llm_metrics
+from app.agents.rate_limiter import LLM_MAX_CONCURRENCY
+
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_AGENTS = frozenset(a.strip() for a in os.getenv("LLM_HEDGE_AGENTS", "content").split(",") if a.strip())
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.1"))
+LLM_HEDGE_MIN_DELAY_MS = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "1000"))
+
+PRIMARY, HEDGE = "primary", "hedge"
+
+
+class HedgePolicy:
+    def __init__(self, enabled: bool = LLM_HEDGE_ENABLED, agents: frozenset = LLM_HEDGE_AGENTS,
+                 percentile: float = LLM_HEDGE_PERCENTILE, budget: float = LLM_HEDGE_BUDGET,
+                 min_delay_ms: float = LLM_HEDGE_MIN_DELAY_MS):
+        self.enabled = enabled
+        self.agents = agents
+        self.percentile = percentile
+        self.budget = max(0.0, budget)
+        self.min_delay_ms = max(0.0, min_delay_ms)
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "primary_wins": 0,
+                       "skipped_budget": 0, "skipped_rate_limit": 0}
+        # 원 호출은 별도 스레드에서 실행 (호출 스레드는 지연 임계값까지 대기 후 중복 요청 여부 결정)
+        self._pool = ThreadPoolExecutor(max_workers=max(4, LLM_MAX_CONCURRENCY * 2), thread_name_prefix="llm-hedge")
+
+    def applies(self, agent: str, hedge: Optional[bool] = None) -> bool:
+        """hedge=True/False 가 호출별 지정값, None이면 환경변수 설정(대상 에이전트)"""
+        if hedge is not None:
+            return hedge
+        return self.enabled and (not self.agents or agent in self.agents)
+
+    def delay(self, agent: str) -> Optional[float]:
+        """중복 요청까지 대기 시간(초) — 지연 표본이 부족하면 None (중복 요청 안 함)"""
+        p = llm_metrics.latency_percentile(agent, self.percentile)
+        if p is None:
+            return None
+        return max(p, self.min_delay_ms) / 1000.0
+
+    def note_call(self) -> None:
+        """예산 분모: 실제 전송된 원 호출 수 (캐시 hit 제외, 재시도 포함)"""
+        with self._lock:
+            self._stats["calls"] += 1
+
+    def _spend(self) -> bool:
+        with self._lock:
+            if self._stats["hedged"] + 1 > self.budget * self._stats["calls"]:
+                self._stats["skipped_budget"] += 1
+                return False
+            self._stats["hedged"] += 1
+            return True
+
+    def run(self, call: Callable[[], Any], delay: float, acquire: Callable[[], bool],
+            on_abandon: Callable[[str, Future], None]) -> Tuple[Any, str]:
+        """
+        call()을 실행하고 delay초 안에 끝나지 않으면 (예산·acquire() 통과 시) 1건 더 실행
+        - 반환: (먼저 성공한 결과, PRIMARY | HEDGE) — 둘 다 실패하면 먼저 실패한 예외
+        - on_abandon(kind, future): 결과가 쓰이지 않은 쪽마다 완료(또는 취소) 후 1회 — 슬롯 반환/메트릭 기록용
+        """
+        futures: Dict[Future, str] = {self._pool.submit(contextvars.copy_context().run, call): PRIMARY}
+        done, _ = wait(futures, timeout=delay)
+        if not done and self._spend():
+            if acquire():
+                futures[self._pool.submit(contextvars.copy_context().run, call)] = HEDGE
+            else:
+                with self._lock:
+                    self._stats["hedged"] -= 1
+                    self._stats["skipped_rate_limit"] += 1
+
+        pending = set(futures)
+        failed = []
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                if fut.exception() is not None:
+                    failed.append(fut)
+                    continue
+                kind = futures[fut]
+                if len(futures) > 1:
+                    with self._lock:
+                        self._stats["hedge_wins" if kind == HEDGE else "primary_wins"] += 1
+                for other in [f for f in futures if f is not fut]:
+                    self._abandon(futures[other], other, on_abandon)
+                return fut.result(), kind
+        for other in failed[1:]:
+            self._abandon(futures[other], other, on_abandon)
+        raise failed[0].exception()
+
+    @staticmethod
+    def _abandon(kind: str, fut: Future, on_abandon: Callable[[str, Future], None]) -> None:
+        fut.cancel()
+        ctx = contextvars.copy_context()  # 케이스별 LLM 사용량(llm_metrics.collect)에 기록되도록 호출 컨텍스트 유지
+        fut.add_done_callback(lambda f: ctx.run(on_abandon, kind, f))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            s = dict(self._stats)
+        s["hedge_ratio"] = round(s["hedged"] / s["calls"], 4) if s["calls"] else 0.0
+        return {"enabled": self.enabled, "agents": sorted(self.agents), "percentile": self.percentile,
+                "budget": self.budget, **s}
+
+
+hedging = HedgePolicy()
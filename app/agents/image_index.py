@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+ImageIndex (이미지 지문 영속 인덱스 · SQLite)
+- 키: (경로, 크기, mtime) — 바뀌지 않은 파일은 다시 읽지 않음 (프로세스 재시작 후에도 유지)
+- 지문: MD5(바이트 동일) + dHash 64bit(지각 해시, Pillow 설치 시)
+- 근사 중복(선택): dHash를 LSH 밴드로 나눠 버킷 조회 → 해밍 거리 ≤ IMAGE_DHASH_MAX_DISTANCE 이면 같은 그룹
+    * 밴드 수 = 최대 거리 + 1 → 거리 이내면 최소 한 밴드가 정확히 일치 (비둘기집 원리, 누락 없음)
+    * 같은 구도의 치료 전/후 사진도 가까운 해시가 되므로 기본 비활성(0) — 켜도 Q7 섹션은 정확 일치만 (content_agent)
+    * 밴드가 너무 좁으면 버킷이 뭉쳐 조회가 전체 탐색이 되므로 최대 거리는 MAX_DHASH_DISTANCE(7, 밴드 8bit)로 제한
+- fingerprint(path): {"md5", "dhash", "group"} — 이미지당 stat 1회 + 딕셔너리/버킷 조회 (O(1))
+- Pillow가 없으면 MD5만 사용 (바이트 동일한 파일만 중복 처리)
+- 환경변수
+    IMAGE_INDEX_PATH(기본 app/cache/image_index.sqlite3),
+    IMAGE_DHASH_MAX_DISTANCE(기본 0 = 지각 해시 그룹핑 비활성)
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from PIL import Image
+except ImportError:  # 선택 의존성 — 없으면 MD5만
+    Image = None
+
+IMAGE_INDEX_PATH = Path(os.getenv("IMAGE_INDEX_PATH", "app/cache/image_index.sqlite3"))
+IMAGE_DHASH_MAX_DISTANCE = int(os.getenv("IMAGE_DHASH_MAX_DISTANCE", "0"))
+
+_HASH_BITS = 64
+MAX_DHASH_DISTANCE = 7  # 밴드 8개 × 8bit
+_CHUNK = 1 << 20
+
+
+def _md5(path: str) -> str:
+    h = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def dhash(path: str) -> Optional[int]:
+    """64bit difference hash (GIF는 첫 프레임) — Pillow 없음/디코딩 실패 시 None"""
+    if Image is None:
+        return None
+    try:
+        with Image.open(path) as im:
+            im.seek(0)
+            gray = im.convert("L").resize((9, 8))
+            px = list(gray.getdata())
+    except Exception:
+        return None
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return bits
+
+
+class ImageIndex:
+    def __init__(self, path: Path = IMAGE_INDEX_PATH, max_distance: int = IMAGE_DHASH_MAX_DISTANCE):
+        self.path = Path(path)
+        if not 0 <= max_distance <= MAX_DHASH_DISTANCE:
+            print(f"⚠️ IMAGE_DHASH_MAX_DISTANCE={max_distance} 범위 밖 — 0~{MAX_DHASH_DISTANCE}로 제한")
+        self.max_distance = min(max(0, max_distance), MAX_DHASH_DISTANCE)
+        self.bands = self.max_distance + 1
+        self._band_bits = _HASH_BITS // self.bands
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._loaded = False
+        # path → (size, mtime_ns, md5, dhash, group)
+        self._entries: Dict[str, Tuple[int, int, str, Optional[int], str]] = {}
+        # md5 → group / (band, 값) → [(dhash, group)]
+        self._by_md5: Dict[str, str] = {}
+        self._buckets: Dict[Tuple[int, int], List[Tuple[int, str]]] = {}
+        self._stats = {"lookups": 0, "hits": 0, "computed": 0, "near_duplicates": 0, "errors": 0}
+
+    # --- 저장소 ---
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS image_fingerprints (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    md5 TEXT NOT NULL,
+                    dhash TEXT,
+                    grp TEXT NOT NULL
+                )
+            """)
+            self._conn = conn
+        return self._conn
+
+    def _load(self) -> None:
+        """최초 1회 인덱스 전체를 메모리로 (이후 조회는 딕셔너리)"""
+        if self._loaded:
+            return
+        try:
+            rows = self._db().execute("SELECT path, size, mtime_ns, md5, dhash, grp FROM image_fingerprints").fetchall()
+        except sqlite3.Error as e:
+            print(f"⚠️ 이미지 인덱스 로딩 실패 (메모리에서만 사용): {e}")
+            rows = []
+        for path, size, mtime_ns, md5, dh, grp in rows:
+            # 근사 병합이 꺼져 있으면 이전 설정으로 저장된 그룹은 무시 (정확 일치만)
+            self._remember(path, size, mtime_ns, md5, int(dh, 16) if dh else None, grp if self.max_distance else md5)
+        self._loaded = True
+
+    def _remember(self, path: str, size: int, mtime_ns: int, md5: str, dh: Optional[int], grp: str) -> None:
+        self._entries[path] = (size, mtime_ns, md5, dh, grp)
+        self._by_md5.setdefault(md5, grp)
+        if dh is not None and self.max_distance:
+            for band in self._band_keys(dh):
+                self._buckets.setdefault(band, []).append((dh, grp))
+
+    def _band_keys(self, dh: int) -> List[Tuple[int, int]]:
+        mask = (1 << self._band_bits) - 1
+        return [(i, (dh >> (i * self._band_bits)) & mask) for i in range(self.bands)]
+
+    # --- 그룹 결정 ---
+    def _group_for(self, md5: str, dh: Optional[int]) -> str:
+        """바이트 동일 → 기존 그룹, dHash 근사 일치 → 기존 그룹, 아니면 새 그룹(md5)"""
+        if md5 in self._by_md5:
+            return self._by_md5[md5]
+        if dh is not None and self.max_distance:
+            for band in self._band_keys(dh):
+                for other, grp in self._buckets.get(band, ()):
+                    if bin(dh ^ other).count("1") <= self.max_distance:
+                        self._stats["near_duplicates"] += 1
+                        return grp
+        return md5
+
+    def fingerprint(self, path: str) -> Optional[Dict[str, Any]]:
+        """{"md5", "dhash", "group"} — 파일이 없거나 읽기 실패면 None"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            self._load()
+            self._stats["lookups"] += 1
+            cached = self._entries.get(path)
+            if cached is not None and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+                self._stats["hits"] += 1
+                return {"md5": cached[2], "dhash": cached[3], "group": cached[4]}
+        # 파일 읽기/디코딩은 락 밖에서
+        try:
+            md5 = _md5(path)
+        except OSError:
+            with self._lock:
+                self._stats["errors"] += 1
+            return None
+        dh = dhash(path) if self.max_distance else None
+        with self._lock:
+            grp = self._group_for(md5, dh)
+            self._remember(path, st.st_size, st.st_mtime_ns, md5, dh, grp)
+            self._stats["computed"] += 1
+            try:
+                db = self._db()
+                db.execute(
+                    "INSERT OR REPLACE INTO image_fingerprints (path, size, mtime_ns, md5, dhash, grp) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (path, st.st_size, st.st_mtime_ns, md5, f"{dh:016x}" if dh is not None else None, grp),
+                )
+                db.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️ 이미지 인덱스 저장 실패: {e}")
+        return {"md5": md5, "dhash": dh, "group": grp}
+
+    def dedup_key(self, path: str) -> Optional[str]:
+        """중복 판정 키 (같은/근사 이미지면 같은 값) — 파일을 읽을 수 없으면 None"""
+        fp = self.fingerprint(path)
+        return fp["group"] if fp else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            s = dict(self._stats)
+            entries = len(self._entries)
+        s["hit_ratio"] = round(s["hits"] / s["lookups"], 4) if s["lookups"] else 0.0
+        return {"path": str(self.path), "entries": entries, "perceptual": Image is not None and self.max_distance > 0,
+                "max_distance": self.max_distance, **s}
+
+
+image_index = ImageIndex()
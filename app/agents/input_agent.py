@@ -13,6 +13,7 @@ from __future__ import annotations
 
 import os
 import re
+import sys
 import json
 import shutil
 import pickle
@@ -20,10 +21,17 @@ import hashlib
 import difflib
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Dict, List, Tuple, Any
+from typing import Optional, Dict, List, Tuple, Any, TYPE_CHECKING
 
 import pandas as pd
 
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # 스크립트 실행 시에도 app.* import 가능하도록
+from app.agents.reference_registry import registry
+from app.utils.tracing import span, set_trace_attribute
+
+if TYPE_CHECKING:
+    from app.agents.pipeline_context import PipelineContext
+
 # =========================
 # 경로/시간 유틸 & JSON 헬퍼
 # =========================
@@ -390,6 +398,57 @@ class ClinicalContextBuilder:
 # ==============
 # InputAgent
 # ==============
+def _load_hospital_list(path: Path) -> List[Dict[str, Any]]:
+    if not path.exists():
+        return []
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f) or []
+    except Exception:
+        return []
+
+
+def _load_select_df(path: Path):
+    if not path.exists():
+        return None
+    df = read_csv_kr(path)
+    for col in ["카테고리", "증상_선택", "진료_선택", "치료_선택"]:
+        if col not in df.columns:
+            df[col] = ""
+    return df
+
+
+def load_input_resources(
+    persona_csv_path: str = "app/test_data/persona_table.csv",
+    hospital_info_path: str = "app/test_data/test_hospital_info.json",
+    category_csv_path: str = "app/test_data/category_data.csv",
+    select_csv_path: str = "app/test_data/select_data.csv",
+    cache_dir: str = "app/cache",
+) -> Dict[str, Any]:
+    """
+    InputAgent 참조 데이터(persona/병원목록/S·P·T 선택표/카테고리 인덱스)
+    - 프로세스 전역 레지스트리에서 공유 (파일 시그니처가 바뀐 항목만 다시 로딩)
+    - 공유 객체이므로 읽기 전용으로 사용 (hospital_list는 InputAgent에서 복사)
+    """
+    persona_csv, hospital_info = Path(persona_csv_path), Path(hospital_info_path)
+    category_csv, select_csv = Path(category_csv_path), Path(select_csv_path)
+    return {
+        "persona_df": registry.get(
+            ("persona_df", str(persona_csv)), [persona_csv], lambda: read_csv_kr(persona_csv)
+        ),
+        "hospital_list": registry.get(
+            ("hospital_list", str(hospital_info)), [hospital_info], lambda: _load_hospital_list(hospital_info)
+        ),
+        "select_df": registry.get(
+            ("select_df", str(select_csv)), [select_csv], lambda: _load_select_df(select_csv)
+        ),
+        "context_builder": registry.get(
+            ("clinical_context_builder", str(category_csv), cache_dir), [category_csv],
+            lambda: ClinicalContextBuilder(category_csv_path, cache_dir=cache_dir)
+        ),
+    }
+
+
 class InputAgent:
     def __init__(
         self,
@@ -402,34 +461,34 @@ class InputAgent:
         category_csv_path: str = "app/test_data/category_data.csv",
         select_csv_path: str = "app/test_data/select_data.csv",
         cache_dir: str = "app/cache",
+        resources: Optional[Dict[str, Any]] = None,
     ):
         self.case_num = case_num
         self.test_data_path = Path(test_data_path)
         self.input_data = input_data
 
-        self.persona_df = read_csv_kr(persona_csv_path)
+        # 참조 데이터: 미리 로딩된 resources가 있으면 그대로, 없으면 전역 레지스트리에서 공유
+        if resources is None:
+            resources = load_input_resources(
+                persona_csv_path=persona_csv_path,
+                hospital_info_path=hospital_info_path,
+                category_csv_path=category_csv_path,
+                select_csv_path=select_csv_path,
+                cache_dir=cache_dir,
+            )
+
+        self.persona_df = resources["persona_df"]
         self.valid_categories = self.persona_df["카테고리"].unique().tolist()
 
         self.hospital_info_path = Path(hospital_info_path)
         self.hospital_image_path = Path(hospital_image_path)
 
-        self.hospital_list: List[Dict[str, Any]] = []
-        if self.hospital_info_path.exists():
-            try:
-                with open(self.hospital_info_path, encoding="utf-8") as f:
-                    self.hospital_list = json.load(f) or []
-            except Exception:
-                self.hospital_list = []
+        self.hospital_list: List[Dict[str, Any]] = list(resources["hospital_list"])
 
-        self.select_df = None
+        self.select_df = resources["select_df"]
         self.select_csv_path = Path(select_csv_path)
-        if self.select_csv_path.exists():
-            self.select_df = read_csv_kr(self.select_csv_path)
-            for col in ["카테고리", "증상_선택", "진료_선택", "치료_선택"]:
-                if col not in self.select_df.columns:
-                    self.select_df[col] = ""
 
-        self.context_builder = ClinicalContextBuilder(category_csv_path, cache_dir=cache_dir)
+        self.context_builder = resources["context_builder"]
 
     # ---------- 업서트 & 로그 ----------
     def upsert_test_input_result(self, payload: dict) -> None:
@@ -517,7 +576,7 @@ class InputAgent:
         self.save_log(updated_data, mode)  # save_log에서 created_at, updated_at 모두 설정
         return False
 
-    def _finalize_and_save(self, data: dict, mode: str) -> dict:
+    def _finalize_and_save(self, data: dict, mode: str, persist: bool = True) -> dict:
         # ensure prefixed image keys
         if "question3_visit_images" not in data:
             data["question3_visit_images"] = data.pop("visit_images", [])
@@ -542,8 +601,9 @@ class InputAgent:
         # UI 모드에서는 자동으로 로그만 기록
         print("🔄 UI 모드: 로그만 기록합니다.")
 
-        # 로그
-        self.save_log(data, mode=mode)
+        # 로그 (persist=False면 디스크 기록 생략)
+        if persist:
+            self.save_log(data, mode=mode)
         return data
 
     # ---------- 병원 유사도 ----------
@@ -980,7 +1040,19 @@ class InputAgent:
     #         self.input_data["clinical_context"] = self._build_clinical_context(self.input_data)
     #         return self._finalize_and_save(self.input_data, mode=mode)
     
-    def collect(self, mode: str = "use") -> dict:
+    def collect(self, mode: str = "use", ctx: Optional["PipelineContext"] = None) -> dict:
+        result = self._collect(mode=mode, persist=(ctx.persist if ctx is not None else True))
+        set_trace_attribute("case_id", result.get("case_id", ""))
+        if ctx is not None:
+            ctx.input_row = result
+            ctx.emit("input_collected", {
+                "case_id": result.get("case_id", ""),
+                "category": result.get("category", ""),
+                "representative_persona": result.get("representative_persona", ""),
+            })
+        return result
+
+    def _collect(self, mode: str = "use", persist: bool = True) -> dict:
         # ⭐ PostID만 있는 경우: DB에서 데이터 조회 후 구성
         if self.input_data and "postId" in self.input_data and len(self.input_data) == 1:
             print(f"🔍 PostID로 DB 데이터 조회: {self.input_data['postId']}")
@@ -1009,7 +1081,7 @@ class InputAgent:
             self.input_data.setdefault("question7_result_images", self.input_data.pop("result_images", []))
             self.input_data.setdefault("case_id", _gen_case_id(save_name))
             self.input_data["clinical_context"] = self._build_clinical_context(self.input_data)
-            return self._finalize_and_save(self.input_data, mode=mode)
+            return self._finalize_and_save(self.input_data, mode=mode, persist=persist)
     
         # ========== UI 연결 시 터미널 입력 부분 주석 처리 ==========
         # # 1) 병원 정보
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+LLMCache (LLM 응답 디스크 캐시 · SQLite)
+- 키: sha256(모델 + 생성 설정 + 프롬프트) — 바이트 단위로 같은 요청만 재사용
+- 테스트 모드/run_agents.py 재실행/같은 TXT 반복 평가 등 벤치마크·회귀 실행용 (기본 비활성)
+- 용량 상한 초과 시 가장 오래 안 쓴 항목부터 삭제 (LRU), 에이전트별 TTL
+- 요청 단위 우회: bypass() 컨텍스트 / API 헤더 "X-LLM-Cache: bypass"
+- 환경변수
+    LLM_CACHE_ENABLED(기본 false), LLM_CACHE_PATH(기본 app/cache/llm_cache.sqlite3),
+    LLM_CACHE_MAX_ENTRIES(기본 5000), LLM_CACHE_TTL_SEC(기본 7일),
+    LLM_CACHE_TTLS(에이전트별 TTL, 예: "plan=86400,evaluation=3600")
+"""
+
+from __future__ import annotations
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import contextvars
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "false").lower() == "true"
+LLM_CACHE_PATH = Path(os.getenv("LLM_CACHE_PATH", "app/cache/llm_cache.sqlite3"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_TTL_SEC = int(os.getenv("LLM_CACHE_TTL_SEC", str(7 * 24 * 3600)))
+
+
+def _parse_ttls(raw: str) -> Dict[str, int]:
+    ttls = {}
+    for item in (raw or "").split(","):
+        if "=" in item:
+            agent, sec = item.split("=", 1)
+            try:
+                ttls[agent.strip()] = int(sec)
+            except ValueError:
+                print(f"⚠️ LLM_CACHE_TTLS 값 무시: {item}")
+    return ttls
+
+
+LLM_CACHE_TTLS = _parse_ttls(os.getenv("LLM_CACHE_TTLS", ""))
+
+_bypass: contextvars.ContextVar[bool] = contextvars.ContextVar("llm_cache_bypass", default=False)
+
+
+@contextmanager
+def bypass(flag: bool = True):
+    """이 컨텍스트(및 복사된 하위 스레드/태스크)에서는 캐시 조회·저장 생략"""
+    token = _bypass.set(flag)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def set_bypass(flag: bool = True) -> contextvars.Token:
+    return _bypass.set(flag)
+
+
+def make_key(model: str, config: Dict[str, Any], prompt: str) -> str:
+    payload = json.dumps({"model": model, "config": config}, ensure_ascii=False, sort_keys=True, default=str)
+    h = hashlib.sha256(payload.encode("utf-8"))
+    h.update(b"\0")
+    h.update(prompt.encode("utf-8"))
+    return h.hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path: Path = LLM_CACHE_PATH, enabled: bool = LLM_CACHE_ENABLED,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES, default_ttl: int = LLM_CACHE_TTL_SEC,
+                 ttls: Optional[Dict[str, int]] = None):
+        self.path = Path(path)
+        self.enabled = enabled
+        self.max_entries = max(1, max_entries)
+        self.default_ttl = default_ttl
+        self.ttls = dict(LLM_CACHE_TTLS if ttls is None else ttls)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    agent TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed_idx ON llm_cache (accessed_at)")
+            self._conn = conn
+        return self._conn
+
+    def _count(self, agent: str, name: str) -> None:
+        bucket = self._stats.setdefault(agent, {"hit": 0, "miss": 0, "store": 0, "bypass": 0, "expired": 0})
+        bucket[name] += 1
+
+    def ttl(self, agent: str) -> int:
+        return self.ttls.get(agent, self.default_ttl)
+
+    def active(self) -> bool:
+        return self.enabled and not _bypass.get()
+
+    def get(self, agent: str, key: str) -> Optional[str]:
+        """캐시된 응답 text (없거나 만료/우회면 None)"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            if _bypass.get():
+                self._count(agent, "bypass")
+                return None
+            try:
+                db = self._db()
+                row = db.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                now = time.time()
+                if row is None:
+                    self._count(agent, "miss")
+                    return None
+                if now - row[1] > self.ttl(agent):
+                    db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    db.commit()
+                    self._count(agent, "expired")
+                    self._count(agent, "miss")
+                    return None
+                db.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                db.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️ LLM 캐시 조회 실패: {e}")
+                return None
+            self._count(agent, "hit")
+            return row[0]
+
+    def put(self, agent: str, key: str, model: str, value: str) -> None:
+        """응답 저장 후 상한 초과분을 LRU 순으로 삭제 (실패는 무시)"""
+        if not self.active():
+            return
+        with self._lock:
+            try:
+                db = self._db()
+                now = time.time()
+                db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, agent, model, value, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, agent, model, value, now, now),
+                )
+                db.execute(
+                    "DELETE FROM llm_cache WHERE key IN ("
+                    "  SELECT key FROM llm_cache ORDER BY accessed_at ASC"
+                    "  LIMIT max(0, (SELECT count(*) FROM llm_cache) - ?))",
+                    (self.max_entries,),
+                )
+                db.commit()
+                self._count(agent, "store")
+            except sqlite3.Error as e:
+                print(f"⚠️ LLM 캐시 저장 실패: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            if self.path.exists():
+                db = self._db()
+                db.execute("DELETE FROM llm_cache")
+                db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """프로세스 기준 에이전트별 hit/miss 카운터 + 저장 항목 수"""
+        with self._lock:
+            per_agent = {k: dict(v) for k, v in self._stats.items()}
+            entries = None
+            if self.enabled:
+                try:
+                    entries = self._db().execute("SELECT count(*) FROM llm_cache").fetchone()[0]
+                except sqlite3.Error:
+                    pass
+        hits = sum(v["hit"] for v in per_agent.values())
+        misses = sum(v["miss"] for v in per_agent.values())
+        return {
+            "enabled": self.enabled,
+            "path": str(self.path),
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_sec": {"default": self.default_ttl, **self.ttls},
+            "agents": per_agent,
+            "hit": hits,
+            "miss": misses,
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        }
+
+
+llm_cache = LLMCache()
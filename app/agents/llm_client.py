@@ -0,0 +1,568 @@
+# -*- coding: utf-8 -*-
+"""
+LLMClient (에이전트 공용 Gemini 클라이언트)
+- genai.configure는 프로세스당 1회 → 전송 채널(gRPC/REST 세션)을 모든 호출이 공유
+- GenerativeModel 객체는 (모델, 생성 설정)별로 캐시해 재사용 (시도마다 새로 만들지 않음)
+- 재시도/타임아웃/호출 한도를 모든 에이전트가 동일하게 사용
+    * 모델별 RPM/TPM 토큰 버킷 + 429/503 적응형 동시 실행 한도 (rate_limiter.py)
+    * 429/503은 서버 Retry-After 힌트만큼, 그 외 오류는 지수 백오프(+지터) 후 재시도
+- 요청 마감 시간(deadline.py)이 있으면 시도별 타임아웃을 남은 시간으로 제한, 만료 후 새 시도는 DeadlineExceeded
+- 호출마다 토큰/지연/재시도 횟수를 llm_metrics에 기록 (span 속성에도 포함)
+- LLM_CACHE_ENABLED=true 면 동일 (모델·설정·프롬프트) 응답을 디스크 캐시에서 재사용 (llm_cache.py)
+- LLM_HEDGE_ENABLED=true 면 지연이 에이전트 p95(LLM_HEDGE_PERCENTILE)를 넘긴 호출에 중복 요청 1건 (hedging.py, 호출 수 대비 10% 예산)
+- LLM_BACKEND=replay 면 Gemini 대신 test_logs 녹화/합성 응답으로 대체 (llm_replay.py, 네트워크·API 키 불필요)
+- API
+    * generate_sync(prompt, agent=..., model=..., ...)  : 블로킹 (에이전트 스레드용)
+        on_text=콜백 지정 시 스트리밍 호출 — 조각이 도착할 때마다 지금까지의 누적 text 전달
+    * await generate(...) / await generate_many([...])   : 비동기 (스레드로 위임, 병렬 호출)
+    * generate_many_sync([...])                          : 블로킹 병렬 호출 (공용 스레드 풀, 이벤트 루프 스레드에서도 사용 가능)
+    * candidates_sync(prompt, n, diversity=...)          : 후보 n개 병렬 생성(temperature 분산) / candidate_count
+    * generate_json_sync(prompt, schema, ...)             : response_mime_type=application/json + response_schema
+        pydantic 스키마(schemas.py)로 1회 검증, 실패 시 원 프롬프트 재호출 없이 lite 모델로 JSON 리페어만 1회
+    * GeminiClient(agent, task=..., ...)                  : 에이전트별 기본값을 묶은 얇은 래퍼 (작업 티어로 모델 결정)
+- 환경변수: LLM_MAX_CONCURRENCY(16, 모델별 동시 호출 상한), LLM_TIMEOUT_SEC(120), LLM_MAX_RETRIES(3), LLM_RETRY_DELAY_SEC(1.0),
+           GEMINI_TRANSPORT(선택: grpc | rest)
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import threading
+from pathlib import Path
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type
+
+from dotenv import load_dotenv
+import google.generativeai as genai
+from pydantic import BaseModel, ValidationError
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # 스크립트 실행 시에도 app.* import 가능하도록
+from app.agents.llm_cache import llm_cache, make_key as cache_key
+from app.agents.llm_metrics import llm_metrics
+from app.agents.llm_replay import LLM_BACKEND, replay
+from app.agents import deadline, model_router
+from app.agents.hedging import hedging
+from app.agents.schemas import gemini_schema, json_mode, loads_lenient
+from app.agents.rate_limiter import (
+    LLM_MAX_CONCURRENCY,
+    estimate_tokens,
+    is_throttle_error,
+    rate_limiter,
+    retry_after_hint,
+)
+from app.utils.tracing import span
+
+load_dotenv()
+LLM_TIMEOUT_SEC = float(os.getenv("LLM_TIMEOUT_SEC", "120"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_DELAY_SEC = float(os.getenv("LLM_RETRY_DELAY_SEC", "1.0"))
+GEMINI_TRANSPORT = os.getenv("GEMINI_TRANSPORT")
+
+
+class StructuredOutputError(ValueError):
+    """스키마 검증 + 리페어 후에도 JSON을 얻지 못함 (raw: 원 응답)"""
+
+    def __init__(self, message: str, raw: str = ""):
+        super().__init__(message)
+        self.raw = raw
+
+
+def _usage(resp) -> Dict[str, Optional[int]]:
+    usage = getattr(resp, "usage_metadata", None)
+
+    def _get(name):
+        value = getattr(usage, name, None)
+        return int(value) if value else None
+
+    return {
+        "prompt_tokens": _get("prompt_token_count"),
+        "output_tokens": _get("candidates_token_count"),
+        "total_tokens": _get("total_token_count"),
+    }
+
+
+def _response_text(resp) -> str:
+    """응답 text (없으면 첫 후보의 파츠를 이어 붙임)"""
+    try:
+        text = resp.text
+    except Exception:
+        text = ""
+    if text:
+        return text
+    for cand in getattr(resp, "candidates", None) or []:
+        parts = getattr(getattr(cand, "content", None), "parts", None) or []
+        text = "".join(getattr(p, "text", "") or "" for p in parts)
+        if text:
+            return text
+    return ""
+
+
+def _candidate_texts(resp) -> List[str]:
+    """후보별 text (candidate_count > 1)"""
+    texts = []
+    for cand in getattr(resp, "candidates", None) or []:
+        parts = getattr(getattr(cand, "content", None), "parts", None) or []
+        texts.append("".join(getattr(p, "text", "") or "" for p in parts))
+    return texts
+
+
+def temperature_sweep(base: Optional[float], n: int, spread: float) -> List[Optional[float]]:
+    """후보 다양성용 temperature 목록 — base를 중심으로 ±spread/2 구간을 n등분 (0.0~2.0으로 제한)"""
+    if base is None or n <= 1 or spread <= 0:
+        return [base] * max(1, n)
+    lo = base - spread / 2
+    step = spread / (n - 1)
+    return [round(min(2.0, max(0.0, lo + i * step)), 3) for i in range(n)]
+
+
+class LLMClient:
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, timeout: float = LLM_TIMEOUT_SEC,
+                 max_retries: int = LLM_MAX_RETRIES, retry_delay: float = LLM_RETRY_DELAY_SEC):
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.max_retries = max(1, max_retries)
+        self.retry_delay = retry_delay
+        self._models: Dict[Tuple, Any] = {}
+        self._lock = threading.Lock()
+        self._configured = False
+        # generate_many_sync 팬아웃용 공용 스레드 풀 (실제 동시 호출 수는 rate_limiter가 제한)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="llm-many")
+
+    # --- 설정/모델 캐시 ---
+    def _configure(self) -> None:
+        if self._configured:
+            return
+        with self._lock:
+            if self._configured:
+                return
+            api_key = os.getenv("GEMINI_API_KEY")
+            if not api_key:
+                raise RuntimeError("GEMINI_API_KEY가 필요합니다(.env)")
+            kwargs = {"api_key": api_key}
+            if GEMINI_TRANSPORT:
+                kwargs["transport"] = GEMINI_TRANSPORT
+            genai.configure(**kwargs)
+            self._configured = True
+
+    @staticmethod
+    def _config_key(**config: Any) -> Tuple:
+        return tuple(sorted((k, v) for k, v in config.items() if v is not None))
+
+    def model(self, model: str, **config: Any):
+        """(모델, 생성 설정)별 GenerativeModel 재사용"""
+        self._configure()
+        key = (model, self._config_key(**config))
+        m = self._models.get(key)
+        if m is None:
+            with self._lock:
+                m = self._models.get(key)
+                if m is None:
+                    cfg = dict(key[1])
+                    if "response_schema" in cfg:
+                        # 캐시 키용 JSON 문자열 → Schema dict
+                        cfg["response_schema"] = json.loads(cfg["response_schema"])
+                    m = genai.GenerativeModel(
+                        model,
+                        generation_config=genai.types.GenerationConfig(**cfg) if cfg else None,
+                    )
+                    self._models[key] = m
+        return m
+
+    # --- 호출 ---
+    def generate_sync(self, prompt: str, **kwargs: Any) -> str:
+        """Gemini 텍스트 생성 (재시도 포함, 블로킹) — attrs(section, prompt_file 등)는 span/메트릭에 기록"""
+        return self._generate(prompt, **kwargs)[0]
+
+    def _generate(self, prompt: str, *, agent: str, model: str,
+                  temperature: Optional[float] = None, max_output_tokens: Optional[int] = None,
+                  top_p: Optional[float] = None, top_k: Optional[int] = None,
+                  timeout: Optional[float] = None, cache: bool = True,
+                  on_text: Optional[Callable[[str], None]] = None, candidate_count: int = 1,
+                  response_mime_type: Optional[str] = None, response_schema: Optional[str] = None,
+                  hedge: Optional[bool] = None, **attrs: Any) -> List[str]:
+        """공통 호출 경로 — candidate_count개 후보 text 목록 반환 (스트리밍은 후보 1개만)"""
+        if on_text is not None and candidate_count > 1:
+            raise ValueError("스트리밍은 candidate_count=1 에서만 지원")
+        config = dict(temperature=temperature, max_output_tokens=max_output_tokens,
+                      candidate_count=candidate_count, top_p=top_p, top_k=top_k,
+                      response_mime_type=response_mime_type, response_schema=response_schema)
+        if LLM_BACKEND == "replay":
+            # 오프라인 리플레이: 녹화/합성 응답 (레이트 리미터·재시도·메트릭 경로는 동일)
+            m = replay.model(model, agent, section=attrs.get("section"), prompt_file=attrs.get("prompt_file"),
+                             **config)
+        else:
+            m = self.model(model, **config)
+        started = time.perf_counter()
+
+        def _record(**fields: Any) -> None:
+            call = llm_metrics.record(agent=agent, model=model,
+                                      latency_ms=(time.perf_counter() - started) * 1000, **attrs, **fields)
+            sp.set(**{k: call[k] for k in ("prompt_tokens", "output_tokens", "retries") if call.get(k) is not None})
+
+        with span("llm.generate", agent=agent, model=model, prompt_chars=len(prompt), **attrs) as sp:
+            key = cache_key(model, dict(self._config_key(**config)), prompt) if cache else None
+            if key is not None:
+                cached = llm_cache.get(agent, key)
+                if cached is not None:
+                    sp.set(cache="hit")
+                    _record(cache=True)
+                    if on_text is not None:
+                        self._notify(on_text, cached)
+                    return json.loads(cached) if candidate_count > 1 else [cached]
+            limiter = rate_limiter.for_model(model)
+            est_tokens = estimate_tokens(prompt) + (max_output_tokens or 0) * candidate_count
+            hedge_ok = on_text is None and candidate_count == 1 and hedging.applies(agent, hedge)
+            for attempt in range(self.max_retries):
+                sp.set(attempts=attempt + 1)
+                deadline.check(f"llm.{agent}")
+                limiter.acquire(est_tokens, timeout=deadline.remaining())
+                call_timeout = deadline.timeout(timeout or self.timeout)  # 한도 대기 후 남은 시간 기준
+                hedging.note_call()
+                first_chunk_ms = None
+                try:
+                    delay = hedging.delay(agent) if hedge_ok else None
+                    if on_text is None and delay is not None:
+                        resp = self._generate_hedged(m, prompt, call_timeout, delay, limiter, est_tokens,
+                                                     sp, agent=agent, model=model, **attrs)
+                        texts = [_response_text(resp)]
+                    elif on_text is None:
+                        resp = m.generate_content(prompt, request_options={"timeout": call_timeout})
+                        texts = _candidate_texts(resp) if candidate_count > 1 else [_response_text(resp)]
+                    else:
+                        # 스트리밍: 재시도 시에는 누적 text가 처음부터 다시 전달됨
+                        resp = m.generate_content(prompt, stream=True, request_options={"timeout": call_timeout})
+                        text = ""
+                        for chunk in resp:
+                            piece = _response_text(chunk)
+                            if not piece:
+                                continue
+                            if first_chunk_ms is None:
+                                first_chunk_ms = round((time.perf_counter() - started) * 1000, 2)
+                            text += piece
+                            self._notify(on_text, text)
+                        texts = [text]
+                except Exception as e:
+                    throttled = is_throttle_error(e)
+                    hint = retry_after_hint(e) if throttled else None
+                    limiter.release(ok=False, throttled=throttled, retry_after=hint)
+                    sp.set(retry_errors=sp.attrs.get("retry_errors", []) + [str(e)[:200]])
+                    if attempt == self.max_retries - 1:
+                        _record(retries=attempt, ok=False)
+                        raise
+                    print(f"⚠️ Gemini 호출 실패 ({agent}, 시도 {attempt + 1}/{self.max_retries}): {e}")
+                    backoff = self.retry_delay * (2 ** attempt) * random.uniform(0.5, 1.5) if hint is None else 0.0
+                    left = deadline.remaining()
+                    if left is not None and left <= backoff + (hint or 0.0):
+                        # 재시도 대기만으로 마감을 넘기면 바로 실패 반환
+                        _record(retries=attempt, ok=False, deadline=True)
+                        raise
+                    if backoff:
+                        # 힌트가 없으면 지수 백오프 (지터로 동시 재시도 분산)
+                        time.sleep(backoff)
+                    continue
+                usage = _usage(resp)
+                limiter.release(ok=True, est_tokens=est_tokens, used_tokens=usage["total_tokens"])
+                texts = [t for t in texts if t]
+                if texts:
+                    if key is not None:
+                        llm_cache.put(agent, key, model, json.dumps(texts, ensure_ascii=False)
+                                      if candidate_count > 1 else texts[0])
+                    extra = {"stream": True, "first_chunk_ms": first_chunk_ms} if on_text is not None else {}
+                    if candidate_count > 1:
+                        extra["candidates"] = len(texts)
+                    _record(retries=attempt, prompt_tokens=usage["prompt_tokens"],
+                            output_tokens=usage["output_tokens"], **extra)
+                    return texts
+                sp.set(retry_errors=sp.attrs.get("retry_errors", []) + ["응답에 text 없음"])
+                if attempt == self.max_retries - 1:
+                    _record(retries=attempt, ok=False, prompt_tokens=usage["prompt_tokens"])
+                    raise ValueError("응답에 text 없음")
+                print(f"⚠️ Gemini 빈 응답 ({agent}, 시도 {attempt + 1}/{self.max_retries})")
+        raise RuntimeError("모든 재시도 실패")
+
+    @staticmethod
+    def _generate_hedged(m, prompt: str, timeout: float, delay: float, limiter, est_tokens: int, sp,
+                         *, agent: str, model: str, **attrs: Any):
+        """
+        hedging.run 으로 원 호출 + (delay초 초과 시) 중복 호출 — 먼저 성공한 응답 반환
+        진 쪽은 완료 시 호출 한도 슬롯을 반환하고, 실제로 전송된 호출이면 토큰/지연을 hedge_loser로 기록
+        """
+        sent = time.perf_counter()
+
+        def _abandoned(kind: str, fut) -> None:
+            if fut.cancelled():
+                limiter.release(ok=True, est_tokens=est_tokens, used_tokens=0)
+                return
+            e = fut.exception()
+            if e is not None:
+                throttled = is_throttle_error(e)
+                limiter.release(ok=False, throttled=throttled, retry_after=retry_after_hint(e) if throttled else None)
+                return
+            usage = _usage(fut.result())
+            limiter.release(ok=True, est_tokens=est_tokens, used_tokens=usage["total_tokens"])
+            llm_metrics.record(agent=agent, model=model, latency_ms=(time.perf_counter() - sent) * 1000,
+                               prompt_tokens=usage["prompt_tokens"], output_tokens=usage["output_tokens"],
+                               hedge_loser=kind, **attrs)
+
+        resp, winner = hedging.run(
+            partial(m.generate_content, prompt, request_options={"timeout": timeout}),
+            delay,
+            acquire=partial(limiter.try_acquire, est_tokens),
+            on_abandon=_abandoned,
+        )
+        sp.set(hedge=winner)
+        return resp
+
+    def candidates_sync(self, prompt: str, n: int, *, temperature: Optional[float] = None,
+                        diversity: float = 0.0, native: bool = False,
+                        on_candidate: Optional[Callable[[int, str], None]] = None, **kwargs: Any) -> List[str]:
+        """
+        후보 n개 생성 (블로킹)
+        - native=True : candidate_count=n 단일 호출 (모델이 지원할 때)
+        - 기본        : n개 병렬 호출, temperature를 base±diversity/2 범위로 분산
+        - on_candidate(index, text) : 후보가 도착하는 순서대로 호출 (병렬 모드)
+        - 일부 호출 실패는 무시하고, 전부 실패하면 첫 예외를 전파
+        반환: 도착 순서대로 정렬된 후보 text 목록
+        """
+        if native:
+            texts = self._generate(prompt, temperature=temperature, candidate_count=n, **kwargs)
+            for i, text in enumerate(texts):
+                if on_candidate is not None:
+                    self._notify(partial(on_candidate, i), text)
+            return texts
+
+        temps = temperature_sweep(temperature, n, diversity)
+        results: List[str] = []
+        errors: List[BaseException] = []
+        with ThreadPoolExecutor(max_workers=max(1, n), thread_name_prefix="llm-candidates") as pool:
+            futures = {
+                pool.submit(contextvars.copy_context().run, self.generate_sync, prompt,
+                            temperature=t, candidate_index=i, **kwargs): i
+                for i, t in enumerate(temps)
+            }
+            for fut in as_completed(futures):
+                try:
+                    text = fut.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                results.append(text)
+                if on_candidate is not None:
+                    self._notify(partial(on_candidate, futures[fut]), text)
+        if not results and errors:
+            raise errors[0]
+        return results
+
+    async def stream_candidates(self, prompt: str, n: int, *, temperature: Optional[float] = None,
+                                diversity: float = 0.0, **kwargs: Any):
+        """후보 n개 병렬 생성 — 끝나는 순서대로 (index, text) 를 비동기로 전달 (실패한 후보는 건너뜀)"""
+        temps = temperature_sweep(temperature, n, diversity)
+
+        async def _one(i: int, t: Optional[float]):
+            return i, await self.generate(prompt, temperature=t, candidate_index=i, **kwargs)
+
+        for coro in asyncio.as_completed([_one(i, t) for i, t in enumerate(temps)]):
+            try:
+                yield await coro
+            except Exception as e:
+                print(f"⚠️ 후보 생성 실패: {e}")
+
+    # --- 구조화(JSON) 출력 ---
+    def validate_or_repair(self, text: str, schema: Type[BaseModel], *, agent: str,
+                           repair_task: str = "json.repair", **attrs: Any) -> BaseModel:
+        """
+        응답을 스키마로 1회 검증 — 실패하면 원 프롬프트를 다시 보내지 않고
+        깨진 응답 + 스키마 + 오류만 lite 티어 모델에 보내 리페어 1회 (그래도 실패면 StructuredOutputError)
+        """
+        error = self._validate(text, schema)
+        if isinstance(error, BaseModel):
+            return error
+        print(f"🩹 JSON 스키마 검증 실패 ({agent}) — 리페어 호출: {error[:200]}")
+        tier, model = model_router.resolve(repair_task)
+        prompt = (
+            "Fix the JSON below so that it is valid JSON matching the schema. "
+            "Keep every value that already fits; do not invent content. Output ONLY the JSON object.\n\n"
+            f"SCHEMA\n{gemini_schema(schema)}\n\nERROR\n{error[:1000]}\n\nJSON\n{text}"
+        )
+        repaired = self.generate_sync(
+            prompt, agent=agent, model=model, temperature=0.0, task=repair_task, tier=tier, repair=True,
+            **json_mode(schema), **{k: v for k, v in attrs.items() if k in ("prompt_file", "section")},
+        )
+        result = self._validate(repaired, schema)
+        if isinstance(result, BaseModel):
+            return result
+        raise StructuredOutputError(f"JSON 스키마 검증 실패({schema.__name__}): {result[:300]}", raw=text)
+
+    @staticmethod
+    def _validate(text: str, schema: Type[BaseModel]):
+        """검증된 모델 또는 오류 메시지(str)"""
+        obj = loads_lenient(text)
+        if obj is None:
+            return "JSON 객체를 찾을 수 없음"
+        try:
+            return schema.model_validate(obj)
+        except ValidationError as e:
+            return str(e)
+
+    def generate_json_sync(self, prompt: str, schema: Type[BaseModel], *, repair_task: str = "json.repair",
+                           **kwargs: Any) -> BaseModel:
+        """response_mime_type=application/json + response_schema 로 생성 → 검증(실패 시 리페어만 재시도)"""
+        text = self.generate_sync(prompt, **json_mode(schema), **kwargs)
+        attrs = {k: v for k, v in kwargs.items() if k in ("prompt_file", "section")}
+        return self.validate_or_repair(text, schema, agent=kwargs["agent"], repair_task=repair_task, **attrs)
+
+    @staticmethod
+    def _notify(on_text: Callable[[str], None], text: str) -> None:
+        """구독자 콜백 오류는 LLM 호출 실패로 취급하지 않음"""
+        try:
+            on_text(text)
+        except Exception as e:
+            print(f"⚠️ 스트리밍 콜백 오류: {e}")
+
+    async def generate(self, prompt: str, **kwargs: Any) -> str:
+        """비동기 생성 — 블로킹 호출은 스레드로 위임 (동시 호출 수는 rate_limiter가 제한)"""
+        return await asyncio.to_thread(lambda: self.generate_sync(prompt, **kwargs))
+
+    async def generate_many(self, prompts: Sequence[str], return_exceptions: bool = False,
+                            **kwargs: Any) -> List[Any]:
+        """여러 프롬프트 병렬 생성 (입력 순서대로 반환)"""
+        return await asyncio.gather(*(self.generate(p, **kwargs) for p in prompts),
+                                    return_exceptions=return_exceptions)
+
+    def generate_many_sync(self, prompts: Sequence[str], return_exceptions: bool = False,
+                           **kwargs: Any) -> List[Any]:
+        """
+        동기 코드에서 병렬 생성 (입력 순서대로 반환) — 공용 스레드 풀에서 실행하므로
+        이벤트 루프가 돌고 있는 스레드(FastAPI 핸들러 등)에서 호출해도 됨 (단, 호출 동안 블로킹)
+        """
+        futures = [self._pool.submit(contextvars.copy_context().run, self.generate_sync, p, **kwargs)
+                   for p in prompts]
+        results: List[Any] = []
+        for fut in futures:
+            try:
+                results.append(fut.result())
+            except Exception as e:
+                if not return_exceptions:
+                    for other in futures:
+                        other.cancel()
+                    raise
+                results.append(e)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "models": len(self._models),
+            "cache": llm_cache.stats(),
+            "rate_limits": rate_limiter.stats(),
+            "max_concurrency": self.max_concurrency,
+            "timeout": self.timeout,
+            "max_retries": self.max_retries,
+            "hedging": hedging.stats(),
+        }
+
+
+llm = LLMClient()
+
+
+class GeminiClient:
+    """
+    에이전트별 기본값(작업/temperature/출력 길이) 래퍼 — 실제 호출은 공용 llm
+    - model 미지정 시 task(기본: agent)의 티어로 모델 결정 (model_router, 요청 단위 덮어쓰기 반영)
+    - 호출별로 task="..." 를 넘기면 해당 호출만 다른 작업 티어 사용
+    """
+
+    def __init__(self, agent: str, model: Optional[str] = None, temperature: Optional[float] = 0.7,
+                 max_output_tokens: Optional[int] = 8192, top_p: Optional[float] = 0.95,
+                 top_k: Optional[int] = 40, client: Optional[LLMClient] = None, task: Optional[str] = None):
+        self.agent = agent
+        self.task = task or agent
+        self._model = model
+        self.temperature = temperature
+        self.max_output_tokens = max_output_tokens
+        self.top_p = top_p
+        self.top_k = top_k
+        self.client = client or llm
+
+    def _route(self, task: Optional[str] = None) -> Tuple[Optional[str], str]:
+        if self._model:
+            return None, self._model
+        return model_router.resolve(task or self.task)
+
+    def model_for(self, task: Optional[str] = None) -> str:
+        """현재 컨텍스트 기준 task의 모델명 (캐시 키/로그용)"""
+        return self._route(task)[1]
+
+    @property
+    def model(self) -> str:
+        return self.model_for()
+
+    @property
+    def model_name(self) -> str:
+        return self.model
+
+    def output_limit(self, task: Optional[str] = None) -> Optional[int]:
+        """현재 컨텍스트 기준 task 호출의 max_output_tokens (티어 thinking 여유분 포함)"""
+        return model_router.output_limit(self._route(task)[0], self.max_output_tokens)
+
+    def _kwargs(self, temperature: Optional[float], attrs: Dict[str, Any]) -> Dict[str, Any]:
+        task = attrs.pop("task", None) or self.task
+        tier, model = self._route(task)
+        return {
+            "agent": self.agent,
+            "model": model,
+            "temperature": self.temperature if temperature is None else temperature,
+            "max_output_tokens": model_router.output_limit(tier, self.max_output_tokens),
+            "top_p": self.top_p,
+            "top_k": self.top_k,
+            "task": task,
+            "tier": tier,
+            **attrs,
+        }
+
+    def generate(self, prompt: str, temperature: Optional[float] = None, **attrs: Any) -> str:
+        return self.client.generate_sync(prompt, **self._kwargs(temperature, attrs))
+
+    generate_text = generate
+
+    def candidates(self, prompt: str, n: int, temperature: Optional[float] = None, diversity: float = 0.0,
+                   native: bool = False, on_candidate: Optional[Callable[[int, str], None]] = None,
+                   schema: Optional[Type[BaseModel]] = None, **attrs: Any) -> List[str]:
+        """후보 n개 (병렬 + temperature 분산, 또는 candidate_count 단일 호출) — schema 지정 시 JSON 모드"""
+        kwargs = self._kwargs(temperature, attrs)
+        if schema is not None:
+            kwargs.update(json_mode(schema))
+        base = kwargs.pop("temperature")
+        return self.client.candidates_sync(prompt, n, temperature=base, diversity=diversity, native=native,
+                                           on_candidate=on_candidate, **kwargs)
+
+    def generate_json(self, prompt: str, schema: Type[BaseModel], temperature: Optional[float] = None,
+                      repair_task: str = "json.repair", **attrs: Any) -> Dict[str, Any]:
+        """구조화 출력 (스키마 검증, 실패 시 리페어 1회) — 검증된 dict (None 필드 제외, 원래 키 이름)"""
+        kwargs = self._kwargs(temperature, attrs)
+        return self.client.generate_json_sync(prompt, schema, repair_task=repair_task, **kwargs).to_dict()
+
+    def parse_json(self, text: str, schema: Type[BaseModel], repair_task: str = "json.repair",
+                   **attrs: Any) -> Dict[str, Any]:
+        """이미 받은 응답(예: candidates 결과)을 검증 — 실패 시 리페어 1회"""
+        return self.client.validate_or_repair(text, schema, agent=self.agent, repair_task=repair_task,
+                                              **attrs).to_dict()
+
+    def stream(self, prompt: str, on_text: Callable[[str], None], temperature: Optional[float] = None,
+               **attrs: Any) -> str:
+        """스트리밍 생성 — on_text(누적 text) 호출 후 최종 text 반환"""
+        return self.client.generate_sync(prompt, on_text=on_text, **self._kwargs(temperature, attrs))
+
+    async def agenerate(self, prompt: str, temperature: Optional[float] = None, **attrs: Any) -> str:
+        return await self.client.generate(prompt, **self._kwargs(temperature, attrs))
+
+    async def generate_many(self, prompts: Sequence[str], temperature: Optional[float] = None,
+                            return_exceptions: bool = False, **attrs: Any) -> List[Any]:
+        return await self.client.generate_many(prompts, return_exceptions=return_exceptions,
+                                               **self._kwargs(temperature, attrs))
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+LLMMetrics (LLM 호출별 토큰/지연 집계)
+- 호출 1건마다: agent · model · task/tier · section · prompt_file · prompt/output 토큰 · latency · 재시도 횟수 · 캐시 여부
+- 집계 단위
+    * 케이스(생성 1건): collect() 컨텍스트 안에서 발생한 호출 — 파이프라인 종료 시 PipelineContext.llm_usage
+    * 프로세스 전체: (agent, model, prompt_file)별 · 모델 티어별 누적 — /api/v1/medicontent/llm-metrics
+- 에이전트별 최근 지연 시간(최대 LLM_METRICS_WINDOW건)을 보관해 백분위 조회 가능 (latency_percentile)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, List, Optional
+
+LLM_METRICS_WINDOW = int(os.getenv("LLM_METRICS_WINDOW", "200"))
+
+_FIELDS = ("calls", "cache_hits", "errors", "retries", "prompt_tokens", "output_tokens", "latency_ms")
+
+
+def _empty() -> Dict[str, Any]:
+    return {k: 0 for k in _FIELDS} | {"max_latency_ms": 0.0}
+
+
+def _add(bucket: Dict[str, Any], call: Dict[str, Any]) -> None:
+    bucket["calls"] += 1
+    bucket["cache_hits"] += 1 if call.get("cache") else 0
+    bucket["errors"] += 0 if call.get("ok", True) else 1
+    bucket["retries"] += call.get("retries", 0)
+    bucket["prompt_tokens"] += call.get("prompt_tokens") or 0
+    bucket["output_tokens"] += call.get("output_tokens") or 0
+    bucket["latency_ms"] = round(bucket["latency_ms"] + call.get("latency_ms", 0.0), 2)
+    bucket["max_latency_ms"] = max(bucket["max_latency_ms"], call.get("latency_ms", 0.0))
+
+
+def _tier_key(call: Dict[str, Any]) -> str:
+    """티어 집계 키 (모델을 직접 지정한 호출은 'fixed')"""
+    return f"{call.get('tier') or 'fixed'}:{call['model']}"
+
+
+def _finish(bucket: Dict[str, Any]) -> Dict[str, Any]:
+    out = dict(bucket)
+    out["avg_latency_ms"] = round(bucket["latency_ms"] / bucket["calls"], 2) if bucket["calls"] else 0.0
+    return out
+
+
+class CaseUsage:
+    """생성 1건 동안의 LLM 호출 기록 (단계 스레드들이 같은 객체에 append)"""
+
+    def __init__(self):
+        self.calls: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, call: Dict[str, Any]) -> None:
+        with self._lock:
+            self.calls.append(call)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = list(self.calls)
+        total, by_agent, by_prompt, by_tier = _empty(), {}, {}, {}
+        for c in calls:
+            _add(total, c)
+            _add(by_agent.setdefault(c["agent"], _empty()), c)
+            _add(by_prompt.setdefault(c.get("prompt_file") or c["agent"], _empty()), c)
+            _add(by_tier.setdefault(_tier_key(c), _empty()), c)
+        return {
+            "total": _finish(total),
+            "by_agent": {k: _finish(v) for k, v in by_agent.items()},
+            "by_prompt_file": {k: _finish(v) for k, v in by_prompt.items()},
+            "by_tier": {k: _finish(v) for k, v in by_tier.items()},
+            "calls": calls,
+        }
+
+
+_case: contextvars.ContextVar[Optional[CaseUsage]] = contextvars.ContextVar("llm_case_usage", default=None)
+
+
+@contextmanager
+def collect():
+    """이 컨텍스트(및 copy_context로 전달된 단계 스레드)의 LLM 호출을 케이스 단위로 수집"""
+    usage = CaseUsage()
+    token = _case.set(usage)
+    try:
+        yield usage
+    finally:
+        _case.reset(token)
+
+
+class LLMMetrics:
+    def __init__(self, window: int = LLM_METRICS_WINDOW):
+        self.window = max(1, window)
+        self._totals: Dict[tuple, Dict[str, Any]] = {}
+        self._tiers: Dict[str, Dict[str, Any]] = {}
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, *, agent: str, model: str, latency_ms: float, prompt_tokens: Optional[int] = None,
+               output_tokens: Optional[int] = None, retries: int = 0, cache: bool = False, ok: bool = True,
+               section: Optional[str] = None, prompt_file: Optional[str] = None, **extra: Any) -> Dict[str, Any]:
+        call = {
+            "agent": agent,
+            "model": model,
+            "section": section,
+            "prompt_file": prompt_file,
+            "prompt_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+            "latency_ms": round(latency_ms, 2),
+            "retries": retries,
+            "cache": cache,
+            "ok": ok,
+            **extra,
+        }
+        with self._lock:
+            _add(self._totals.setdefault((agent, model, prompt_file or ""), _empty()), call)
+            _add(self._tiers.setdefault(_tier_key(call), _empty()), call)
+            if ok and not cache:
+                self._latencies.setdefault(agent, deque(maxlen=self.window)).append(call["latency_ms"])
+        usage = _case.get()
+        if usage is not None:
+            usage.add(call)
+        return call
+
+    def latency_percentile(self, agent: str, pct: float) -> Optional[float]:
+        """에이전트 최근 호출 지연의 백분위(ms) — 표본이 10건 미만이면 None"""
+        with self._lock:
+            samples = sorted(self._latencies.get(agent, ()))
+        if len(samples) < 10:
+            return None
+        idx = min(len(samples) - 1, max(0, int(round(pct / 100.0 * (len(samples) - 1)))))
+        return samples[idx]
+
+    def stats(self) -> Dict[str, Any]:
+        """(agent, model, prompt_file)별 누적 + 티어별 누적 + 에이전트별 p50/p95 지연"""
+        with self._lock:
+            totals = {k: dict(v) for k, v in self._totals.items()}
+            tiers = {k: _finish(v) for k, v in self._tiers.items()}
+            agents = list(self._latencies)
+        rows = [
+            {"agent": a, "model": m, "prompt_file": p or None, **_finish(v)}
+            for (a, m, p), v in sorted(totals.items())
+        ]
+        total = _empty()
+        for v in totals.values():
+            for k in _FIELDS:
+                total[k] += v[k]
+            total["max_latency_ms"] = max(total["max_latency_ms"], v["max_latency_ms"])
+        total["latency_ms"] = round(total["latency_ms"], 2)
+        return {
+            "total": _finish(total),
+            "latency_ms": {
+                a: {"p50": self.latency_percentile(a, 50), "p95": self.latency_percentile(a, 95)}
+                for a in agents
+            },
+            "by_prompt": rows,
+            "by_tier": tiers,
+        }
+
+
+llm_metrics = LLMMetrics()
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+LLMReplay (네트워크/Gemini 키 없이 파이프라인을 돌리기 위한 오프라인 LLM 대역)
+- LLM_BACKEND=replay 면 llm_client가 GenerativeModel 대신 ReplayModel을 사용
+  (레이트 리미터·재시도·메트릭·캐시 경로는 실제 호출과 동일하게 거침 → 벤치마크/부하 테스트용)
+- 응답 선택 순서
+    1) 정확 일치 : test_logs의 plan_logs(prompt → llm_raw)
+    2) 앞부분 일치: 프롬프트 앞 1200자 — content_log의 prompt_rendered_preview → 같은 timestamp content.json 섹션 본문
+    3) 녹화 풀   : 같은 에이전트(섹션)의 녹화 응답 중 프롬프트 해시로 결정적 선택 (title.json 후보 등)
+    4) 합성 응답 : 에이전트별 형식(plan/title/evaluation JSON, content 본문)을 프롬프트 해시로 결정적 생성
+- 지연/오류 주입
+    LLM_REPLAY_LATENCY_MS(기본 800) + 0~LLM_REPLAY_JITTER_MS(기본 400) + 출력 토큰당 LLM_REPLAY_MS_PER_TOKEN(기본 2)
+    LLM_REPLAY_ERROR_RATE(기본 0) : 일반 오류(500) 확률, LLM_REPLAY_THROTTLE_RATE(기본 0) : 429(Retry-After 1초) 확률
+    LLM_REPLAY_SEED(기본 0) : 지연/오류 난수 시드
+- 녹화 디렉터리: LLM_REPLAY_LOG_DIR(기본 test_logs)
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.agents.rate_limiter import estimate_tokens
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+LLM_REPLAY_LOG_DIR = Path(os.getenv("LLM_REPLAY_LOG_DIR", "test_logs"))
+LLM_REPLAY_LATENCY_MS = float(os.getenv("LLM_REPLAY_LATENCY_MS", "800"))
+LLM_REPLAY_JITTER_MS = float(os.getenv("LLM_REPLAY_JITTER_MS", "400"))
+LLM_REPLAY_MS_PER_TOKEN = float(os.getenv("LLM_REPLAY_MS_PER_TOKEN", "2"))
+LLM_REPLAY_ERROR_RATE = float(os.getenv("LLM_REPLAY_ERROR_RATE", "0"))
+LLM_REPLAY_THROTTLE_RATE = float(os.getenv("LLM_REPLAY_THROTTLE_RATE", "0"))
+LLM_REPLAY_SEED = int(os.getenv("LLM_REPLAY_SEED", "0"))
+
+PREFIX_CHARS = 1200  # content_agent가 기록하는 prompt_rendered_preview 길이
+STREAM_CHUNK_CHARS = 80
+
+_GIF_MARKER_RE = re.compile(r"\s*\([^()]*\.gif\)")
+
+SECTION_KEYS = ["1_intro", "2_visit", "3_inspection", "4_doctor_tip", "5_treatment", "6_check_point", "7_conclusion"]
+
+
+class ReplayError(Exception):
+    """주입된 오류 — code 속성으로 rate_limiter.is_throttle_error 판정"""
+
+    def __init__(self, message: str, code: int = 500):
+        super().__init__(message)
+        self.code = code
+
+
+def _norm(text: str) -> str:
+    return " ".join((text or "").split())
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(_norm(text).encode("utf-8")).hexdigest()
+
+
+def _pick(items: List[str], prompt: str, salt: int = 0) -> str:
+    idx = int(hashlib.sha256(f"{salt}:{prompt}".encode("utf-8")).hexdigest(), 16) % len(items)
+    return items[idx]
+
+
+def _read_json(path: Path) -> Dict[str, Any]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+class ReplayIndex:
+    """test_logs 녹화 응답 색인 (최초 조회 시 1회 로딩)"""
+
+    def __init__(self, log_dir: Path = LLM_REPLAY_LOG_DIR):
+        self.log_dir = Path(log_dir)
+        self.exact: Dict[str, str] = {}
+        self.prefix: Dict[str, List[str]] = {}
+        self.pools: Dict[Tuple[str, str], List[str]] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _add(self, agent: str, section: str, prompt: Optional[str], raw: str) -> None:
+        if not raw or not raw.strip():
+            return
+        if prompt:
+            self.exact[_digest(prompt)] = raw
+            self.prefix.setdefault(_digest(prompt[:PREFIX_CHARS]), []).append(raw)
+        self.pools.setdefault((agent, section), []).append(raw)
+
+    def _load(self) -> None:
+        if not self.log_dir.exists():
+            print(f"⚠️ LLM 리플레이: 녹화 디렉터리 없음 ({self.log_dir}) — 합성 응답만 사용")
+            return
+        for p in sorted(self.log_dir.rglob("*_plan_logs.json")):
+            log = _read_json(p)
+            self._add("plan", "", log.get("prompt"), log.get("llm_raw") or "")
+        for p in sorted(self.log_dir.rglob("*_content_log.json")):
+            log = _read_json(p)
+            content = _read_json(p.with_name(p.name.replace("_content_log.json", "_content.json")))
+            for sec, info in (log.get("sections") or {}).items():
+                text = ((content.get("sections") or {}).get(sec) or {}).get("text") or info.get("llm_raw_preview") or ""
+                # 후처리로 치환된 GIF 경로 → 감정 마커
+                self._add("content", sec, info.get("prompt_rendered_preview"), _GIF_MARKER_RE.sub(" (일반)", text))
+        for p in sorted(self.log_dir.rglob("*_title.json")):
+            obj = _read_json(p)
+            if obj.get("candidates"):
+                self._add("title", "", None, json.dumps(obj, ensure_ascii=False))
+        pools = ", ".join(f"{a}{':' + s if s else ''}={len(v)}" for (a, s), v in sorted(self.pools.items()))
+        print(f"🎞️ LLM 리플레이 색인: 정확 {len(self.exact)}건 · 풀 {pools or '-'}")
+
+    def ensure(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+
+    def lookup(self, prompt: str, agent: str, section: str = "", salt: int = 0,
+               exact: bool = True) -> Tuple[Optional[str], str]:
+        """(응답, 출처) — 출처: exact | prefix | pool | "" (없음), exact=False면 정확 일치 생략(추가 후보용)"""
+        self.ensure()
+        raw = self.exact.get(_digest(prompt)) if exact else None
+        if raw is not None:
+            return raw, "exact"
+        found = self.prefix.get(_digest(prompt[:PREFIX_CHARS]))
+        if found:
+            return _pick(found, prompt, salt), "prefix"
+        pool = self.pools.get((agent, section)) or self.pools.get((agent, ""))
+        if pool:
+            return _pick(pool, prompt, salt), "pool"
+        return None, ""
+
+
+# --- 합성 응답 (녹화가 없을 때, 프롬프트 해시로 결정적) ---
+_SENTENCES = [
+    "치아 건강은 작은 습관에서 시작됩니다.",
+    "증상이 느껴진다면 미루지 말고 상태를 확인해 보시는 것이 좋아요.",
+    "검사를 통해 현재 상태를 정확히 파악하는 과정이 먼저입니다.",
+    "치료 방법은 개인의 구강 상태에 따라 달라질 수 있습니다.",
+    "치료 후에도 꾸준한 관리가 결과를 오래 유지하는 데 도움이 됩니다.",
+    "궁금한 점은 진료 시 편하게 여쭤봐 주세요.",
+    "정기적인 검진으로 작은 변화도 놓치지 않는 것이 중요해요.",
+]
+
+
+def _synthetic_text(prompt: str, salt: int) -> str:
+    rnd = random.Random(f"{salt}:{_digest(prompt)}")
+    paras = ["\n".join(rnd.sample(_SENTENCES, 2)) for _ in range(3)]
+    return "\n\n".join(paras) + " (일반)"
+
+
+def _synthetic_plan(prompt: str, salt: int) -> str:
+    rnd = random.Random(f"{salt}:{_digest(prompt)}")
+    sections = {
+        k: {
+            "subtitle": f"{k.split('_', 1)[1]} 안내",
+            "summary": " ".join(rnd.sample(_SENTENCES, 2)),
+            "write_instruction": "톤=전문적이고 친절하게, 300~500자, 과장/비교/보장 표현 금지",
+            "must_include": [],
+            "may_include": [],
+            "must_not_include": ["가격", "이벤트"],
+            "image_binding": [],
+        }
+        for k in SECTION_KEYS
+    }
+    return json.dumps({
+        "title_plan": {"guidance": "지역 + 카테고리 + 핵심 키워드", "must_include_one_of": [],
+                       "must_not_include": ["가격", "이벤트", "최고", "완치"], "tone": "전문적·친절한 의사 설명"},
+        "content_plan": {"sections_order": SECTION_KEYS, "sections": sections},
+    }, ensure_ascii=False)
+
+
+def _synthetic_title(prompt: str, salt: int) -> str:
+    rnd = random.Random(f"{salt}:{_digest(prompt)}")
+    heads = ["치아 건강 관리", "검진부터 치료까지", "치료 전 알아둘 점", "치료 후 관리 안내", "편안한 진료 과정"]
+    cands = [{"title": f"{h}: 꼭 확인해야 할 체크포인트", "angle": "정보 제공 관점"} for h in rnd.sample(heads, 3)]
+    return json.dumps({"candidates": cands, "selected": {"title": cands[0]["title"], "why_best": "합성 응답"}},
+                      ensure_ascii=False)
+
+
+def _synthetic_evaluation(prompt: str, salt: int, prompt_file: str) -> str:
+    if "regeneration" in prompt_file:
+        return json.dumps({"stage": "content", "patch_units": [], "notes": "합성 응답"}, ensure_ascii=False)
+    items = 9 if "seo" in prompt_file else 15
+    return json.dumps({"평가결과": {str(i): 0 for i in range(1, items + 1)}, "상세분석": "합성 응답", "권고수정": []},
+                      ensure_ascii=False)
+
+
+def synthetic_response(prompt: str, agent: str, prompt_file: str = "", salt: int = 0) -> str:
+    if agent == "plan":
+        return _synthetic_plan(prompt, salt)
+    if agent == "title":
+        return _synthetic_title(prompt, salt)
+    if agent == "evaluation":
+        return _synthetic_evaluation(prompt, salt, prompt_file or "")
+    return _synthetic_text(prompt, salt)
+
+
+# --- GenerativeModel 대역 ---
+def _response(texts: List[str], prompt: str, final: bool = True) -> SimpleNamespace:
+    cands = [SimpleNamespace(content=SimpleNamespace(parts=[SimpleNamespace(text=t)])) for t in texts]
+    out_tokens = sum(estimate_tokens(t) for t in texts)
+    usage = SimpleNamespace(prompt_token_count=estimate_tokens(prompt), candidates_token_count=out_tokens,
+                            total_token_count=estimate_tokens(prompt) + out_tokens) if final else None
+    return SimpleNamespace(text=texts[0] if texts else "", candidates=cands, usage_metadata=usage)
+
+
+class ReplayModel:
+    """generate_content(prompt, stream=..., request_options=...) 만 흉내 (llm_client가 쓰는 범위)"""
+
+    def __init__(self, backend: "LLMReplay", model: str, agent: str, section: str = "",
+                 prompt_file: str = "", candidate_count: int = 1, temperature: Optional[float] = None, **_: Any):
+        self.backend = backend
+        self.model_name = model
+        self.agent = agent
+        self.section = section or ""
+        self.prompt_file = prompt_file or ""
+        self.candidate_count = max(1, candidate_count or 1)
+        # temperature가 다르면 다른 녹화/합성 응답 (후보 다양성)
+        self.salt = int(round((temperature or 0.0) * 1000))
+
+    def _texts(self, prompt: str) -> List[str]:
+        texts = []
+        for i in range(self.candidate_count):
+            salt = self.salt + i
+            raw, source = self.backend.index.lookup(prompt, self.agent, self.section, salt=salt, exact=i == 0)
+            if raw is None:
+                raw, source = synthetic_response(prompt, self.agent, self.prompt_file, salt), "synthetic"
+            self.backend.count(source)
+            texts.append(raw)
+        return texts
+
+    def generate_content(self, prompt: str, stream: bool = False, request_options: Optional[Dict] = None):
+        self.backend.inject_error(self.model_name)
+        texts = self._texts(prompt)
+        if not stream:
+            self.backend.sleep(sum(estimate_tokens(t) for t in texts))
+            return _response(texts, prompt)
+        return _ReplayStream(self.backend, texts[0], prompt)
+
+
+class _ReplayStream:
+    """스트리밍 응답 — 조각 단위로 지연, 순회가 끝나면 usage_metadata 설정 (genai 스트림 응답과 동일)"""
+
+    def __init__(self, backend: "LLMReplay", text: str, prompt: str):
+        self.backend = backend
+        self.text = text
+        self.prompt = prompt
+        self.usage_metadata = None
+
+    def __iter__(self) -> Iterator[SimpleNamespace]:
+        text = self.text
+        chunks = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)] or [""]
+        self.backend.sleep(0)  # 첫 조각까지의 지연
+        for i, chunk in enumerate(chunks):
+            if i:
+                self.backend.sleep(estimate_tokens(chunk), base=False)
+            yield _response([chunk], self.prompt, final=False)
+        self.usage_metadata = _response([text], self.prompt).usage_metadata
+
+
+class LLMReplay:
+    def __init__(self, index: Optional[ReplayIndex] = None, latency_ms: float = LLM_REPLAY_LATENCY_MS,
+                 jitter_ms: float = LLM_REPLAY_JITTER_MS, ms_per_token: float = LLM_REPLAY_MS_PER_TOKEN,
+                 error_rate: float = LLM_REPLAY_ERROR_RATE, throttle_rate: float = LLM_REPLAY_THROTTLE_RATE,
+                 seed: int = LLM_REPLAY_SEED):
+        self.index = index or ReplayIndex()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.ms_per_token = ms_per_token
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {}
+
+    def _random(self) -> float:
+        with self._lock:
+            return self._rnd.random()
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] = self._stats.get(name, 0) + 1
+
+    def sleep(self, output_tokens: int, base: bool = True) -> None:
+        ms = output_tokens * self.ms_per_token
+        if base:
+            ms += self.latency_ms + self._random() * self.jitter_ms
+        if ms > 0:
+            time.sleep(ms / 1000.0)
+
+    def inject_error(self, model: str) -> None:
+        r = self._random()
+        if r < self.throttle_rate:
+            self.count("throttled")
+            raise ReplayError(f"429 Resource exhausted (replay: {model}), retry in 1s", code=429)
+        if r < self.throttle_rate + self.error_rate:
+            self.count("errors")
+            raise ReplayError(f"500 Internal error (replay: {model})", code=500)
+
+    def model(self, model: str, agent: str, section: Optional[str] = None, prompt_file: Optional[str] = None,
+              **config: Any) -> ReplayModel:
+        return ReplayModel(self, model, agent, section=section or "", prompt_file=prompt_file or "", **config)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"backend": LLM_BACKEND, **self._stats}
+
+
+replay = LLMReplay()
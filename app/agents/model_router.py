@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+ModelRouter (작업별 모델 티어 라우팅)
+- 티어 → 모델: lite = settings.GEMINI_LITE_MODEL, strong = settings.GEMINI_MODEL
+- 작업(task) → 티어: DEFAULT_ROUTES (환경변수 LLM_ROUTES="task=tier,..." 로 덮어쓰기)
+    * 짧고 지연에 민감한 단계(제목 후보/선택, plan/공용 JSON 리페어, 재생성 적합성 확인) → lite
+    * 장문 섹션 작성, 의료법 준수 평가/수정 패치, plan 기획 → strong
+- 요청 단위 덮어쓰기: override({"content.section": "lite"}) 또는 override({"*": "lite"})
+  (contextvar — copy_context로 전달되는 단계 스레드/후보 호출에도 적용)
+- 요청 마감 시간이 DEADLINE_DEGRADE_SEC 미만으로 남으면 (덮어쓰기가 없는 작업은) lite 티어 (deadline.py)
+- 티어별 출력 한도: strong(gemini-2.5-pro)은 thinking을 끌 수 없고 thinking 토큰도 max_output_tokens에 포함되므로
+  에이전트가 지정한 본문 길이에 티어별 여유분(TIER_THINKING_TOKENS)을 더해 호출 (output_limit)
+    * 환경변수 LLM_THINKING_TOKENS="strong=8192,lite=0" 로 덮어쓰기
+- 호출마다 task/tier가 llm_metrics 호출 기록과 span 속성에 포함됨
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import contextvars
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Mapping, Optional, Tuple
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # 스크립트 실행 시에도 app.* import 가능하도록
+from app.config import settings
+from app.agents import deadline
+
+LITE, STRONG = "lite", "strong"
+
+MODEL_TIERS: Dict[str, str] = {
+    LITE: settings.GEMINI_LITE_MODEL or "gemini-2.5-flash-lite",
+    STRONG: settings.GEMINI_MODEL or "gemini-2.5-pro",
+}
+
+DEFAULT_ROUTES: Dict[str, str] = {
+    "plan.generate": STRONG,
+    "plan.repair": LITE,
+    "json.repair": LITE,
+    "title.generate": LITE,
+    "title.select": LITE,
+    "content.section": STRONG,
+    "evaluation.compliance": STRONG,
+    "evaluation.regenerate": STRONG,
+    "evaluation.regen_fit": LITE,
+}
+
+
+# 티어별 thinking 여유 토큰 — flash-lite는 기본적으로 thinking 없음
+DEFAULT_THINKING_TOKENS: Dict[str, int] = {
+    LITE: 0,
+    STRONG: 8192,
+}
+
+
+def _parse_thinking(raw: str) -> Dict[str, int]:
+    out = {}
+    for item in (raw or "").split(","):
+        if "=" not in item:
+            continue
+        tier, value = (x.strip() for x in item.split("=", 1))
+        try:
+            if tier not in MODEL_TIERS:
+                raise ValueError(tier)
+            out[tier] = max(0, int(value))
+        except ValueError:
+            print(f"⚠️ LLM_THINKING_TOKENS 값 무시: {item}")
+    return out
+
+
+TIER_THINKING_TOKENS: Dict[str, int] = {**DEFAULT_THINKING_TOKENS,
+                                        **_parse_thinking(os.getenv("LLM_THINKING_TOKENS", ""))}
+
+
+def _parse_routes(raw: str) -> Dict[str, str]:
+    routes = {}
+    for item in (raw or "").split(","):
+        if "=" not in item:
+            continue
+        task, tier = (x.strip() for x in item.split("=", 1))
+        if tier not in MODEL_TIERS:
+            print(f"⚠️ LLM_ROUTES 값 무시(알 수 없는 티어): {item}")
+            continue
+        routes[task] = tier
+    return routes
+
+
+ROUTES: Dict[str, str] = {**DEFAULT_ROUTES, **_parse_routes(os.getenv("LLM_ROUTES", ""))}
+
+_overrides: contextvars.ContextVar[Mapping[str, str]] = contextvars.ContextVar("model_tier_overrides", default={})
+
+
+def validate_tiers(tiers: Optional[Mapping[str, str]]) -> Dict[str, str]:
+    """요청 단위 덮어쓰기 검증 — 알 수 없는 티어면 ValueError"""
+    tiers = dict(tiers or {})
+    bad = {k: v for k, v in tiers.items() if v not in MODEL_TIERS}
+    if bad:
+        raise ValueError(f"알 수 없는 모델 티어: {bad} (사용 가능: {sorted(MODEL_TIERS)})")
+    return tiers
+
+
+@contextmanager
+def override(tiers: Optional[Mapping[str, str]]):
+    """이 컨텍스트에서 작업별 티어 덮어쓰기 ("*" 는 모든 작업)"""
+    token = _overrides.set({**_overrides.get(), **validate_tiers(tiers)})
+    try:
+        yield
+    finally:
+        _overrides.reset(token)
+
+
+def tier_for(task: str) -> str:
+    """요청 단위 덮어쓰기 > 마감 임박(lite) > LLM_ROUTES/기본 표"""
+    ov = _overrides.get()
+    tier = ov.get(task) or ov.get("*")
+    if tier:
+        return tier
+    tier = ROUTES.get(task) or ROUTES.get(task.split(".", 1)[0]) or STRONG
+    if tier != LITE and deadline.degrade(f"tier:{task}", LITE):
+        return LITE
+    return tier
+
+
+def resolve(task: str) -> Tuple[str, str]:
+    """(티어, 모델명)"""
+    tier = tier_for(task)
+    return tier, MODEL_TIERS[tier]
+
+
+def output_limit(tier: Optional[str], max_output_tokens: Optional[int]) -> Optional[int]:
+    """호출에 넘길 max_output_tokens — 본문 한도 + 티어 thinking 여유분 (한도 미지정·모델 직접 지정이면 그대로)"""
+    if max_output_tokens is None or tier is None:
+        return max_output_tokens
+    return max_output_tokens + TIER_THINKING_TOKENS.get(tier, 0)
+
+
+def routes() -> Dict[str, Dict[str, str]]:
+    """현재 컨텍스트 기준 작업별 티어/모델"""
+    return {task: dict(zip(("tier", "model"), resolve(task))) for task in sorted(ROUTES)}
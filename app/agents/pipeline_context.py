@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+PipelineContext (에이전트 간 인메모리 핸드오프)
+- InputAgent → PlanAgent → TitleAgent → ContentAgent 산출물을 한 객체로 직접 전달
+- "최신 파일 탐색(_latest_*)" 대신 사용 → 동시 요청 간 plan/title 교차 오염 방지
+- 디스크 저장(test_logs/{mode}/{YYYYMMDD}/...)은 persist=True 일 때만 수행되는 부수효과
+- reference 가 있으면 참조 데이터/프롬프트를 파일 대신 메모리에서 사용
+- on_event 콜백이 있으면 단계 완료 시점마다 emit() → 진행 상황 스트리밍(SSE)에 사용
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from app.agents.reference_data import ReferenceData
+
+
+@dataclass
+class PipelineContext:
+    mode: str = "use"
+    persist: bool = True
+    force: bool = False   # True면 단계 캐시(stage_cache)를 무시하고 LLM 재호출
+    stream: bool = False  # True면 섹션 본문을 스트리밍 생성하고 미리보기를 section_partial 이벤트로 전달
+    model_tiers: Dict[str, str] = field(default_factory=dict)  # 작업별 모델 티어 덮어쓰기 (model_router.override)
+
+    # 단계별 산출물
+    input_row: Optional[Dict[str, Any]] = None   # InputAgent.collect 결과
+    plan: Optional[Dict[str, Any]] = None        # PlanAgent 결과
+    title: Optional[Dict[str, Any]] = None       # TitleAgent 결과 {"candidates": [...], "selected": {...}}
+    content: Optional[Dict[str, Any]] = None     # ContentAgent 결과
+
+    # 제목과 무관하게 미리 생성된 섹션 초안 {section_key: {"prompt", "raw"}} / 섹션별 후보 이미지
+    section_drafts: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    section_images: Optional[Dict[str, List[Dict[str, str]]]] = None
+
+    # 단계별 소요 시간(초) — 파이프라인 DAG 실행 시 기록
+    stage_timings: Dict[str, float] = field(default_factory=dict)
+
+    # LLM 호출 토큰/지연 집계 (llm_metrics.CaseUsage.summary) — 파이프라인 DAG 실행 시 기록
+    llm_usage: Optional[Dict[str, Any]] = None
+
+    # persist=True 일 때 저장된 파일 경로 (stage → path)
+    artifacts: Dict[str, str] = field(default_factory=dict)
+
+    # 미리 로딩된 참조 데이터/프롬프트 (배치 실행 시 공유, 없으면 각 에이전트가 직접 로딩)
+    reference: Optional["ReferenceData"] = field(default=None, repr=False)
+
+    # 진행 이벤트 콜백 (event, data) — 예: job_events 테이블 기록
+    on_event: Optional[Callable[[str, Dict[str, Any]], None]] = field(default=None, repr=False)
+
+    @property
+    def case_id(self) -> str:
+        return (self.input_row or {}).get("case_id", "")
+
+    @property
+    def selected_title(self) -> str:
+        return ((self.title or {}).get("selected") or {}).get("title", "")
+
+    def require(self, *stages: str) -> None:
+        """선행 단계 산출물이 채워졌는지 확인"""
+        missing = [s for s in stages if getattr(self, s, None) is None]
+        if missing:
+            raise ValueError(f"PipelineContext에 선행 단계 결과가 없습니다: {missing}")
+
+    def emit(self, event: str, data: Optional[Dict[str, Any]] = None) -> None:
+        """진행 이벤트 전달 (콜백 실패가 생성 파이프라인을 멈추지 않도록 예외는 삼킴)"""
+        if self.on_event is None:
+            return
+        try:
+            self.on_event(event, data or {})
+        except Exception as e:
+            print(f"⚠️ 진행 이벤트 전달 실패({event}): {e}")
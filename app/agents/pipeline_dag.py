@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Pipeline DAG (단계 의존성 그래프 스케줄러)
+- 각 단계는 선행 단계가 모두 끝나는 즉시 실행 → 전체 지연 = 임계 경로(critical path)
+- 생성 파이프라인 그래프:
+    input → plan ┬→ title ───────────────────────┐
+                 ├→ images (섹션별 후보 이미지)   ├→ content (순서대로 확정/조립/저장)
+                 └→ draft:{section} × 7 ──────────┘
+  · {title}을 참조하지 않는 섹션 초안은 제목 생성과 병행 (참조하는 섹션만 title 이후)
+- 단계별 소요 시간은 PipelineContext.stage_timings 에 기록, 각 단계는 "stage.{name}" span으로 추적
+- LLM 호출 토큰/지연은 PipelineContext.llm_usage 에 집계 (persist=True면 {timestamp}_llm_usage.json 저장)
+- PipelineContext.model_tiers(작업별 모델 티어 덮어쓰기)는 모든 단계 스레드에 적용 (model_router.override)
+- 요청 마감 시간(deadline.scope)도 contextvar로 모든 단계에 전달 — 만료 후에는 새 단계를 시작하지 않음
+"""
+
+from __future__ import annotations
+
+import sys
+import json
+import time
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, TYPE_CHECKING
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # 스크립트 실행 시에도 app.* import 가능하도록
+from app.agents import deadline, llm_metrics, model_router
+from app.utils.tracing import span
+
+if TYPE_CHECKING:
+    from app.agents.pipeline_context import PipelineContext
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[[], Any]
+    deps: Tuple[str, ...] = ()
+
+
+class StageGraph:
+    def __init__(self):
+        self._stages: Dict[str, Stage] = {}
+
+    def add(self, name: str, fn: Callable[[], Any], deps: Tuple[str, ...] = ()) -> "StageGraph":
+        """단계 등록 — 선행 단계는 먼저 등록되어 있어야 함 (순환 방지)"""
+        if name in self._stages:
+            raise ValueError(f"중복 단계: {name}")
+        missing = [d for d in deps if d not in self._stages]
+        if missing:
+            raise ValueError(f"'{name}'의 선행 단계가 등록되지 않았습니다: {missing}")
+        self._stages[name] = Stage(name=name, fn=fn, deps=tuple(deps))
+        return self
+
+    @staticmethod
+    def _run_stage(st: Stage) -> Any:
+        # 마감 시간이 지났으면 새 단계를 시작하지 않음 (남은 예산은 span 속성으로 기록)
+        deadline.check(f"stage.{st.name}")
+        left = deadline.remaining()
+        with span(f"stage.{st.name}", **({"deadline_left_sec": round(left, 2)} if left is not None else {})):
+            return st.fn()
+
+    def run(self, max_workers: int = 4, timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """준비된 단계부터 병렬 실행. 한 단계라도 실패하면 대기 중인 단계를 취소하고 예외 전파"""
+        results: Dict[str, Any] = {}
+        pending = dict(self._stages)
+        running: Dict[Future, str] = {}
+        started: Dict[str, float] = {}
+        timings = timings if timings is not None else {}
+
+        pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="pipeline-stage")
+        try:
+            while pending or running:
+                ready = [n for n, st in pending.items() if all(d in results for d in st.deps)]
+                for n in ready:
+                    st = pending.pop(n)
+                    started[n] = time.perf_counter()
+                    # 호출 스레드의 컨텍스트(trace span 등)를 단계별로 복사해 전달
+                    running[pool.submit(contextvars.copy_context().run, self._run_stage, st)] = n
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for fut in done:
+                    n = running.pop(fut)
+                    timings[n] = round(time.perf_counter() - started[n], 3)
+                    results[n] = fut.result()  # 실패 시 예외 전파
+        except BaseException:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        pool.shutdown(wait=True)
+        return results
+
+
+# =========================
+# 생성 파이프라인
+# =========================
+def run_generation_pipeline(ctx: "PipelineContext", input_data: Optional[dict] = None,
+                            max_workers: int = 8) -> "PipelineContext":
+    """Input → Plan → (Title ∥ 섹션 초안 ∥ 이미지) → Content 를 DAG로 실행하고 ctx를 반환"""
+    from app.agents.input_agent import InputAgent
+    from app.agents.plan_agent import main as plan_agent_main
+    from app.agents.title_agent import run as title_agent_run
+    from app.agents.content_agent import (
+        run as content_agent_run,
+        draft_section,
+        resolve_section_images,
+        section_partial_emitter,
+        section_needs_title,
+        DEFAULT_SECTIONS_ORDER,
+    )
+
+    resources = ctx.reference.input_resources if ctx.reference is not None else None
+
+    def _input():
+        return InputAgent(input_data=input_data, resources=resources).collect(mode=ctx.mode, ctx=ctx)
+
+    def _images():
+        ctx.section_images = resolve_section_images(ctx.plan, ctx.input_row)
+
+    def _draft(sec_key: str, needs_title: bool):
+        ctx.section_drafts[sec_key] = draft_section(
+            sec_key, ctx.plan, ctx.input_row,
+            title_obj=ctx.title if needs_title else None,
+            reference=ctx.reference, force=ctx.force,
+            on_partial=section_partial_emitter(ctx, sec_key) if ctx.stream else None,
+        )
+
+    g = StageGraph()
+    g.add("input", _input)
+    g.add("plan", partial(plan_agent_main, ctx=ctx), deps=("input",))
+    g.add("title", partial(title_agent_run, ctx=ctx), deps=("plan",))
+    g.add("images", _images, deps=("plan",))
+
+    draft_stages = []
+    for k in DEFAULT_SECTIONS_ORDER:
+        needs_title = section_needs_title(k, ctx.reference)
+        name = f"draft:{k}"
+        g.add(name, partial(_draft, k, needs_title), deps=("plan", "title") if needs_title else ("plan",))
+        draft_stages.append(name)
+
+    g.add("content", partial(content_agent_run, ctx=ctx), deps=("title", "images", *draft_stages))
+    with llm_metrics.collect() as usage, model_router.override(ctx.model_tiers):
+        try:
+            g.run(max_workers=max_workers, timings=ctx.stage_timings)
+        finally:
+            ctx.llm_usage = usage.summary()
+    if ctx.persist:
+        _save_llm_usage(ctx)
+    return ctx
+
+
+def _save_llm_usage(ctx: "PipelineContext") -> None:
+    now = datetime.now()
+    out_dir = Path(f"test_logs/{ctx.mode}/{now.strftime('%Y%m%d')}")
+    try:
+        out_dir.mkdir(parents=True, exist_ok=True)
+        out = out_dir / f"{now.strftime('%Y%m%d_%H%M%S')}_llm_usage.json"
+        out.write_text(json.dumps({"case_id": ctx.case_id, "stage_timings": ctx.stage_timings, **ctx.llm_usage},
+                                  ensure_ascii=False, indent=2), encoding="utf-8")
+        ctx.artifacts["llm_usage"] = str(out)
+    except Exception as e:
+        print(f"⚠️ LLM 사용량 로그 저장 실패: {e}")
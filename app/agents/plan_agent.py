@@ -2,9 +2,11 @@
 # -*- coding: utf-8 -*-
 """
 PlanAgent (프롬프트 기반 · 7섹션 · 이미지 바인딩 · 스키마 리페어)
-- 입력: input_agent 로그 최신 1건 또는 외부 dict
+- 입력: PipelineContext.input_row 또는 외부 dict (없으면 input_agent 로그 최신 1건)
 - 프롬프트: test_prompt/plan_generation_prompt.txt
-- 모델: Gemini (GEMINI_API_KEY 필수 · 항상 호출) — JSON 파싱 실패 시 코드 기반 fallback
+- 모델: Gemini (GEMINI_API_KEY 필수 · 항상 호출) — JSON 모드(response_schema=PlanResponse)
+  스키마 검증 실패 시 lite 모델 JSON 리페어 1회, 그래도 실패하면 코드 기반 fallback
+  (요청 마감 시간이 DEADLINE_FALLBACK_SEC 미만으로 남았으면 LLM 없이 바로 fallback)
 - 출력:
     - 본문: test_logs/{mode}/{YYYYMMDD}/{timestamp}_plan.json
     - 로그: test_logs/{mode}/{YYYYMMDD}/{timestamp}_plan_logs.json
@@ -13,64 +15,33 @@ PlanAgent (프롬프트 기반 · 7섹션 · 이미지 바인딩 · 스키마 
                          *구형* {YYYYMMDD}_input_log.json 도 자동 인식
 """
 
-import os, json, re, ast, time
+import os, sys, json, re, time
 from pathlib import Path
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # 스크립트 실행 시에도 app.* import 가능하도록
+from app.agents import deadline, stage_cache
+from app.agents.prompt_registry import CompiledTemplate, compile_template, prompts
+from app.agents.schemas import PlanResponse, gemini_schema, json_mode
+from app.utils.tracing import traced
+
+if TYPE_CHECKING:
+    from app.agents.pipeline_context import PipelineContext
+    from app.agents.reference_data import ReferenceData
 
 # =======================
 # 환경 & Gemini 클라이언트
 # =======================
 from dotenv import load_dotenv
-import google.generativeai as genai
+from app.agents.llm_client import LLM_BACKEND, GeminiClient
 
 load_dotenv()
 API_KEY = os.getenv("GEMINI_API_KEY")
-if not API_KEY:
+if not API_KEY and LLM_BACKEND != "replay":
     raise RuntimeError("GEMINI_API_KEY가 필요합니다(.env)")
-genai.configure(api_key=API_KEY)
-
 
-class GeminiClient:
-    def __init__(self, model="models/gemini-1.5-flash", temperature=0.7, max_output_tokens=8192):
-        self.model = model
-        self.temperature = temperature
-        self.max_output_tokens = max_output_tokens
-        self.max_retries = 3
-        self.retry_delay = 1.0
-
-    def generate_text(self, prompt: str, temperature: Optional[float] = None) -> str:
-        """Gemini 텍스트 생성(재시도 포함)"""
-        for attempt in range(self.max_retries):
-            try:
-                m = genai.GenerativeModel(self.model)
-                resp = m.generate_content(
-                    prompt,
-                    generation_config=genai.types.GenerationConfig(
-                        temperature=self.temperature if temperature is None else temperature,
-                        max_output_tokens=self.max_output_tokens,
-                        candidate_count=1,
-                        top_p=0.95,
-                        top_k=40,
-                    )
-                )
-                if getattr(resp, "text", None):
-                    return resp.text
-                if getattr(resp, "candidates", None):
-                    parts = getattr(resp.candidates[0].content, "parts", [])
-                    if parts and getattr(parts[0], "text", ""):
-                        return parts[0].text
-                raise ValueError("응답에 text 없음")
-            except Exception as e:
-                if attempt == self.max_retries - 1:
-                    raise
-                print(f"⚠️ Gemini 호출 실패 (시도 {attempt+1}/{self.max_retries}): {e}")
-                time.sleep(self.retry_delay * (2 ** attempt))
-
-        raise RuntimeError("모든 재시도 실패")
-
-
-gemini_client = GeminiClient()
+gemini_client = GeminiClient(agent="plan", task="plan.generate", temperature=0.7, max_output_tokens=8192)
 
 # ===============
 # 경로/시간 유틸
@@ -104,6 +75,7 @@ def _mtime(p: Path) -> float:
 # =======================================================
 # 최신 input 로그 탐색 (신규/구형 파일명 모두 지원, 최신 1건 반환)
 # =======================================================
+@traced("file.scan")
 def _latest_input_log(mode: str) -> Tuple[Optional[Path], Optional[dict]]:
     """
     우선순위:
@@ -354,12 +326,13 @@ def _fallback_plan(input_row: dict, mode: str) -> dict:
 # ===========================
 # 프롬프트 로딩 & 안전 치환
 # ===========================
-def _load_prompt() -> str:
-    if not PROMPT_PATH.exists():
-        raise FileNotFoundError(f"프롬프트 파일을 찾을 수 없습니다: {PROMPT_PATH}")
-    return PROMPT_PATH.read_text(encoding="utf-8")
+def _load_prompt(reference: Optional["ReferenceData"] = None) -> CompiledTemplate:
+    """컴파일된 plan 프롬프트 — 파일은 prompts 레지스트리에서 수정 시에만 다시 읽음 (참조 데이터가 있으면 그 원문)"""
+    if reference is not None:
+        return compile_template(reference.prompt(PROMPT_PATH))
+    return prompts.get(PROMPT_PATH)
 
-def _render_prompt(tpl: str, row: dict) -> str:
+def _render_prompt(tpl: CompiledTemplate, row: dict) -> str:
     """명시 변수만 {var}→값 치환. 다른 {중괄호}는 보존."""
     vars_map = {
         "hospital_name": _safe_get(row, "hospital.name", ""),
@@ -380,67 +353,24 @@ def _render_prompt(tpl: str, row: dict) -> str:
         "representative_persona": _safe_get(row, "representative_persona", ""),
         "clinical_context": json.dumps(_safe_get(row, "clinical_context", {}), ensure_ascii=False),
     }
-    # 이중 중괄호 보호
-    L, R = "§§__L__§§", "§§__R__§§"
-    work = tpl.replace("{{", L).replace("}}", R)
-
-    # {키}만 치환
-    pattern = re.compile(r"\{(" + "|".join(map(re.escape, vars_map.keys())) + r")\}")
-    work = pattern.sub(lambda m: str(vars_map.get(m.group(1), "")), work)
-
-    return work.replace(L, "{{").replace(R, "}}")
+    # 이중 중괄호 보존 · {키}만 치환 (템플릿은 원문 기준으로 1회만 파싱)
+    return tpl.render(vars_map)
 
 # ===================
 # LLM & JSON 파싱
 # ===================
-def _call_llm(prompt: str) -> str:
+def _call_llm(prompt: str) -> Tuple[str, dict]:
+    """
+    JSON 모드 호출 → PlanResponse 검증 (실패 시 plan.repair 티어로 리페어 1회, 그래도 실패하면 StructuredOutputError)
+    - 반환: (모델 원 응답 text, 검증/리페어된 dict) — 로그의 llm_raw는 원 응답 그대로 (리플레이 정확 일치용)
+    """
     sys_dir = (
         "You are a planning assistant. "
         "Output ONLY valid JSON. No prose. No markdown fences."
     )
     full_prompt = f"{sys_dir}\n\n{prompt}\n\nReturn only JSON."
-    return gemini_client.generate_text(full_prompt)
-
-def _try_json_load(s: str) -> Optional[dict]:
-    if not isinstance(s, str):
-        return None
-    s = s.strip()
-    # 코드블록 제거
-    s = re.sub(r"^```(json)?", "", s).strip()
-    s = re.sub(r"```$", "", s).strip()
-
-    # 1차: 그대로
-    try:
-        return json.loads(s)
-    except Exception:
-        pass
-
-    # 2차: 첫 '{' ~ 균형 '}' 추출 후 시도
-    start = s.find("{")
-    if start != -1:
-        depth, end = 0, -1
-        for i, ch in enumerate(s[start:], start=start):
-            if ch == "{":
-                depth += 1
-            elif ch == "}":
-                depth -= 1
-                if depth == 0:
-                    end = i + 1
-                    break
-        if end != -1:
-            try:
-                return json.loads(s[start:end])
-            except Exception:
-                pass
-
-    # 3차: 파이썬 dict 스타일
-    try:
-        obj = ast.literal_eval(s[start:end] if start != -1 and end != -1 else s)
-        if isinstance(obj, dict):
-            return obj
-    except Exception:
-        return None
-    return None
+    raw = gemini_client.generate(full_prompt, prompt_file=PROMPT_PATH.name, **json_mode(PlanResponse))
+    return raw, gemini_client.parse_json(raw, PlanResponse, repair_task="plan.repair", prompt_file=PROMPT_PATH.name)
 
 # =================
 # 스키마 리페어
@@ -580,7 +510,13 @@ def save_plan_log(log_payload: dict, mode: str) -> Path:
     _save_json(path, log_payload)
     return path
 
-def main(mode: str = "use", input_data: Optional[dict] = None):
+def main(mode: str = "use", input_data: Optional[dict] = None, ctx: Optional["PipelineContext"] = None):
+    persist, force = True, False
+    if ctx is not None:
+        ctx.require("input_row")
+        mode, persist, force = ctx.mode, ctx.persist, ctx.force
+        input_data = ctx.input_row
+
     # 입력 확보
     if input_data is None:
         src_path, row = _latest_input_log(mode)
@@ -595,26 +531,50 @@ def main(mode: str = "use", input_data: Optional[dict] = None):
     # 프롬프트 호출 → JSON 파싱 → 리페어
     plan_obj: dict
     llm_text: str = ""
+    llm_parsed: Optional[dict] = None
     prompt_rendered: str = ""
+    prompt_version: str = ""
     success = True
     error_msg = ""
 
     try:
         print("🔄 Gemini: plan 생성 중 ...")
-        tpl = _load_prompt()
+        tpl = _load_prompt(ctx.reference if ctx is not None else None)
+        prompt_version = tpl.version
         prompt_rendered = _render_prompt(tpl, row)
-        llm_text = _call_llm(prompt_rendered)
-        parsed = _try_json_load(llm_text)
-        if parsed is None:
-            raise ValueError("LLM JSON 파싱 실패")
+        cache_key = stage_cache.make_key(
+            "plan",
+            prompt=prompt_rendered,
+            model=gemini_client.model,
+            temperature=gemini_client.temperature,
+            prompt_version=prompt_version,
+            schema=gemini_schema(PlanResponse),
+        )
+        parsed = stage_cache.get("plan", cache_key, force=force)
+        if parsed is not None:
+            llm_text = "(stage cache hit)"
+            print("♻️ plan 캐시 사용 (동일 입력)")
+        elif deadline.fallback("plan", "LLM 생략, 코드 기반 fallback plan"):
+            raise deadline.DeadlineExceeded("마감 임박 — plan LLM 호출 생략")
+        else:
+            llm_text, parsed = _call_llm(prompt_rendered)
+            stage_cache.put("plan", cache_key, parsed)
+        llm_parsed = parsed
         plan_obj = _repair_plan(parsed, row, mode)
         print("✅ Gemini 계획 생성 성공")
     except Exception as e:
         success = False
         error_msg = str(e)
+        llm_text = getattr(e, "raw", "") or llm_text  # 스키마 검증·리페어 실패 시 원 응답
         print(f"⚠️ LLM 생성 또는 파싱 실패, fallback 사용: {e}")
         plan_obj = _fallback_plan(row, mode)
 
+    if ctx is not None:
+        ctx.plan = plan_obj
+        ctx.emit("plan_ready", {"plan": plan_obj, "fallback": not success})
+    if not persist:
+        return plan_obj
+
     # 저장
     plan_path = save_plan(plan_obj, mode)
 
@@ -625,7 +585,8 @@ def main(mode: str = "use", input_data: Optional[dict] = None):
             "timestamp": _now(),
             "model": gemini_client.model,
             "temperature": gemini_client.temperature,
-            "max_output_tokens": gemini_client.max_output_tokens,
+            "max_output_tokens": gemini_client.output_limit(),
+            "prompt_version": prompt_version,
             "success": success,
             "error": error_msg,
         },
@@ -635,6 +596,7 @@ def main(mode: str = "use", input_data: Optional[dict] = None):
         },
         "prompt": prompt_rendered,
         "llm_raw": llm_text,
+        "llm_parsed": llm_parsed,  # 스키마 검증(필요 시 리페어)을 거친 객체 — _repair_plan 보정 전
         "output_paths": {
             "plan_path": str(plan_path),
         },
@@ -647,6 +609,8 @@ def main(mode: str = "use", input_data: Optional[dict] = None):
 
     print(f"✅ plan 저장: {plan_path}")
     print(f"📝 로그 저장: {log_path}")
+    if ctx is not None:
+        ctx.artifacts["plan"] = str(plan_path)
     return plan_obj
 
 if __name__ == "__main__":
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+PromptContext (프롬프트에 붙이는 컨텍스트 JSON 압축)
+- select(): 프롬프트가 참조하는 필드만 남김 (템플릿 {변수} 슬롯 + 호출부가 지정한 필드 목록)
+- prune(): 빈 값("", [], {}, None) 제거 · 리스트 내 중복 항목 제거 · 연속 공백 축소
+- dedupe_values(): 중복으로 알려진 필드(REDUNDANT_FIELDS)만, 원본 필드와 값이 같을 때 제거 (예: save_name == hospital_name)
+- dumps(): 들여쓰기/공백 없는 JSON
+- report(): 압축 전/후 추정 토큰 수를 프롬프트별로 누적 — /api/v1/medicontent/llm-metrics 의 promptCompaction
+- 환경변수: PROMPT_CONTEXT_COMPACT(기본 true, false면 호출부가 기존 전체 컨텍스트를 그대로 사용)
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import json
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+from app.agents.rate_limiter import estimate_tokens
+
+PROMPT_CONTEXT_COMPACT = os.getenv("PROMPT_CONTEXT_COMPACT", "true").lower() != "false"
+
+_EMPTY = (None, "", [], {})
+# 중복 필드 → 같은 값을 담는 원본 필드 (원본이 있고 값이 같을 때만 중복 필드 제거)
+REDUNDANT_FIELDS: Dict[str, tuple] = {
+    "save_name": ("hospital_name", "name"),
+}
+_SPACES_RE = re.compile(r"[ \t]{2,}")
+
+
+def dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def select(ctx: Dict[str, Any], fields: Iterable[str]) -> Dict[str, Any]:
+    """fields 순서대로 ctx에 있는 키만 (중복 키는 1회)"""
+    out: Dict[str, Any] = {}
+    for k in fields:
+        if k in ctx and k not in out:
+            out[k] = ctx[k]
+    return out
+
+
+def prune(obj: Any) -> Any:
+    """빈 값 제거 + 리스트 중복 제거 (재귀)"""
+    if isinstance(obj, dict):
+        out = {}
+        for k, v in obj.items():
+            v = prune(v)
+            if v not in _EMPTY:
+                out[k] = v
+        return out
+    if isinstance(obj, list):
+        out, seen = [], set()
+        for v in obj:
+            v = prune(v)
+            if v in _EMPTY:
+                continue
+            marker = dumps(v) if isinstance(v, (dict, list)) else v
+            if marker in seen:
+                continue
+            seen.add(marker)
+            out.append(v)
+        return out
+    if isinstance(obj, str):
+        return _SPACES_RE.sub(" ", obj.strip())
+    return obj
+
+
+def _norm(v: Any) -> Any:
+    return " ".join(v.split()) if isinstance(v, str) else v
+
+
+def dedupe_values(ctx: Dict[str, Any], redundant: Optional[Dict[str, tuple]] = None) -> Dict[str, Any]:
+    """redundant(기본 REDUNDANT_FIELDS)의 중복 필드 중 원본 필드와 값이 같은 것만 제거 — 다른 필드는 값이 같아도 유지"""
+    redundant = REDUNDANT_FIELDS if redundant is None else redundant
+    out: Dict[str, Any] = {}
+    for k, v in ctx.items():
+        sources = redundant.get(k, ())
+        if any(src in ctx and _norm(ctx[src]) == _norm(v) for src in sources):
+            continue
+        out[k] = v
+    return out
+
+
+def compact(ctx: Dict[str, Any], fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """select → prune → dedupe_values"""
+    picked = select(ctx, fields) if fields is not None else dict(ctx)
+    return dedupe_values(prune(picked))
+
+
+class CompactionStats:
+    def __init__(self):
+        self._totals: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def report(self, name: str, before: str, after: str) -> Dict[str, int]:
+        """압축 전/후 프롬프트의 추정 토큰 수 기록"""
+        row = {"before_tokens": estimate_tokens(before), "after_tokens": estimate_tokens(after)}
+        with self._lock:
+            bucket = self._totals.setdefault(name, {"prompts": 0, "before_tokens": 0, "after_tokens": 0})
+            bucket["prompts"] += 1
+            bucket["before_tokens"] += row["before_tokens"]
+            bucket["after_tokens"] += row["after_tokens"]
+        return row
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            totals = {k: dict(v) for k, v in self._totals.items()}
+        for v in totals.values():
+            v["saved_ratio"] = round(1 - v["after_tokens"] / v["before_tokens"], 4) if v["before_tokens"] else 0.0
+        return totals
+
+
+compaction_stats = CompactionStats()
+
+
+def report(name: str, before: str, after: str) -> Dict[str, int]:
+    """집계만 (프롬프트마다 출력하지 않음 — 결과는 llm-metrics의 promptCompaction)"""
+    return compaction_stats.report(name, before, after)
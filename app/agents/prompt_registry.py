@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+PromptRegistry (app/test_prompt/ 템플릿 사전 컴파일)
+- 템플릿을 1회 파싱해 (리터럴 조각, {변수} 슬롯) 목록으로 보관 → 렌더링은 조각 이어 붙이기만 수행
+  (호출마다 정규식을 새로 만들고 컴파일하지 않음)
+- 치환 규칙은 기존 렌더러와 동일
+    * 전달된 변수에 있는 {name}만 값으로 치환, 없는 {name}은 그대로 둠
+    * {{ / }} 는 리터럴로 보존
+- 파일은 ReferenceRegistry를 통해 mtime/size가 바뀔 때만 다시 읽고 컴파일 (핫 리로드)
+- version: 템플릿 원문 해시 (stage_cache.prompt_version과 동일) — 캐시 키로 사용
+"""
+
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Mapping, Optional, Tuple
+
+from app.agents.reference_registry import registry
+from app.agents.stage_cache import prompt_version
+
+PROMPT_DIR = Path("app/test_prompt")
+
+_L, _R = "\x00L\x00", "\x00R\x00"
+_SLOT_RE = re.compile(r"\{([^{}]+)\}")
+
+
+class CompiledTemplate:
+    __slots__ = ("source", "chunks", "slots", "version")
+
+    def __init__(self, source: str):
+        self.source = source
+        self.version = prompt_version(source)
+        work = source.replace("{{", _L).replace("}}", _R)
+        chunks = []
+        pos = 0
+        for m in _SLOT_RE.finditer(work):
+            if m.start() > pos:
+                chunks.append((False, self._restore(work[pos:m.start()])))
+            chunks.append((True, m.group(1)))
+            pos = m.end()
+        if pos < len(work):
+            chunks.append((False, self._restore(work[pos:])))
+        self.chunks: Tuple[Tuple[bool, str], ...] = tuple(chunks)
+        self.slots: FrozenSet[str] = frozenset(name for is_slot, name in chunks if is_slot)
+
+    @staticmethod
+    def _restore(text: str) -> str:
+        return text.replace(_L, "{{").replace(_R, "}}")
+
+    def render(self, variables: Mapping[str, Any]) -> str:
+        out = []
+        for is_slot, value in self.chunks:
+            if not is_slot:
+                out.append(value)
+            elif value in variables:
+                out.append(str(variables[value]))
+            else:
+                out.append("{" + value + "}")
+        return "".join(out)
+
+    def __repr__(self) -> str:
+        return f"CompiledTemplate(version={self.version}, slots={sorted(self.slots)})"
+
+
+@lru_cache(maxsize=256)
+def compile_template(source: str) -> CompiledTemplate:
+    """템플릿 원문 → 컴파일 결과 (원문 기준 캐시: 참조 데이터로 전달된 문자열 템플릿에도 사용)"""
+    return CompiledTemplate(source)
+
+
+class PromptRegistry:
+    def __init__(self, base_dir: Path = PROMPT_DIR):
+        self.base_dir = Path(base_dir)
+
+    def _path(self, name: str | Path) -> Path:
+        p = Path(name)
+        return p if p.parent != Path(".") or p.exists() else self.base_dir / p
+
+    def get(self, name: str | Path, default: Optional[str] = None) -> CompiledTemplate:
+        """템플릿(파일명 또는 경로) — 파일이 없으면 default 원문, default도 없으면 FileNotFoundError"""
+        p = self._path(name)
+        if not p.exists():
+            if default is not None:
+                return compile_template(default)
+            raise FileNotFoundError(f"프롬프트 파일을 찾을 수 없습니다: {p}")
+        return registry.get(("prompt", str(p)), [p], lambda: compile_template(p.read_text(encoding="utf-8")))
+
+    def render(self, name: str | Path, variables: Mapping[str, Any], default: Optional[str] = None) -> str:
+        return self.get(name, default=default).render(variables)
+
+    def version(self, name: str | Path) -> str:
+        return self.get(name).version
+
+    def versions(self) -> Dict[str, str]:
+        """base_dir 아래 모든 템플릿의 버전 해시"""
+        return {p.name: self.get(p).version for p in sorted(self.base_dir.glob("*.txt"))}
+
+
+prompts = PromptRegistry()
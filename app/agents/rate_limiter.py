@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+RateLimiter (프로세스 전역 Gemini 호출 한도 관리)
+- 모델별 토큰 버킷 2개: 분당 요청 수(RPM) · 분당 토큰 수(TPM)
+    * 호출 전 예상 토큰(프롬프트 길이 기반 + max_output_tokens)을 예약, 응답 후 실제 사용량으로 정산
+- 모델별 적응형 동시 실행 한도 (AIMD)
+    * 429/503 → 한도 절반으로 축소 + Retry-After(서버 힌트) 동안 신규 호출 대기
+    * 성공 → 한도를 조금씩 회복 (최대 LLM_MAX_CONCURRENCY)
+- acquire()/release() : 블로킹 (에이전트 스레드용), acquire_async() : 이벤트 루프용
+    * acquire(timeout=남은 마감 시간): 슬롯·토큰 대기가 그보다 길면 예약을 되돌리고 DeadlineExceeded
+  try_acquire() : 대기 없이 가능할 때만 점유 (hedging 중복 요청용)
+- 환경변수
+    LLM_RPM(기본 150), LLM_TPM(기본 1000000), 0이면 해당 버킷 비활성
+    LLM_RATE_LIMITS(모델별 덮어쓰기 JSON, 예: {"gemini-1.5-pro": {"rpm": 60, "tpm": 500000}})
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import json
+import time
+import asyncio
+import threading
+from typing import Any, Dict, Optional
+
+from app.agents.deadline import DeadlineExceeded
+
+LLM_RPM = int(os.getenv("LLM_RPM", "150"))
+LLM_TPM = int(os.getenv("LLM_TPM", "1000000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+
+try:
+    LLM_RATE_LIMITS: Dict[str, Dict[str, int]] = json.loads(os.getenv("LLM_RATE_LIMITS", "") or "{}")
+except json.JSONDecodeError:
+    print("⚠️ LLM_RATE_LIMITS 파싱 실패 — 기본 한도 사용")
+    LLM_RATE_LIMITS = {}
+
+
+def estimate_tokens(text: str) -> int:
+    """대략적 토큰 수 (한국어 위주 프롬프트 기준 2자 ≈ 1토큰)"""
+    return max(1, len(text or "") // 2)
+
+
+def is_throttle_error(e: BaseException) -> bool:
+    """429(쿼터 초과) / 503(과부하) 여부"""
+    code = getattr(e, "code", None)
+    try:
+        if int(code) in (429, 503):
+            return True
+    except (TypeError, ValueError):
+        pass
+    name = type(e).__name__
+    if name in ("ResourceExhausted", "TooManyRequests", "ServiceUnavailable"):
+        return True
+    msg = str(e)
+    return "429" in msg or "503" in msg or "quota" in msg.lower()
+
+
+_RETRY_DELAY_RE = re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.I)
+_RETRY_IN_RE = re.compile(r"retry in ([\d.]+)\s*s", re.I)
+
+
+def retry_after_hint(e: BaseException) -> Optional[float]:
+    """서버가 알려준 재시도 대기 시간(초) — Retry-After 헤더 또는 gRPC RetryInfo"""
+    resp = getattr(e, "response", None)
+    headers = getattr(resp, "headers", None) or {}
+    try:
+        value = headers.get("Retry-After") or headers.get("retry-after")
+        if value:
+            return float(value)
+    except (TypeError, ValueError, AttributeError):
+        pass
+    msg = str(e)
+    for pat in (_RETRY_DELAY_RE, _RETRY_IN_RE):
+        m = pat.search(msg)
+        if m:
+            return float(m.group(1))
+    return None
+
+
+class TokenBucket:
+    """분당 rate 만큼 채워지는 버킷 — reserve()는 필요한 대기 시간을 돌려주는 예약 방식 (잔량이 음수가 될 수 있음)"""
+
+    def __init__(self, per_minute: int, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        if not self.enabled:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            # 버킷보다 큰 요청도 막히지 않도록 capacity로 자름
+            self.tokens -= min(amount, self.capacity)
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def available(self, amount: float) -> bool:
+        """지금 예약해도 대기가 필요 없는지"""
+        if not self.enabled:
+            return True
+        with self._lock:
+            self._refill(time.monotonic())
+            return self.tokens >= min(amount, self.capacity)
+
+    def adjust(self, delta: float) -> None:
+        """예약량과 실제 사용량의 차이 정산 (양수면 추가 차감)"""
+        if not self.enabled or not delta:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= delta
+
+
+class ModelLimiter:
+    def __init__(self, model: str, rpm: int, tpm: int, max_concurrency: int):
+        self.model = model
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self._cond = threading.Condition()
+        self._stats = {"calls": 0, "throttled": 0, "waited_sec": 0.0}
+
+    # --- 동시 실행 슬롯 (AIMD) ---
+    def _try_enter(self) -> Optional[float]:
+        """슬롯 점유 시 None, 아니면 권장 대기 시간"""
+        now = time.monotonic()
+        if now < self.cooldown_until:
+            return self.cooldown_until - now
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return None
+        return 0.05
+
+    def _reserve(self, est_tokens: int) -> float:
+        return max(self.requests.reserve(1), self.tokens.reserve(est_tokens))
+
+    def acquire(self, est_tokens: int, timeout: Optional[float] = None) -> None:
+        """슬롯 점유 + 토큰 예약 (블로킹) — timeout초 안에 호출할 수 없으면 DeadlineExceeded (점유·예약 없음)"""
+        started = time.monotonic()
+        give_up_at = None if timeout is None else started + timeout
+        with self._cond:
+            while True:
+                wait = self._try_enter()
+                if wait is None:
+                    break
+                if give_up_at is not None:
+                    left = give_up_at - time.monotonic()
+                    # 쿨다운(Retry-After)이 마감 이후까지면 기다리지 않음 (슬롯 대기는 release 시 깨어남)
+                    if left <= 0 or (wait > left and self.cooldown_until > time.monotonic()):
+                        raise DeadlineExceeded(f"호출 한도 대기가 마감 시간을 넘음 ({self.model}, 남은 {max(left, 0):.1f}s)")
+                    wait = min(wait, left)
+                self._cond.wait(timeout=wait)
+        delay = self._reserve(est_tokens)
+        if give_up_at is not None and time.monotonic() + delay > give_up_at:
+            self._unreserve(est_tokens)
+            with self._cond:
+                self.in_flight = max(0, self.in_flight - 1)
+                self._cond.notify_all()
+            raise DeadlineExceeded(f"RPM/TPM 대기({delay:.1f}s)가 마감 시간을 넘음 ({self.model})")
+        if delay > 0:
+            time.sleep(delay)
+        self._record_wait(time.monotonic() - started)
+
+    def _unreserve(self, est_tokens: int) -> None:
+        self.requests.adjust(-1)
+        self.tokens.adjust(-est_tokens)
+
+    def try_acquire(self, est_tokens: int) -> bool:
+        """대기 없이 슬롯·토큰을 얻을 수 있을 때만 점유 (중복 요청 등 선택적 호출용)"""
+        with self._cond:
+            if self._try_enter() is not None:
+                return False
+            if not (self.requests.available(1) and self.tokens.available(est_tokens)):
+                self.in_flight -= 1
+                return False
+        self._reserve(est_tokens)
+        self._record_wait(0.0)
+        return True
+
+    async def acquire_async(self, est_tokens: int) -> None:
+        started = time.monotonic()
+        while True:
+            with self._cond:
+                wait = self._try_enter()
+            if wait is None:
+                break
+            await asyncio.sleep(wait)
+        delay = self._reserve(est_tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self._record_wait(time.monotonic() - started)
+
+    def _record_wait(self, waited: float) -> None:
+        with self._cond:
+            self._stats["calls"] += 1
+            self._stats["waited_sec"] = round(self._stats["waited_sec"] + waited, 3)
+
+    def release(self, ok: bool = True, throttled: bool = False, retry_after: Optional[float] = None,
+                est_tokens: int = 0, used_tokens: Optional[int] = None) -> None:
+        if used_tokens is not None:
+            self.tokens.adjust(used_tokens - est_tokens)
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            if throttled:
+                self._stats["throttled"] += 1
+                self.limit = max(1.0, self.limit / 2)
+                if retry_after:
+                    self.cooldown_until = max(self.cooldown_until, time.monotonic() + retry_after)
+            elif ok:
+                self.limit = min(float(self.max_concurrency), self.limit + 1.0 / max(self.limit, 1.0))
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "rpm": round(self.requests.rate * 60),
+                "tpm": round(self.tokens.rate * 60),
+                "concurrency_limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "cooldown_sec": round(max(0.0, self.cooldown_until - time.monotonic()), 2),
+                **self._stats,
+            }
+
+
+class RateLimiter:
+    def __init__(self, rpm: int = LLM_RPM, tpm: int = LLM_TPM, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 overrides: Optional[Dict[str, Dict[str, int]]] = None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.overrides = dict(LLM_RATE_LIMITS if overrides is None else overrides)
+        self._models: Dict[str, ModelLimiter] = {}
+        self._lock = threading.Lock()
+
+    def for_model(self, model: str) -> ModelLimiter:
+        lim = self._models.get(model)
+        if lim is None:
+            with self._lock:
+                lim = self._models.get(model)
+                if lim is None:
+                    # "models/" 접두어 유무와 관계없이 덮어쓰기 적용
+                    cfg = self.overrides.get(model) or self.overrides.get(model.split("/")[-1]) or {}
+                    lim = ModelLimiter(
+                        model,
+                        rpm=int(cfg.get("rpm", self.rpm)),
+                        tpm=int(cfg.get("tpm", self.tpm)),
+                        max_concurrency=int(cfg.get("concurrency", self.max_concurrency)),
+                    )
+                    self._models[model] = lim
+        return lim
+
+    def stats(self) -> Dict[str, Any]:
+        return {m: lim.stats() for m, lim in list(self._models.items())}
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+ReferenceData (파이프라인 공용 참조 데이터 번들)
+- InputAgent 참조 데이터(persona CSV / 병원 목록 / S·P·T 선택표 / 카테고리 인덱스)
+- Plan/Title/Content 프롬프트 원문
+- 배치 생성 시 1회 스냅샷 → PipelineContext.reference 로 모든 건이 공유 (읽기 전용)
+- 원본은 프로세스 전역 ReferenceRegistry (파일 변경 시에만 재로딩)
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+@dataclass
+class ReferenceData:
+    input_resources: Optional[Dict[str, Any]] = None   # load_input_resources() 결과
+    prompts: Dict[str, str] = field(default_factory=dict)  # 프롬프트 경로 → 원문
+
+    def prompt(self, path: Path | str, default: Optional[str] = None) -> str:
+        """미리 로딩한 프롬프트 반환 (없으면 파일에서 읽음)"""
+        key = str(path)
+        if key in self.prompts:
+            return self.prompts[key]
+        from app.agents.reference_registry import registry
+        return registry.text(path, default=default)
+
+
+def load_reference_data() -> ReferenceData:
+    """참조 데이터/프롬프트를 한 번에 로딩"""
+    from app.agents.reference_registry import registry
+    from app.agents.input_agent import load_input_resources
+    from app.agents.plan_agent import PROMPT_PATH as PLAN_PROMPT_PATH
+    from app.agents.title_agent import GEN_PROMPT_PATH, EVAL_PROMPT_PATH
+    from app.agents.content_agent import PROMPTS as CONTENT_PROMPTS
+
+    prompts: Dict[str, str] = {}
+    for p in [PLAN_PROMPT_PATH, GEN_PROMPT_PATH, EVAL_PROMPT_PATH, *CONTENT_PROMPTS.values()]:
+        if p and Path(p).exists():
+            prompts[str(p)] = registry.text(p)
+
+    return ReferenceData(input_resources=load_input_resources(), prompts=prompts)
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+ReferenceRegistry (프로세스 전역 참조 데이터 레지스트리)
+- persona CSV / 병원 목록 JSON / S·P·T 선택표 / ClinicalContextBuilder / 프롬프트 / 평가 체크리스트 등
+- 프로세스당 1회 로딩 후 요청 간 읽기 전용으로 공유
+- 접근 시 파일 시그니처(경로·mtime_ns·size)만 확인 → 바뀐 항목만 다시 로딩 (핫 리로드)
+- 동일 키 동시 로딩은 키별 잠금으로 1회만 수행
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from app.utils.tracing import span
+
+
+class ReferenceRegistry:
+    def __init__(self):
+        self._entries: Dict[Hashable, Tuple[tuple, Any]] = {}
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hit": 0, "load": 0, "reload": 0}
+
+    @staticmethod
+    def signature(paths: Iterable[Path | str]) -> tuple:
+        sig = []
+        for p in paths:
+            try:
+                st = os.stat(p)
+                sig.append((str(p), st.st_mtime_ns, st.st_size))
+            except OSError:
+                sig.append((str(p), None, None))
+        return tuple(sig)
+
+    def _key_lock(self, key: Hashable) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get(self, key: Hashable, paths: Iterable[Path | str], loader: Callable[[], Any]) -> Any:
+        """key 항목 반환 — paths 시그니처가 바뀌었을 때만 loader() 재실행"""
+        paths = list(paths)
+        sig = self.signature(paths)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == sig:
+            self._stats["hit"] += 1
+            return entry[1]
+
+        with self._key_lock(key):
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == sig:
+                self._stats["hit"] += 1
+                return entry[1]
+            with span("file.load", key=str(key), reload=entry is not None):
+                value = loader()
+            self._entries[key] = (sig, value)
+            self._stats["reload" if entry is not None else "load"] += 1
+            if entry is not None:
+                print(f"🔄 참조 데이터 리로드: {key}")
+            return value
+
+    def text(self, path: Path | str, default: Optional[str] = None) -> str:
+        """텍스트 파일(프롬프트 등) — 파일이 없으면 default, default도 없으면 FileNotFoundError"""
+        p = Path(path)
+        if not p.exists():
+            if default is not None:
+                return default
+            raise FileNotFoundError(f"파일을 찾을 수 없습니다: {p}")
+        return self.get(("text", str(p)), [p], lambda: p.read_text(encoding="utf-8"))
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "entries": len(self._entries)}
+
+
+registry = ReferenceRegistry()
@@ -1,10 +1,10 @@
 import os
+import sys
 import argparse
 import json
-from input_agent import InputAgent
-from plan_agent import PlanAgent
-from title_agent import TitleAgent
-from content_agent import ContentAgent
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # 스크립트 실행 시에도 app.* import 가능하도록
 # from image_agent import ImageAgent
 # from eval_agent import EvalAgent
 # from final_assembler import FinalAssembler
@@ -22,8 +22,9 @@ def parse_args():
     """
     Parse command-line arguments:
       mode: 'test' or 'use' (default: 'use')
-      test_case_num: numeric test case for test mode (예: 11)
+      test_case_num: test case number in app/test_data/input_data.txt (예: 2)
       --env: path to environment file
+      --input: input JSON file (input_logs format)
     """
     parser = argparse.ArgumentParser(description="블로그 자동화 멀티 에이전트 실행기")
     parser.add_argument(
@@ -38,108 +39,121 @@ def parse_args():
         '--env', default=".env",
         help="환경변수 파일 경로 (기본: .env)"
     )
+    parser.add_argument(
+        '--input', default="",
+        help="입력 JSON 파일 경로 (input_logs 형식, 미지정 시 테스트 케이스 또는 최신 input 로그 사용)"
+    )
     return parser.parse_args()
 
 
+TEST_CASES_PATH = Path("app/test_data/input_data.txt")
+
+# 테스트 케이스(emphasis) → InputAgent 질문 필드
+_EMPHASIS_FIELDS = {
+    "concept": "question1_concept",
+    "process": "question4_treatment",
+    "result": "question6_result",
+    "extra": "question8_extra",
+}
+
+# 로그 재사용 시 InputAgent가 다시 계산하도록 제거하는 필드
+_DERIVED_FIELDS = ("case_id", "clinical_context", "timestamp", "created_at", "updated_at", "mode", "status")
+
+
+def load_test_case(case_num: str, path: Path = TEST_CASES_PATH) -> dict:
+    """
+    input_data.txt의 case_num 케이스를 InputAgent 입력 형식으로 변환
+    (파일은 JSON 객체를 이어 붙인 형식)
+    """
+    text = path.read_text(encoding="utf-8")
+    decoder = json.JSONDecoder()
+    pos = 0
+    while True:
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+        if pos >= len(text):
+            break
+        obj, pos = decoder.raw_decode(text, pos)
+        if str(obj.get("case_num")) != str(case_num):
+            continue
+        case = dict(obj.get("input_data") or {})
+        emphasis = case.pop("emphasis", {}) or {}
+        for key, field in _EMPHASIS_FIELDS.items():
+            if emphasis.get(key):
+                case.setdefault(field, emphasis[key])
+        return case
+    raise ValueError(f"테스트 케이스를 찾을 수 없습니다: {case_num} ({path})")
+
+
+def load_latest_input(mode: str) -> dict:
+    """test_logs/{mode} (없으면 전체 모드)의 최신 input 로그 — 파생 필드는 제거"""
+    roots = [Path(f"test_logs/{mode}"), Path("test_logs")]
+    for root in roots:
+        hits = sorted(root.rglob("*_input_log*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+        if not hits:
+            continue
+        data = json.loads(hits[0].read_text(encoding="utf-8"))
+        row = data[-1] if isinstance(data, list) and data else data
+        if isinstance(row, dict):
+            print(f"🔍 최신 input 로그 사용: {hits[0]}")
+            return {k: v for k, v in row.items() if k not in _DERIVED_FIELDS}
+    raise ValueError(f"input 로그가 없습니다: test_logs/{mode}")
+
+
+def load_input_data(args) -> dict:
+    """--input 파일 > 테스트 케이스 번호 > 최신 input 로그"""
+    if args.input:
+        data = json.loads(Path(args.input).read_text(encoding="utf-8"))
+        return data[-1] if isinstance(data, list) and data else data
+    if args.test_case_num:
+        return load_test_case(args.test_case_num)
+    return load_latest_input(args.mode)
+
+
 def main():
     # 1. 인자 파싱 및 환경변수 로드
     args = parse_args()
     load_env(args.env)
 
-    # 2. Input 데이터 준비
-    agent = InputAgent()
-    if args.mode == "test":
-        input_data = agent.run_test()
-    else:  # use 모드
-        input_data = agent.run_use()
-    
-    if input_data is None:
-        print("입력 데이터 수집에 실패했습니다.")
-        return
+    # 에이전트 모듈은 환경변수(GEMINI_API_KEY) 로드 후 import
+    from app.agents.pipeline_context import PipelineContext
+    from app.agents.pipeline_dag import run_generation_pipeline
+    from app.agents.content_agent import format_full_article
 
-    # test 모드일 때 터미널 출력
-    if args.mode == 'test':
-        print(f"🔍 [TEST MODE] using case: test_case_{args.test_case_num or '1'}")
-        print("🔍 [INPUT DATA]", json.dumps(input_data, indent=2, ensure_ascii=False))
-
-    # 3. PlanAgent 실행
-    #    - test 모드: 2-way로 고정 (rounds=2)
-    #    - use 모드 : CORT 모드, PlanAgent 내부 default_nway_rounds 사용 (rounds=None)
-    plan_agent = PlanAgent()
-    plan_rounds = 2 if args.mode == 'test' else None
-    plan, plan_candidates, plan_eval_info, _ = plan_agent.generate(
-        input_data=input_data,
-        mode='cli',
-        rounds=plan_rounds
-    )
-    plan_agent.save_log(
-        input_data=input_data,
-        candidates=plan_candidates,
-        best_output=json.dumps(plan, ensure_ascii=False),
-        selected=plan_eval_info['selected'],
-        reason=plan_eval_info['reason'],
-        mode=args.mode
-    )
+    # 2. Input 데이터 준비 (InputAgent는 input_data 없이 실행할 수 없음)
+    try:
+        input_data = load_input_data(args)
+    except (OSError, ValueError) as e:
+        print(f"❌ 입력 데이터 로딩 실패: {e}")
+        return
 
-    # test 모드일 때 PlanAgent 결과 출력
-    if args.mode == 'test':
-        print("🔍 [PLAN CANDIDATES]")
-        print(json.dumps(plan_candidates, indent=2, ensure_ascii=False))
-        print(f"🔍 [PLAN SELECTED] {plan_eval_info['selected']}")
-        print("🔍 [PLAN REASON]", json.dumps(plan_eval_info['reason'], indent=2, ensure_ascii=False))
-        print("🔍 [PLAN RESULT]", json.dumps(plan, indent=2, ensure_ascii=False))
-
-    # 4. TitleAgent 실행
-    title_agent = TitleAgent()
-    # test 모드: 2-way, use 모드: CORT n-way (internal default)
-    title_rounds = 2 if args.mode == 'test' else None
-    title, title_candidates, title_eval_info, _ = title_agent.generate(
-        input_data=plan,
-        mode='cli',
-        rounds=title_rounds
-    )
-    title_agent.save_log(
-        input_data=plan,
-        candidates=title_candidates,
-        best_output=json.dumps(title, ensure_ascii=False),
-        selected=title_eval_info['selected'],
-        reason=title_eval_info['reason'],
-        mode=args.mode
-    )
+    # 3~5. Input → Plan → (Title ∥ 섹션 초안) → Content 를 의존성 그래프로 실행
+    ctx = PipelineContext(mode=args.mode, persist=True)
+    try:
+        run_generation_pipeline(ctx, input_data=input_data)
+    except Exception as e:
+        print(f"❌ 파이프라인 실행 실패: {e}")
+        return
 
-    # test 모드일 때 TitleAgent 결과 출력
+    # test 모드일 때 터미널 출력
     if args.mode == 'test':
+        source = args.input or (f"test_case_{args.test_case_num}" if args.test_case_num else "latest input log")
+        print(f"🔍 [TEST MODE] using input: {source}")
+        print("🔍 [INPUT DATA]", json.dumps(ctx.input_row, indent=2, ensure_ascii=False))
+        print("🔍 [PLAN RESULT]", json.dumps(ctx.plan, indent=2, ensure_ascii=False))
         print("🔍 [TITLE CANDIDATES]")
-        print(json.dumps(title_candidates, indent=2, ensure_ascii=False))
-        print(f"🔍 [TITLE SELECTED] {title_eval_info['selected']}")
-        print("🔍 [TITLE REASON]", json.dumps(title_eval_info['reason'], indent=2, ensure_ascii=False))
-        print("🔍 [TITLE RESULT]", json.dumps(title, indent=2, ensure_ascii=False))
-
-    # 5. ContentAgent 실행
-    content_agent = ContentAgent()
-    content, content_candidates, content_eval_info, _ = content_agent.generate(
-        input_data={**input_data, **plan, 'title': title},
-        mode=args.mode
-    )
-    content_agent.save_log(
-        input_data={**input_data, **plan, 'title': title},
-        candidates=content_candidates,
-        best_output=content,
-        selected=content_eval_info['selected'],
-        reason=content_eval_info['reason'],
-        mode=args.mode
-    )
-
-    # test 모드일 때 ContentAgent 결과 출력
-    if args.mode == 'test':
-        print("🔍 [CONTENT CANDIDATES]")
-        print(json.dumps(content_candidates, indent=2, ensure_ascii=False))
-        print(f"🔍 [CONTENT SELECTED] {content_eval_info['selected']}")
-        print("🔍 [CONTENT REASON]", json.dumps(content_eval_info['reason'], indent=2, ensure_ascii=False))
-        print("🔍 [CONTENT RESULT]", json.dumps(content, indent=2, ensure_ascii=False))
+        print(json.dumps(ctx.title.get("candidates", []), indent=2, ensure_ascii=False))
+        print(f"🔍 [TITLE SELECTED] {ctx.selected_title}")
+        print("🔍 [CONTENT RESULT]", json.dumps(ctx.content.get("sections", {}), indent=2, ensure_ascii=False))
+        print("🔍 [STAGE TIMINGS]", json.dumps(ctx.stage_timings, indent=2, ensure_ascii=False))
+        if ctx.llm_usage:
+            usage = {k: ctx.llm_usage[k] for k in ("total", "by_prompt_file")}
+            print("🔍 [LLM USAGE]", json.dumps(usage, indent=2, ensure_ascii=False))
 
     # 전체 글 출력 (제목 + 내용)
-    full_article = content_agent.format_full_article(content, input_data={**input_data, **plan, 'title': title})
+    full_article = format_full_article(
+        ctx.content, input_data={**ctx.input_row, **ctx.plan, 'title': ctx.selected_title}
+    )
     print("\n" + "="*80)
     print("📝 [FULL ARTICLE]")
     print("="*80)
@@ -165,4 +179,4 @@ def main():
     #     print("🔍 [FINAL OUTPUT]", json.dumps(final_output, indent=2, ensure_ascii=False))
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+Schemas (LLM 구조화 출력 스키마 — plan / title / evaluation)
+- pydantic 모델 1개로 (1) Gemini response_schema 생성 (2) 응답 검증을 함께 처리
+- 모든 필드는 선택(None 허용) — 누락 보완은 각 에이전트의 기존 리페어/보정 로직이 담당
+  (model_dump(exclude_none=True) 결과에 없는 키만 setdefault로 채워짐)
+- json_mode(schema) : generate 호출에 넘길 response_mime_type/response_schema 설정
+- loads_lenient(text) : 코드펜스/앞뒤 설명문이 섞인 응답에서 JSON 객체 추출 (스키마 미지원 경로·리플레이 녹화용)
+"""
+
+from __future__ import annotations
+
+import re
+import ast
+import json
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Type
+
+from pydantic import BaseModel, ConfigDict, Field, create_model
+
+JSON_MIME_TYPE = "application/json"
+
+
+class _Schema(BaseModel):
+    # LLM이 스키마 밖의 키를 더 보내도 버리지 않음 (스키마 모드가 아닌 경로/리플레이 호환)
+    model_config = ConfigDict(populate_by_name=True, extra="allow")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.model_dump(by_alias=True, exclude_none=True)
+
+
+# --- PlanAgent ---
+class TitleHints(_Schema):
+    category: Optional[str] = None
+    region_examples: Optional[List[str]] = None
+
+
+class TitlePlan(_Schema):
+    guidance: Optional[str] = None
+    must_include_one_of: Optional[List[str]] = None
+    must_include: Optional[List[str]] = None
+    must_not_include: Optional[List[str]] = None
+    tone: Optional[str] = None
+    hints: Optional[TitleHints] = None
+
+
+class PlanSection(_Schema):
+    subtitle: Optional[str] = None
+    summary: Optional[str] = None
+    write_instruction: Optional[str] = None
+    must_include: Optional[List[str]] = None
+    may_include: Optional[List[str]] = None
+    must_not_include: Optional[List[str]] = None
+
+
+class PlanSections(_Schema):
+    intro: Optional[PlanSection] = Field(None, alias="1_intro")
+    visit: Optional[PlanSection] = Field(None, alias="2_visit")
+    inspection: Optional[PlanSection] = Field(None, alias="3_inspection")
+    doctor_tip: Optional[PlanSection] = Field(None, alias="4_doctor_tip")
+    treatment: Optional[PlanSection] = Field(None, alias="5_treatment")
+    check_point: Optional[PlanSection] = Field(None, alias="6_check_point")
+    conclusion: Optional[PlanSection] = Field(None, alias="7_conclusion")
+
+
+class ContentPlan(_Schema):
+    sections_order: Optional[List[str]] = None
+    sections: Optional[PlanSections] = None
+
+
+class PlanResponse(_Schema):
+    title_plan: Optional[TitlePlan] = None
+    content_plan: Optional[ContentPlan] = None
+
+
+# --- TitleAgent (후보 생성 / 선택 공용) ---
+class TitleCandidate(_Schema):
+    title: Optional[str] = None
+    angle: Optional[str] = None
+
+
+class TitleSelected(_Schema):
+    title: Optional[str] = None
+    why_best: Optional[str] = None
+
+
+class TitleResponse(_Schema):
+    candidates: Optional[List[TitleCandidate]] = None
+    selected: Optional[TitleSelected] = None
+
+
+# --- EvaluationAgent ---
+# 평가 항목 번호 "1"~"15" (SEO 모드는 1~9만 사용)
+EvaluationScores = create_model(
+    "EvaluationScores",
+    __base__=_Schema,
+    **{f"item_{i}": (Optional[int], Field(None, alias=str(i))) for i in range(1, 16)},
+)
+
+
+class EvaluationResponse(_Schema):
+    scores: Optional[EvaluationScores] = Field(None, alias="평가결과")
+    analysis: Optional[str] = Field(None, alias="상세분석")
+    tips: Optional[List[str]] = Field(None, alias="권고수정")
+
+
+class PatchUnit(_Schema):
+    type: Optional[str] = None
+    scope: Optional[str] = None
+    loc_hint: Optional[str] = None
+    before: Optional[str] = None
+    after: Optional[str] = None
+    reason: Optional[str] = None
+
+
+class RegenerationPatch(_Schema):
+    stage: Optional[str] = None
+    patch_units: Optional[List[PatchUnit]] = None
+    notes: Optional[str] = None
+
+
+# --- Gemini response_schema 변환 ---
+_GEMINI_TYPES = {"object": "OBJECT", "array": "ARRAY", "string": "STRING", "integer": "INTEGER",
+                 "number": "NUMBER", "boolean": "BOOLEAN"}
+
+
+def _convert(node: Dict[str, Any], defs: Dict[str, Any]) -> Dict[str, Any]:
+    """pydantic JSON Schema → Gemini Schema(OpenAPI 부분집합): $ref 인라인, Optional → nullable, 미지원 키 제거"""
+    if "$ref" in node:
+        return _convert(defs[node["$ref"].split("/")[-1]], defs)
+    if "anyOf" in node:
+        options = [o for o in node["anyOf"] if o.get("type") != "null"]
+        out = _convert(options[0], defs) if options else {"type": "STRING"}
+        if len(options) < len(node["anyOf"]):
+            out["nullable"] = True
+        return out
+    out: Dict[str, Any] = {"type": _GEMINI_TYPES.get(node.get("type", "string"), "STRING")}
+    if node.get("description"):
+        out["description"] = node["description"]
+    if node.get("enum"):
+        out["enum"] = list(node["enum"])
+    if out["type"] == "ARRAY":
+        out["items"] = _convert(node.get("items") or {"type": "string"}, defs)
+    if out["type"] == "OBJECT":
+        out["properties"] = {k: _convert(v, defs) for k, v in (node.get("properties") or {}).items()}
+        if node.get("required"):
+            out["required"] = list(node["required"])
+    return out
+
+
+@lru_cache(maxsize=None)
+def gemini_schema(schema: Type[BaseModel]) -> str:
+    """Gemini response_schema (JSON 문자열 — 모델/캐시 키에 그대로 쓰기 위해 직렬화)"""
+    js = schema.model_json_schema(by_alias=True)
+    return json.dumps(_convert(js, js.get("$defs", {})), ensure_ascii=False, sort_keys=True)
+
+
+def json_mode(schema: Type[BaseModel]) -> Dict[str, str]:
+    return {"response_mime_type": JSON_MIME_TYPE, "response_schema": gemini_schema(schema)}
+
+
+# --- 관대한 JSON 추출 ---
+_FENCE_START_RE = re.compile(r"^```[a-zA-Z0-9]*\s*")
+_FENCE_END_RE = re.compile(r"\s*```$")
+
+
+def loads_lenient(text: str) -> Optional[Dict[str, Any]]:
+    """코드펜스 제거 → json.loads → 첫 '{'부터 균형 '}'까지 → 파이썬 dict 리터럴 순으로 시도 (실패 시 None)"""
+    if not isinstance(text, str):
+        return None
+    s = _FENCE_END_RE.sub("", _FENCE_START_RE.sub("", text.strip())).strip()
+    try:
+        obj = json.loads(s)
+        return obj if isinstance(obj, dict) else None
+    except ValueError:
+        pass
+    start = s.find("{")
+    if start == -1:
+        return None
+    depth, end, in_str, esc = 0, -1, False, False
+    for i, ch in enumerate(s[start:], start=start):
+        if in_str:
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == '"':
+                in_str = False
+        elif ch == '"':
+            in_str = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                end = i + 1
+                break
+    chunk = s[start:end] if end != -1 else s[start:]
+    try:
+        obj = json.loads(chunk)
+        return obj if isinstance(obj, dict) else None
+    except ValueError:
+        pass
+    try:
+        obj = ast.literal_eval(chunk)
+        return obj if isinstance(obj, dict) else None
+    except Exception:
+        return None
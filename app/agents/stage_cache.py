@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+StageCache (Plan/Title/Content 단계 산출물 콘텐츠 주소 캐시)
+- 키: sha256(단계 입력(렌더링된 프롬프트 등) + 모델 + temperature + 프롬프트 파일 버전)
+- 값: 단계의 LLM 산출물(JSON 직렬화 가능 객체) → app/cache/stages/{stage}/{key}.json
+- 동일 입력 재생성/다운스트림 실패 후 재시도 시 LLM 호출 생략
+- force=True(PipelineContext.force) 면 조회를 건너뛰고 새로 생성한 결과로 덮어씀
+- 만료/용량: 마지막 사용(mtime) 후 STAGE_CACHE_TTL_SEC이 지난 항목은 miss, 단계별 STAGE_CACHE_MAX_ENTRIES 초과 시
+  가장 오래 안 쓴 항목부터 삭제 (LRU — 조회 hit 시 mtime 갱신, 저장 STAGE_CACHE_PRUNE_EVERY회마다 정리)
+- 환경변수: STAGE_CACHE_ENABLED(기본 true), STAGE_CACHE_DIR(기본 app/cache/stages),
+  STAGE_CACHE_TTL_SEC(기본 7일, 0이면 만료 없음), STAGE_CACHE_MAX_ENTRIES(기본 2000, 0이면 상한 없음)
+"""
+
+from __future__ import annotations
+
+import os
+import json
+import hashlib
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+STAGE_CACHE_ENABLED = os.getenv("STAGE_CACHE_ENABLED", "true").lower() != "false"
+STAGE_CACHE_DIR = Path(os.getenv("STAGE_CACHE_DIR", "app/cache/stages"))
+STAGE_CACHE_TTL_SEC = int(os.getenv("STAGE_CACHE_TTL_SEC", str(7 * 24 * 3600)))
+STAGE_CACHE_MAX_ENTRIES = int(os.getenv("STAGE_CACHE_MAX_ENTRIES", "2000"))
+STAGE_CACHE_PRUNE_EVERY = max(1, int(os.getenv("STAGE_CACHE_PRUNE_EVERY", "50")))
+
+_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = {}
+_puts_since_prune: Dict[str, int] = {}
+
+
+def prompt_version(*texts: str) -> str:
+    """프롬프트 원문 해시 (파일 수정 시 키가 바뀌도록)"""
+    h = hashlib.sha256()
+    for t in texts:
+        h.update((t or "").encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+
+def make_key(stage: str, **parts: Any) -> str:
+    payload = json.dumps({"stage": stage, **parts}, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _count(stage: str, name: str, n: int = 1) -> None:
+    with _lock:
+        bucket = _stats.setdefault(stage, {"hit": 0, "miss": 0, "store": 0, "bypass": 0, "evict": 0})
+        bucket[name] += n
+
+
+def _path(stage: str, key: str) -> Path:
+    return STAGE_CACHE_DIR / stage / f"{key}.json"
+
+
+def get(stage: str, key: str, force: bool = False) -> Optional[Any]:
+    """캐시 조회 (없거나 force면 None)"""
+    if not STAGE_CACHE_ENABLED:
+        return None
+    if force:
+        _count(stage, "bypass")
+        return None
+    p = _path(stage, key)
+    try:
+        if _expired(p.stat().st_mtime, time.time()):
+            p.unlink(missing_ok=True)
+            _count(stage, "evict")
+            raise FileNotFoundError(p)
+        value = json.loads(p.read_text(encoding="utf-8"))["value"]
+        os.utime(p)  # LRU: 마지막 사용 시각 갱신
+    except Exception:
+        _count(stage, "miss")
+        return None
+    _count(stage, "hit")
+    return value
+
+
+def put(stage: str, key: str, value: Any) -> None:
+    """캐시 저장 (임시 파일 → rename 으로 원자적 교체, 실패는 무시)"""
+    if not STAGE_CACHE_ENABLED:
+        return
+    p = _path(stage, key)
+    try:
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps({"stage": stage, "value": value}, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, p)
+        _count(stage, "store")
+    except Exception as e:
+        print(f"⚠️ 단계 캐시 저장 실패({stage}): {e}")
+        return
+    with _lock:
+        n = _puts_since_prune.get(stage, STAGE_CACHE_PRUNE_EVERY - 1) + 1  # 프로세스 첫 저장 때도 정리
+        _puts_since_prune[stage] = 0 if n >= STAGE_CACHE_PRUNE_EVERY else n
+    if n >= STAGE_CACHE_PRUNE_EVERY:
+        prune(stage)
+
+
+def _expired(mtime: float, now: float) -> bool:
+    return STAGE_CACHE_TTL_SEC > 0 and now - mtime > STAGE_CACHE_TTL_SEC
+
+
+def prune(stage: str) -> int:
+    """만료 항목 삭제 후 상한 초과분을 마지막 사용(mtime)이 오래된 순으로 삭제 — 삭제 건수 반환 (실패는 무시)"""
+    now = time.time()
+    entries = []
+    for f in (STAGE_CACHE_DIR / stage).glob("*.json"):
+        try:
+            entries.append((f.stat().st_mtime, f))
+        except OSError:
+            continue  # 다른 프로세스가 먼저 삭제
+    doomed = [f for m, f in entries if _expired(m, now)]
+    live = sorted((m, f) for m, f in entries if not _expired(m, now))
+    if STAGE_CACHE_MAX_ENTRIES > 0 and len(live) > STAGE_CACHE_MAX_ENTRIES:
+        doomed += [f for _, f in live[:len(live) - STAGE_CACHE_MAX_ENTRIES]]
+    removed = 0
+    for f in doomed:
+        try:
+            f.unlink()
+            removed += 1
+        except OSError:
+            pass
+    if removed:
+        _count(stage, "evict", removed)
+    return removed
+
+
+def stats() -> Dict[str, Any]:
+    """프로세스 기준 단계별 hit/miss 카운터"""
+    with _lock:
+        per_stage = {k: dict(v) for k, v in _stats.items()}
+    hits = sum(v["hit"] for v in per_stage.values())
+    misses = sum(v["miss"] for v in per_stage.values())
+    return {
+        "enabled": STAGE_CACHE_ENABLED,
+        "dir": str(STAGE_CACHE_DIR),
+        "ttl_sec": STAGE_CACHE_TTL_SEC,
+        "max_entries": STAGE_CACHE_MAX_ENTRIES,
+        "stages": per_stage,
+        "hit": hits,
+        "miss": misses,
+        "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+    }
@@ -1,39 +1,48 @@
 # -*- coding: utf-8 -*-
 """
 TitleAgent (카테고리/지역/페르소나 반영 · 의료광고 준수 · 모델 자체선정)
-- 입력: PlanAgent 산출물(plan dict 또는 *_plan.json 경로/자동탐색)
+- 입력: PlanAgent 산출물(PipelineContext.plan / plan dict 또는 *_plan.json 경로/자동탐색)
 - 프롬프트: test_prompt/title_generation_prompt.txt, test_prompt/title_evaluation_prompt.txt (없으면 내장 프롬프트 사용)
-- 모델: Gemini (GEMINI_API_KEY 필요) — JSON 강인 파싱/리페어 포함
+- 모델: Gemini (GEMINI_API_KEY 필요) — JSON 모드(response_schema=TitleResponse) + 검증 실패 시 리페어 1회
 - 출력: test_logs/{mode}/{YYYYMMDD}/{timestamp}_title.json (최종) + {timestamp}_title_log.json (로그)
 
 동작 개요
 1) plan을 수집/정규화 → 제목 생성 프롬프트 구성
-2) 후보 N개 생성(candidates)
+2) 후보 N개 생성(candidates) — 병렬 호출 + temperature 분산, 끝나는 순서대로 병합
 3) 평가 프롬프트로 모델이 최적 1개 선택(selected)
 4) 스키마/규칙 검증 후 저장
 """
 
 from __future__ import annotations
 
-import os, json, re, ast
+import os, sys, json, re
 from pathlib import Path
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple, TYPE_CHECKING
+import threading
 import time
 
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # 스크립트 실행 시에도 app.* import 가능하도록
+from app.agents import deadline, stage_cache
+from app.agents.prompt_registry import compile_template, prompts
+from app.agents import prompt_context
+from app.agents.schemas import TitleResponse, gemini_schema
+from app.utils.tracing import traced
+
+if TYPE_CHECKING:
+    from app.agents.pipeline_context import PipelineContext
+
 # -----------------------
 # 환경 & 모델
 # -----------------------
 from dotenv import load_dotenv
-import google.generativeai as genai
+from app.agents.llm_client import LLM_BACKEND, GeminiClient, StructuredOutputError
 
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
+if not GEMINI_API_KEY and LLM_BACKEND != "replay":
     raise RuntimeError("GEMINI_API_KEY가 필요합니다(.env)")
 
-genai.configure(api_key=GEMINI_API_KEY)
-
 # -----------------------
 # 경로 유틸
 # -----------------------
@@ -58,51 +67,21 @@ def _ensure_dir(p: Path):
 # -----------------------
 # 모델 클라이언트
 # -----------------------
-class GeminiClient:
-    def __init__(self, model: str = "models/gemini-1.5-flash", temperature: float = 0.7, max_output_tokens: int = 2048):
-        self.model_name = model
-        self.temperature = temperature
-        self.max_output_tokens = max_output_tokens
-        self.max_retries = 3
-        self.retry_delay = 1.0
-
-    def generate(self, prompt: str, temperature: Optional[float] = None) -> str:
-        for attempt in range(self.max_retries):
-            try:
-                m = genai.GenerativeModel(self.model_name)
-                resp = m.generate_content(
-                    prompt,
-                    generation_config=genai.types.GenerationConfig(
-                        temperature=self.temperature if temperature is None else temperature,
-                        max_output_tokens=self.max_output_tokens,
-                        candidate_count=1,
-                        top_p=0.95,
-                        top_k=40,
-                    ),
-                )
-                # 일반 텍스트 경로
-                if getattr(resp, "text", None):
-                    return resp.text
-                # 후보 파츠 경로(보수용)
-                if getattr(resp, "candidates", None):
-                    parts = getattr(resp.candidates[0].content, "parts", [])
-                    if parts and getattr(parts[0], "text", ""):
-                        return parts[0].text
-                raise ValueError("응답에 text 없음")
-            except Exception as e:
-                if attempt == self.max_retries - 1:
-                    raise e
-                print(f"⚠️ Gemini 호출 실패 (시도 {attempt + 1}/{self.max_retries}): {e}")
-                time.sleep(self.retry_delay * (2 ** attempt))
-
-
-gem = GeminiClient()
+gem = GeminiClient(agent="title", task="title.generate", temperature=0.7, max_output_tokens=2048)
+
+# 후보 생성 병렬 호출 수 / temperature 분산 폭 / candidate_count 단일 호출 사용 여부
+TITLE_CANDIDATE_CALLS = int(os.getenv("TITLE_CANDIDATE_CALLS", "3"))
+TITLE_TEMPERATURE_SPREAD = float(os.getenv("TITLE_TEMPERATURE_SPREAD", "0.4"))
+TITLE_NATIVE_CANDIDATES = os.getenv("TITLE_NATIVE_CANDIDATES", "false").lower() == "true"
+# 요청 마감 임박(deadline.DEADLINE_DEGRADE_SEC) 시 후보 수
+TITLE_DEADLINE_CANDIDATES = int(os.getenv("TITLE_DEADLINE_CANDIDATES", "2"))
 
 
 # -----------------------
 # 파일/계획 로딩
 # -----------------------
 
+@traced("file.scan")
 def _latest_plan_path(mode: str) -> Optional[Path]:
     day_dir = Path(f"test_logs/{mode}/{_today()}")
     if day_dir.exists():
@@ -135,46 +114,6 @@ def load_plan(plan: Optional[Dict[str, Any]] = None, plan_path: Optional[str | P
     return data
 
 
-# -----------------------
-# JSON 강인 파싱
-# -----------------------
-
-def _parse_json(s: str) -> Optional[Dict[str, Any]]:
-    if not isinstance(s, str):
-        return None
-    s = s.strip()
-    s = re.sub(r"^```(json)?", "", s).strip()
-    s = re.sub(r"```$", "", s).strip()
-    try:
-        return json.loads(s)
-    except Exception:
-        pass
-    start = s.find("{")
-    if start == -1:
-        return None
-    depth, end = 0, -1
-    for i, ch in enumerate(s[start:], start=start):
-        if ch == "{":
-            depth += 1
-        elif ch == "}":
-            depth -= 1
-            if depth == 0:
-                end = i + 1
-                break
-    if end != -1:
-        try:
-            return json.loads(s[start:end])
-        except Exception:
-            pass
-    try:
-        obj = ast.literal_eval(s[start:end] if end != -1 else s)
-        if isinstance(obj, dict):
-            return obj
-    except Exception:
-        return None
-    return None
-
-
 # -----------------------
 # 텍스트 정리/검증
 # -----------------------
@@ -273,10 +212,8 @@ def _contains_hospital(title: str, hospital_name: str) -> bool:
 
 
 def _load_text(path: Path) -> str:
-    if path.exists():
-        return path.read_text(encoding="utf-8")
-    # return fallback
-    raise FileNotFoundError(f"프롬프트 파일을 찾을 수 없습니다: {path}")
+    # prompts 레지스트리: 파일이 수정됐을 때만 다시 읽고 컴파일 (없으면 FileNotFoundError)
+    return prompts.get(path).source
 
 
 # -----------------------
@@ -310,17 +247,44 @@ def extract_context(plan: Dict[str, Any]) -> Dict[str, Any]:
     return ctx
 
 
-def build_generation_prompt(plan: Dict[str, Any], N: int) -> str:
+# 제목 생성 프롬프트가 참조하는 plan 필드 (섹션 이미지 바인딩·작성 지시·meta 제외)
+TITLE_PLAN_SECTION_FIELDS = ("subtitle", "summary", "must_include", "may_include", "must_not_include")
+TITLE_PLAN_CONTEXT_FIELDS = ("hospital_name", "city", "district", "region_phrase", "category")
+
+
+def _plan_for_title(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """제목 생성에 필요한 plan 부분만 (빈 값·중복 필드 제거)"""
+    content_plan = plan.get("content_plan") or {}
+    sections = content_plan.get("sections") or {}
+    order = content_plan.get("sections_order") or list(sections)
+    return prompt_context.prune({
+        "title_plan": plan.get("title_plan") or {},
+        "content_plan": {
+            "sections": {
+                k: prompt_context.select(sections[k], TITLE_PLAN_SECTION_FIELDS)
+                for k in order if isinstance(sections.get(k), dict)
+            },
+        },
+        "context_vars": prompt_context.compact(plan.get("context_vars") or {}, TITLE_PLAN_CONTEXT_FIELDS),
+    })
+
+
+def build_generation_prompt(plan: Dict[str, Any], N: int, tpl: Optional[str] = None) -> str:
     # tpl = _load_text(GEN_PROMPT_PATH, EMBEDDED_GEN_PROMPT)
-    tpl = _load_text(GEN_PROMPT_PATH)
+    tpl = tpl or _load_text(GEN_PROMPT_PATH)
+    head = tpl.replace("{N}", str(N)).rstrip() + "\n"
     # plan JSON은 그대로 붙이되, 불필요 공백 축소
     plan_min = json.dumps(plan, ensure_ascii=False)
-    return tpl.replace("{N}", str(N)).rstrip() + "\n" + plan_min
+    if not prompt_context.PROMPT_CONTEXT_COMPACT:
+        return head + plan_min
+    prompt = head + prompt_context.dumps(_plan_for_title(plan))
+    prompt_context.report("title.generation", head + plan_min, prompt)
+    return prompt
 
 
-def build_evaluation_prompt(candidates_json: Dict[str, Any]) -> str:
+def build_evaluation_prompt(candidates_json: Dict[str, Any], tpl: Optional[str] = None) -> str:
     # tpl = _load_text(EVAL_PROMPT_PATH, EMBEDDED_EVAL_PROMPT)
-    tpl = _load_text(EVAL_PROMPT_PATH)
+    tpl = tpl or _load_text(EVAL_PROMPT_PATH)
     return tpl.rstrip() + "\n" + json.dumps(candidates_json, ensure_ascii=False)
 
 
@@ -328,25 +292,17 @@ def build_evaluation_prompt(candidates_json: Dict[str, Any]) -> str:
 # 후보 생성 & 선택
 # -----------------------
 
-def generate_candidates(plan: Dict[str, Any], N: int = 5) -> Dict[str, Any]:
-    prompt = build_generation_prompt(plan, N)
-    sys_dir = (
-        "You are an assistant that outputs ONLY valid JSON. No prose. No markdown fences.\n"
-        "Return ONLY the JSON object per schema."
-    )
-    full_prompt = f"{sys_dir}\n\n{prompt}"
-    raw = gem.generate(full_prompt)
-    obj = _parse_json(raw) or {"candidates": [], "selected": {"title": "", "why_best": ""}}
-
-    # 최소 스키마 보정
-    if not isinstance(obj.get("candidates"), list):
-        obj["candidates"] = []
-    obj.setdefault("selected", {"title": "", "why_best": ""})
-
-    # 정리/클린업
-    hospital_name = _get(plan, "context_vars.hospital_name", "")
+def _clean_candidates(raw: str, hospital_name: str) -> List[Dict[str, str]]:
+    try:
+        obj = gem.parse_json(raw, TitleResponse, prompt_file=GEN_PROMPT_PATH.name)
+    except StructuredOutputError as e:
+        print(f"⚠️ 제목 후보 JSON 검증 실패 — 이 호출 결과는 건너뜀: {e}")
+        obj = {}
+    cands = obj.get("candidates") if isinstance(obj.get("candidates"), list) else []
     cleaned: List[Dict[str, str]] = []
-    for c in obj["candidates"]:
+    for c in cands:
+        if not isinstance(c, dict):
+            continue
         title = _clean(str(c.get("title", "")))
         angle = _clean(str(c.get("angle", "")))
         if not title:
@@ -356,14 +312,61 @@ def generate_candidates(plan: Dict[str, Any], N: int = 5) -> Dict[str, Any]:
         if _violates_forbidden(title):
             continue
         cleaned.append({"title": title, "angle": angle})
+    return cleaned
+
+
+def generate_candidates(plan: Dict[str, Any], N: int = 5, tpl: Optional[str] = None,
+                        on_candidates: Optional[Callable[[List[Dict[str, str]]], None]] = None,
+                        calls: Optional[int] = None) -> Dict[str, Any]:
+    """
+    제목 후보 N개 생성
+    - TITLE_CANDIDATE_CALLS개 호출을 병렬로 보내고 각 호출은 ceil(N/호출 수)개만 생성 (출력 길이↓ → 지연↓)
+    - 호출마다 temperature를 분산(TITLE_TEMPERATURE_SPREAD)해 후보 다양성 확보
+    - on_candidates(지금까지 후보 목록) : 호출이 끝나는 순서대로 전달
+    - calls 지정 시 TITLE_CANDIDATE_CALLS 대신 사용 (마감 임박 시 축소)
+    """
+    calls = max(1, min(calls or TITLE_CANDIDATE_CALLS, N))
+    per_call = -(-N // calls)
+    prompt = build_generation_prompt(plan, per_call, tpl=tpl)
+    sys_dir = (
+        "You are an assistant that outputs ONLY valid JSON. No prose. No markdown fences.\n"
+        "Return ONLY the JSON object per schema.\n"
+        f"Generate exactly {per_call} candidates."
+    )
+    full_prompt = f"{sys_dir}\n\n{prompt}"
+
+    hospital_name = _get(plan, "context_vars.hospital_name", "")
+    merged: List[Dict[str, str]] = []
+    seen: set = set()
+    lock = threading.Lock()
+
+    def _on_candidate(_idx: int, raw: str):
+        cleaned = _clean_candidates(raw, hospital_name)  # 리페어 호출이 있을 수 있어 lock 밖에서
+        with lock:
+            for c in cleaned:
+                norm = re.sub(r"\s+", "", c["title"])
+                if norm in seen:
+                    continue
+                seen.add(norm)
+                merged.append(c)
+            snapshot = list(merged[:N])
+        if on_candidates is not None:
+            on_candidates(snapshot)
+
+    gem.candidates(
+        full_prompt, calls,
+        diversity=TITLE_TEMPERATURE_SPREAD,
+        native=TITLE_NATIVE_CANDIDATES,
+        on_candidate=_on_candidate,
+        schema=TitleResponse,
+        prompt_file=GEN_PROMPT_PATH.name,
+    )
 
-    obj["candidates"] = cleaned[:N]
     # selected는 평가 단계에서 확정
-    obj["selected"] = {"title": "", "why_best": ""}
-    return obj
+    return {"candidates": merged[:N], "selected": {"title": "", "why_best": ""}}
 
 
-def select_best(plan: Dict[str, Any], candidates_obj: Dict[str, Any]) -> Dict[str, Any]:
+def select_best(plan: Dict[str, Any], candidates_obj: Dict[str, Any], tpl: Optional[str] = None) -> Dict[str, Any]:
     # 길이/금지어 1차 필터링 + 너무 짧거나 긴 것은 제외
     hospital = _get(plan, "context_vars.hospital_name", "")
     filt = []
@@ -379,14 +382,17 @@ def select_best(plan: Dict[str, Any], candidates_obj: Dict[str, Any]) -> Dict[st
 
     cand_obj = {"candidates": filt or candidates_obj.get("candidates", [])}
 
-    prompt = build_evaluation_prompt(cand_obj)
+    prompt = build_evaluation_prompt(cand_obj, tpl=tpl)
     sys_dir = (
         "You are an assistant that outputs ONLY valid JSON. No prose. No markdown fences.\n"
         "Return ONLY the JSON object per schema."
     )
     full = f"{sys_dir}\n\n{prompt}"
-    raw = gem.generate(full)
-    sel = _parse_json(raw) or {"selected": {"title": "", "why_best": ""}}
+    try:
+        sel = gem.generate_json(full, TitleResponse, prompt_file=EVAL_PROMPT_PATH.name, task="title.select")
+    except StructuredOutputError as e:
+        print(f"⚠️ 제목 선택 JSON 검증 실패 — 첫 후보로 보정: {e}")
+        sel = {"selected": {"title": "", "why_best": ""}}
 
     # 보정: selected 누락 시 첫 후보 사용
     if not isinstance(sel.get("selected"), dict):
@@ -416,48 +422,72 @@ def save_outputs(mode: str, result: Dict[str, Any], meta: Dict[str, Any]) -> Tup
 # 메인 파이프라인
 # -----------------------
 
-def run(plan: Optional[Dict[str, Any]] = None, plan_path: Optional[str | Path] = None, mode: str = DEF_MODE, N: int = 5) -> Dict[str, Any]:
-    plan_obj = load_plan(plan=plan, plan_path=plan_path, mode=mode)
-
-    # 후보 생성
-    cand_obj = generate_candidates(plan_obj, N=N)
+def run(plan: Optional[Dict[str, Any]] = None, plan_path: Optional[str | Path] = None, mode: str = DEF_MODE, N: int = 5,
+        ctx: Optional["PipelineContext"] = None) -> Dict[str, Any]:
+    persist, force = True, False
+    gen_tpl = eval_tpl = None
+    if ctx is not None:
+        ctx.require("plan")
+        plan, mode, persist, force = ctx.plan, ctx.mode, ctx.persist, ctx.force
+        if ctx.reference:
+            gen_tpl = ctx.reference.prompt(GEN_PROMPT_PATH)
+            eval_tpl = ctx.reference.prompt(EVAL_PROMPT_PATH)
+    gen_tpl = gen_tpl or _load_text(GEN_PROMPT_PATH)
+    eval_tpl = eval_tpl or _load_text(EVAL_PROMPT_PATH)
 
-    # 모델 선택
-    sel_obj = select_best(plan_obj, cand_obj)
-
-    # 최종 결과 스키마 조립
-    final = {
-        "candidates": cand_obj.get("candidates", []),
-        "selected": sel_obj.get("selected", {"title": "", "why_best": ""}),
-    }
-
-    # 저장 메타
-    meta = {
-        "mode": mode,
-        "timestamp": _now(),
-        "plan_source": plan_obj.get("meta", {}).get("source_log", ""),
-        "plan_snapshot": plan_obj,  # 추후 디버깅용
-    }
-
-    out, log = save_outputs(mode, final, meta)
-    print(f"✅ Title 저장: {out}")
-    print(f"🧾 로그 저장: {log}")
-    return final
-
-def run(plan: Optional[Dict[str, Any]] = None, plan_path: Optional[str | Path] = None, mode: str = DEF_MODE, N: int = 5) -> Dict[str, Any]:
     plan_obj = load_plan(plan=plan, plan_path=plan_path, mode=mode)
 
-    # 후보 생성
-    cand_obj = generate_candidates(plan_obj, N=N)
-
-    # 모델 선택
-    sel_obj = select_best(plan_obj, cand_obj)
-
-    # 최종 결과 스키마 조립
-    final = {
-        "candidates": cand_obj.get("candidates", []),
-        "selected": sel_obj.get("selected", {"title": "", "why_best": ""}),
-    }
+    # 마감 임박: 후보 수/호출 수 축소, 더 임박하면 선택 LLM 생략(첫 후보)
+    calls = TITLE_CANDIDATE_CALLS
+    if deadline.degrade("title", f"후보 {min(N, TITLE_DEADLINE_CANDIDATES)}개 · 호출 1회"):
+        N, calls = min(N, TITLE_DEADLINE_CANDIDATES), 1
+    skip_select = deadline.fallback("title.select", "선택 LLM 생략, 첫 후보 사용")
+
+    # 단계 캐시: plan 본문(meta의 timestamp/case_id 제외) + N + 모델 설정 + 프롬프트 버전
+    cache_key = stage_cache.make_key(
+        "title",
+        plan={k: v for k, v in plan_obj.items() if k != "meta"},
+        N=N,
+        model=gem.model_name,
+        select_model=gem.model_for("title.select"),
+        temperature=gem.temperature,
+        candidate_calls=calls,
+        skip_select=skip_select,
+        temperature_spread=TITLE_TEMPERATURE_SPREAD,
+        native_candidates=TITLE_NATIVE_CANDIDATES,
+        prompt_version=stage_cache.prompt_version(gen_tpl, eval_tpl),
+        schema=gemini_schema(TitleResponse),
+    )
+    final = stage_cache.get("title", cache_key, force=force)
+    if final is not None:
+        print("♻️ title 캐시 사용 (동일 입력)")
+    else:
+        # 후보 생성
+        on_candidates = None
+        if ctx is not None:
+            on_candidates = lambda cands: ctx.emit("title_candidates", {"candidates": cands})
+        cand_obj = generate_candidates(plan_obj, N=N, tpl=gen_tpl, on_candidates=on_candidates, calls=calls)
+
+        # 모델 선택 (마감 임박 시 생략 → 아래 보정에서 첫 후보)
+        if skip_select:
+            first = (cand_obj.get("candidates") or [{}])[0].get("title", "")
+            sel_obj = {"selected": {"title": first, "why_best": "마감 임박 — 첫 후보"}}
+        else:
+            sel_obj = select_best(plan_obj, cand_obj, tpl=eval_tpl)
+
+        # 최종 결과 스키마 조립
+        final = {
+            "candidates": cand_obj.get("candidates", []),
+            "selected": sel_obj.get("selected", {"title": "", "why_best": ""}),
+        }
+        if final["selected"].get("title"):
+            stage_cache.put("title", cache_key, final)
+
+    if ctx is not None:
+        ctx.title = final
+        ctx.emit("title_selected", final)
+    if not persist:
+        return final
 
     # 사용 데이터 로그용 추출
     used_data = {
@@ -474,6 +504,10 @@ def run(plan: Optional[Dict[str, Any]] = None, plan_path: Optional[str | Path] =
         "mode": mode,
         "timestamp": _now(),
         "plan_source": plan_obj.get("meta", {}).get("source_log", ""),
+        "prompt_versions": {
+            GEN_PROMPT_PATH.name: compile_template(gen_tpl).version,
+            EVAL_PROMPT_PATH.name: compile_template(eval_tpl).version,
+        },
         "plan_snapshot": plan_obj,  # 추후 디버깅용
         "used_data": used_data,     # 제목 생성 시 참고한 주요 데이터
     }
@@ -482,6 +516,8 @@ def run(plan: Optional[Dict[str, Any]] = None, plan_path: Optional[str | Path] =
     print(f"✅ Title 저장: {out}")
     print(f"🧾 로그 저장: {log}")
     print(f"📌 사용 데이터: {json.dumps(used_data, ensure_ascii=False, indent=2)}")
+    if ctx is not None:
+        ctx.artifacts["title"] = str(out)
     return final
 
 
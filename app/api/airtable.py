@@ -1,7 +1,9 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Path
 from app.services.airtable_service import process_and_save_thread_data, get_thread_id_from_record
 from app.models.airtable import AirtableWebhookPayload, SuccessResponse, FinalOutput
+from app.services.job_queue import enqueue_job, JOB_AIRTABLE_SYNC_THREAD
 from app.config import settings
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,7 +14,7 @@ router = APIRouter()
 async def handle_webhook(payload: AirtableWebhookPayload, background_tasks: BackgroundTasks):
     """
     Airtable 자동화(Automation)에 의해 호출되는 웹훅 엔드포인트입니다.
-    데이터 변경이 감지되면 백그라운드에서 데이터 처리 및 저장을 수행합니다.
+    데이터 변경이 감지되면 작업 큐에 데이터 처리 및 저장 작업을 등록합니다.
     """
     logger.info(f"Webhook received: {payload.model_dump_json()}")
     
@@ -44,12 +46,21 @@ async def handle_webhook(payload: AirtableWebhookPayload, background_tasks: Back
         logger.error(err_msg)
         raise HTTPException(status_code=404, detail=err_msg)
 
-    background_tasks.add_task(process_and_save_thread_data, thread_id)
+    # 작업 큐에 등록 (큐 DB 미연결 시 BackgroundTasks로 대체)
+    try:
+        job_id = await asyncio.to_thread(enqueue_job, JOB_AIRTABLE_SYNC_THREAD, {"threadId": thread_id})
+        message = "Processing task has been added to the job queue."
+    except ConnectionError:
+        logger.warning("Job queue unavailable. Falling back to BackgroundTasks.")
+        background_tasks.add_task(process_and_save_thread_data, thread_id)
+        job_id = None
+        message = "Processing task has been added to the background."
     
     return {
         "status": "success",
-        "message": "Processing task has been added to the background.",
-        "threadId": thread_id
+        "message": message,
+        "threadId": thread_id,
+        "jobId": job_id
     }
 
 
@@ -0,0 +1,35 @@
+from fastapi import APIRouter, HTTPException, Path
+from app.services.job_queue import get_job
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+@router.get("/jobs/{job_id}")
+async def get_job_status(job_id: str = Path(..., title="The job id returned when the job was enqueued")):
+    """
+    job_queue에 등록된 작업의 상태/시도 횟수/결과를 조회합니다.
+    """
+    try:
+        job = await asyncio.to_thread(get_job, job_id)
+    except ConnectionError as e:
+        logger.error(f"Database connection error: {e}", exc_info=True)
+        raise HTTPException(status_code=503, detail="Could not connect to the database.")
+
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+
+    return {
+        "jobId": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "maxAttempts": job["max_attempts"],
+        "runAt": job["run_at"],
+        "createdAt": job["created_at"],
+        "updatedAt": job["updated_at"],
+        "result": job["result"],
+        "lastError": job["last_error"],
+    }
@@ -1,13 +1,38 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Header, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, field_validator
 from typing import List, Optional, Dict, Any
+from sqlalchemy.exc import OperationalError
+from app.config import settings
+from app.agents import stage_cache
+from app.agents.llm_cache import llm_cache
+from app.agents.image_index import image_index
+from app.agents.llm_metrics import llm_metrics
+from app.agents.rate_limiter import rate_limiter
+from app.agents.prompt_context import compaction_stats
+from app.agents.llm_replay import LLM_BACKEND, replay
+from app.agents import model_router
+from app.agents.deadline import DeadlineExceeded
+from app.agents.hedging import hedging
+from app.services.job_queue import (
+    enqueue_job,
+    get_job,
+    list_job_events,
+    JOB_MEDICONTENT_GENERATE,
+    JOB_STATUS_SUCCEEDED,
+    JOB_STATUS_FAILED,
+)
+from app.services.idempotency import make_idempotency_key
 from app.services.medicontent_service import (
     save_to_post_data_requests,
     update_post_data_request_status,
     update_medicontent_post_status,
     generate_content_complete,
+    generate_content_batch,
     evaluate_content
 )
+import asyncio
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -28,6 +53,25 @@ class ContentGenerationRequest(BaseModel):
     beforeImagesText: str = ""  # 내원 시 사진 설명
     processImagesText: str = ""  # 치료 과정 사진 설명
     afterImagesText: str = ""  # 치료 결과 사진 설명
+    force: bool = False  # True면 단계 캐시를 무시하고 Plan/Title/Content 재생성
+    modelTiers: Dict[str, str] = {}  # 작업별 모델 티어 덮어쓰기 (예: {"content.section": "lite"}, {"*": "lite"})
+    deadlineSec: Optional[float] = None  # 생성 마감 시간(초) — 미지정 시 엔드포인트/작업 기본값
+
+    @field_validator("modelTiers")
+    @classmethod
+    def _check_model_tiers(cls, v: Dict[str, str]) -> Dict[str, str]:
+        return model_router.validate_tiers(v)
+
+    @field_validator("deadlineSec")
+    @classmethod
+    def _check_deadline(cls, v: Optional[float]) -> Optional[float]:
+        if v is not None and v <= 0:
+            raise ValueError("deadlineSec는 0보다 커야 합니다.")
+        return v
+
+class BatchGenerationRequest(BaseModel):
+    items: List[ContentGenerationRequest]
+    concurrency: Optional[int] = None  # 미지정 시 MEDICONTENT_BATCH_CONCURRENCY
 
 @router.post("/update-post-status")
 async def update_post_status_endpoint(request: Dict[str, str]):
@@ -80,10 +124,13 @@ async def generate_content_complete_endpoint(request: ContentGenerationRequest):
     try:
         logger.info(f"콘텐츠 생성 시작: {request.postId}")
         
-        result = await generate_content_complete(request)
+        result = await generate_content_complete(request, deadline_sec=settings.MEDICONTENT_DEADLINE_SEC)
         
         return result
         
+    except DeadlineExceeded as e:
+        logger.error(f"콘텐츠 생성 마감 시간 초과: {str(e)}")
+        raise HTTPException(status_code=504, detail={"error": str(e)})
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
@@ -98,6 +145,21 @@ async def generate_content_complete_endpoint(request: ContentGenerationRequest):
             }
         )
 
+@router.post("/generate-batch")
+async def generate_batch_endpoint(request: BatchGenerationRequest):
+    """여러 게시물 일괄 생성: 동시 실행 수 제한 + 참조 데이터 1회 로딩, 건별 상태/소요 시간 반환"""
+    if not request.items:
+        raise HTTPException(status_code=400, detail="items가 비어 있습니다.")
+    
+    try:
+        logger.info(f"배치 콘텐츠 생성 시작: {len(request.items)}건")
+        return await generate_content_batch(request.items, concurrency=request.concurrency,
+                                            deadline_sec=settings.MEDICONTENT_DEADLINE_SEC)
+        
+    except Exception as e:
+        logger.error(f"배치 콘텐츠 생성 실패: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/evaluate-content")
 async def evaluate_content_endpoint(request: Dict[str, Any]):
     """생성된 콘텐츠 평가"""
@@ -115,20 +177,128 @@ async def evaluate_content_endpoint(request: Dict[str, Any]):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/trigger-text-generation")
-async def trigger_text_generation(request: Dict[str, str], background_tasks: BackgroundTasks):
-    """텍스트 생성을 백그라운드에서 실행하도록 트리거"""
+async def trigger_text_generation(generation_request: ContentGenerationRequest, background_tasks: BackgroundTasks):
+    """텍스트 생성을 작업 큐(job_queue)에 등록 — 워커 노드에서 실행 (본문 검증 실패는 FastAPI가 422로 응답)"""
     try:
-        post_id = request.get('postId')
+        post_id = generation_request.postId
+        payload = generation_request.model_dump()
+        # 같은 postId·같은 본문이 대기/실행 중이면 기존 작업에 합류 (중복 클릭·자동화 재시도)
+        dedupe_key = make_idempotency_key(generation_request.postId,
+                                          generation_request.model_dump(exclude={"force", "deadlineSec"}))
         
-        # 백그라운드 작업으로 텍스트 생성 실행
-        background_tasks.add_task(generate_content_complete, post_id)
+        try:
+            job_id = await asyncio.to_thread(
+                enqueue_job, JOB_MEDICONTENT_GENERATE, payload, dedupe_key=dedupe_key
+            )
+        except (ConnectionError, OperationalError) as e:
+            # 큐 DB 미연결·접속 실패 시 기존 방식(웹 프로세스 백그라운드)으로 실행
+            logger.warning(f"작업 큐 사용 불가 — BackgroundTasks로 대체 실행: {e}")
+            background_tasks.add_task(generate_content_complete, generation_request,
+                                      deadline_sec=settings.MEDICONTENT_JOB_DEADLINE_SEC)
+            job_id = None
         
         return {
             "status": "success", 
-            "message": "텍스트 생성이 백그라운드에서 시작되었습니다.",
-            "postId": post_id
+            "message": "텍스트 생성 작업이 등록되었습니다.",
+            "postId": post_id,
+            "jobId": job_id,
+            "eventsUrl": f"/api/v1/medicontent/jobs/{job_id}/events" if job_id else None
         }
         
     except Exception as e:
         logger.error(f"백그라운드 작업 트리거 실패: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/stage-cache/stats")
+async def stage_cache_stats():
+    """Plan/Title/Content 단계 캐시 hit/miss 카운터 (현재 프로세스 기준)"""
+    return {"status": "success", "stats": stage_cache.stats()}
+
+@router.get("/llm-cache/stats")
+async def llm_cache_stats():
+    """LLM 응답 캐시 에이전트별 hit/miss 카운터 (현재 프로세스 기준)"""
+    return {"status": "success", "stats": await asyncio.to_thread(llm_cache.stats)}
+
+@router.get("/image-index/stats")
+async def image_index_stats():
+    """이미지 지문 인덱스 항목 수·조회 hit/계산 횟수·근사 중복 병합 수 (현재 프로세스 기준)"""
+    return {"status": "success", "stats": image_index.stats()}
+
+@router.get("/llm-metrics")
+async def llm_metrics_stats():
+    """LLM 호출 토큰/지연 누적 (에이전트·모델·프롬프트 파일별, 현재 프로세스 기준) + 모델별 호출 한도 상태 + 프롬프트 압축 효과 + 중복 요청(hedging) 예산 사용량"""
+    return {
+        "status": "success",
+        "metrics": llm_metrics.stats(),
+        "rateLimits": rate_limiter.stats(),
+        "promptCompaction": compaction_stats.stats(),
+        "backend": replay.stats() if LLM_BACKEND == "replay" else {"backend": LLM_BACKEND},
+        "modelRoutes": model_router.routes(),
+        "hedging": hedging.stats(),
+    }
+
+def _format_sse(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    """SSE 프레임 직렬화"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request, last_event_id: Optional[str] = Header(None)):
+    """생성 작업 진행 상황 SSE 스트림 (input_collected → plan_ready → title_selected → section_done × N → evaluation → completed)"""
+    try:
+        job = await asyncio.to_thread(get_job, job_id)
+    except ConnectionError as e:
+        logger.error(f"Database connection error: {e}")
+        raise HTTPException(status_code=503, detail="Could not connect to the database.")
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    
+    # 재연결 시 브라우저가 보내는 Last-Event-ID 이후부터 이어서 전송
+    after_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+    
+    async def event_stream():
+        nonlocal after_id
+        idle = 0.0
+        try:
+            while not await request.is_disconnected():
+                events = await asyncio.to_thread(list_job_events, job_id, after_id)
+                for ev in events:
+                    after_id = ev["id"]
+                    yield _format_sse(ev["event"], ev["data"], ev["id"])
+                if events:
+                    idle = 0.0
+                    continue
+                
+                current = await asyncio.to_thread(get_job, job_id)
+                if current is None or current["status"] in (JOB_STATUS_SUCCEEDED, JOB_STATUS_FAILED):
+                    # 상태 확인 직전에 기록된 이벤트까지 모두 보낸 뒤 종료
+                    for ev in await asyncio.to_thread(list_job_events, job_id, after_id):
+                        after_id = ev["id"]
+                        yield _format_sse(ev["event"], ev["data"], ev["id"])
+                    yield _format_sse("end", {
+                        "jobId": job_id,
+                        "status": current["status"] if current else None,
+                        "lastError": current["last_error"] if current else None,
+                    })
+                    return
+                
+                await asyncio.sleep(settings.JOB_EVENTS_POLL_INTERVAL_SEC)
+                idle += settings.JOB_EVENTS_POLL_INTERVAL_SEC
+                if idle >= settings.JOB_EVENTS_KEEPALIVE_SEC:
+                    # 프록시 유휴 타임아웃 방지용 주석 프레임
+                    yield ": keepalive\n\n"
+                    idle = 0.0
+        except Exception as e:
+            logger.error(f"작업 이벤트 스트림 실패 ({job_id}): {str(e)}")
+            yield _format_sse("stream_error", {"jobId": job_id, "error": str(e)})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
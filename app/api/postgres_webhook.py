@@ -1,6 +1,8 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks
 from pydantic import BaseModel, Field
 from app.services.postgres_airtable_service import get_thread_id_from_any_record, process_and_save_postgres_thread
+from app.services.job_queue import enqueue_job, JOB_POSTGRES_SYNC_THREAD
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,7 +16,7 @@ class PostgresWebhookPayload(BaseModel):
 async def handle_postgres_webhook(payload: PostgresWebhookPayload, background_tasks: BackgroundTasks):
     """
     Receives a webhook from n8n, determines the master thread_id from the recordId,
-    and processes the entire thread data from PostgreSQL to Airtable in the background.
+    and enqueues processing of the entire thread data from PostgreSQL to Airtable on the job queue.
     """
     logger.info(f"Postgres webhook received: {payload.model_dump_json()}")
     
@@ -27,15 +29,23 @@ async def handle_postgres_webhook(payload: PostgresWebhookPayload, background_ta
         if not thread_id:
             raise ValueError(f"Could not determine thread_id for record '{payload.recordId}'.")
 
-        # Add the main processing task to the background
-        background_tasks.add_task(process_and_save_postgres_thread, thread_id)
+        # Enqueue the main processing task (falls back to BackgroundTasks if the queue is unavailable)
+        try:
+            job_id = await asyncio.to_thread(enqueue_job, JOB_POSTGRES_SYNC_THREAD, {"threadId": thread_id})
+            message = "Processing task has been added to the job queue."
+        except ConnectionError:
+            logger.warning("Job queue unavailable. Falling back to BackgroundTasks.")
+            background_tasks.add_task(process_and_save_postgres_thread, thread_id)
+            job_id = None
+            message = "Processing task has been added to the background."
         
-        logger.info(f"Background task scheduled for thread_id: {thread_id}")
+        logger.info(f"Processing scheduled for thread_id: {thread_id} (jobId: {job_id})")
         
         return {
             "status": "success",
-            "message": "Processing task has been added to the background.",
-            "resolvedThreadId": thread_id
+            "message": message,
+            "resolvedThreadId": thread_id,
+            "jobId": job_id
         }
 
     except ValueError as e:
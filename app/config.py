@@ -42,5 +42,19 @@ class Settings(BaseSettings):
     GEMINI_MODEL: Optional[str] = os.environ.get("GEMINI_MODEL", "gemini-2.5-pro")
     GEMINI_LITE_MODEL: Optional[str] = os.environ.get("GEMINI_LITE_MODEL", "gemini-2.5-flash-lite")
 
+    # --- Job Queue (PostgreSQL) Settings ---
+    JOB_VISIBILITY_TIMEOUT_SEC: int = int(os.environ.get("JOB_VISIBILITY_TIMEOUT_SEC", "900"))
+    JOB_MAX_ATTEMPTS: int = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RETRY_BASE_DELAY_SEC: int = int(os.environ.get("JOB_RETRY_BASE_DELAY_SEC", "30"))
+    JOB_POLL_INTERVAL_SEC: float = float(os.environ.get("JOB_POLL_INTERVAL_SEC", "2"))
+    JOB_EVENTS_POLL_INTERVAL_SEC: float = float(os.environ.get("JOB_EVENTS_POLL_INTERVAL_SEC", "1"))
+    JOB_EVENTS_KEEPALIVE_SEC: int = int(os.environ.get("JOB_EVENTS_KEEPALIVE_SEC", "15"))
+    IDEMPOTENCY_RESULT_TTL_SEC: int = int(os.environ.get("IDEMPOTENCY_RESULT_TTL_SEC", "600"))
+
+    # --- Medicontent 생성 마감 시간 (0이면 제한 없음) ---
+    # 동기 API는 업스트림 게이트웨이 타임아웃보다 짧게, 큐 작업은 작업 단위로 설정
+    MEDICONTENT_DEADLINE_SEC: float = float(os.environ.get("MEDICONTENT_DEADLINE_SEC", "280"))
+    MEDICONTENT_JOB_DEADLINE_SEC: float = float(os.environ.get("MEDICONTENT_JOB_DEADLINE_SEC", "840"))
+
 
 settings = Settings()
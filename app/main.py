@@ -1,8 +1,19 @@
-from fastapi import FastAPI
-from app.api import site_a, site_b, task_c, sample, health, youtube_videos, youtube_comments, airtable, creator_advisor, naver_creator_advisor, postgres_thread_processor, postgres_webhook, medicontent
+from fastapi import FastAPI, Request
+from app.agents import llm_cache
+from app.api import site_a, site_b, task_c, sample, health, youtube_videos, youtube_comments, airtable, creator_advisor, naver_creator_advisor, postgres_thread_processor, postgres_webhook, medicontent, jobs
 
 app = FastAPI()
 
+
+@app.middleware("http")
+async def llm_cache_bypass(request: Request, call_next):
+    """X-LLM-Cache: bypass 헤더가 있으면 이 요청의 LLM 호출은 응답 캐시를 사용하지 않음"""
+    if request.headers.get("x-llm-cache", "").lower() == "bypass":
+        with llm_cache.bypass():
+            return await call_next(request)
+    return await call_next(request)
+
+
 app.include_router(site_a.router, prefix="/site-a")
 app.include_router(site_b.router, prefix="/site-b")
 app.include_router(task_c.router, prefix="/task-c")
@@ -18,3 +29,4 @@ app.include_router(naver_creator_advisor.router, prefix="/api/v1/naver-creator-a
 app.include_router(postgres_thread_processor.router, prefix="/api/v1/postgres", tags=["Postgres Processor"])
 app.include_router(postgres_webhook.router, prefix="/api/v1/postgres-webhook", tags=["Postgres Webhook"])
 app.include_router(medicontent.router, prefix="/api/v1/medicontent", tags=["MediContent"])
+app.include_router(jobs.router, prefix="/api/v1", tags=["Jobs"])
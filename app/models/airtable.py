@@ -26,6 +26,7 @@ class SuccessResponse(BaseModel):
     status: str
     message: str
     threadId: str
+    jobId: Optional[str] = None
 
 class FinalOutput(BaseModel):
     id: str
@@ -0,0 +1,96 @@
+from sqlalchemy import text
+from app.config import settings
+from app.services.postgres_airtable_service import engine
+from app.utils.tracing import traced
+from typing import Any, Dict, Optional
+import threading
+import hashlib
+import logging
+import json
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS generation_results (
+        idempotency_key TEXT PRIMARY KEY,
+        post_id TEXT NOT NULL,
+        result JSONB NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS generation_results_created_idx ON generation_results (created_at)",
+]
+
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+
+def _get_engine():
+    if engine is None:
+        raise ConnectionError("Database connection not established.")
+    return engine
+
+
+def ensure_schema():
+    """
+    generation_results 테이블이 없으면 생성합니다. (프로세스당 1회)
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if _schema_ready:
+            return
+        with _get_engine().begin() as conn:
+            for stmt in _SCHEMA_SQL:
+                conn.execute(text(stmt))
+        _schema_ready = True
+
+
+def make_idempotency_key(post_id: str, payload: Dict[str, Any]) -> str:
+    """
+    postId + 요청 본문 해시 — 동일 게시물·동일 입력의 중복 요청(더블클릭, 자동화 재시도)을 식별합니다.
+    """
+    body = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return f"{post_id}:{hashlib.sha256(body.encode('utf-8')).hexdigest()[:32]}"
+
+
+@traced("postgres.generation_results")
+def get_recent_result(key: str, ttl_sec: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    TTL 이내에 완료된 동일 요청의 결과를 반환합니다. (없으면 None)
+    """
+    ensure_schema()
+    ttl = ttl_sec if ttl_sec is not None else settings.IDEMPOTENCY_RESULT_TTL_SEC
+    with _get_engine().connect() as conn:
+        row = conn.execute(
+            text("""
+                SELECT result FROM generation_results
+                WHERE idempotency_key = :key AND created_at > now() - make_interval(secs => :ttl)
+            """),
+            {"key": key, "ttl": ttl},
+        ).mappings().first()
+    return row["result"] if row else None
+
+
+@traced("postgres.generation_results")
+def save_result(key: str, post_id: str, result: Dict[str, Any]):
+    """
+    완료 결과를 저장(갱신)하고 만료된 행을 정리합니다.
+    """
+    ensure_schema()
+    with _get_engine().begin() as conn:
+        conn.execute(
+            text("""
+                INSERT INTO generation_results (idempotency_key, post_id, result, created_at)
+                VALUES (:key, :post_id, CAST(:result AS JSONB), now())
+                ON CONFLICT (idempotency_key)
+                DO UPDATE SET result = EXCLUDED.result, created_at = EXCLUDED.created_at
+            """),
+            {"key": key, "post_id": post_id, "result": json.dumps(result, ensure_ascii=False, default=str)},
+        )
+        conn.execute(
+            text("DELETE FROM generation_results WHERE created_at < now() - make_interval(secs => :ttl)"),
+            {"ttl": settings.IDEMPOTENCY_RESULT_TTL_SEC},
+        )
@@ -0,0 +1,323 @@
+from sqlalchemy import text
+from app.config import settings
+from app.services.postgres_airtable_service import engine
+from app.utils.tracing import traced
+from typing import Any, Dict, List, Optional
+import threading
+import logging
+import uuid
+import json
+
+logger = logging.getLogger(__name__)
+
+# --- Job Kinds ---
+JOB_MEDICONTENT_GENERATE = "medicontent.generate"
+JOB_POSTGRES_SYNC_THREAD = "postgres.sync_thread"
+JOB_AIRTABLE_SYNC_THREAD = "airtable.sync_thread"
+
+JOB_STATUS_QUEUED = "queued"
+JOB_STATUS_RUNNING = "running"
+JOB_STATUS_SUCCEEDED = "succeeded"
+JOB_STATUS_FAILED = "failed"
+
+_SCHEMA_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS job_queue (
+        id UUID PRIMARY KEY,
+        kind TEXT NOT NULL,
+        payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+        status TEXT NOT NULL DEFAULT 'queued',
+        attempts INT NOT NULL DEFAULT 0,
+        max_attempts INT NOT NULL DEFAULT 3,
+        run_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        locked_by TEXT,
+        locked_until TIMESTAMPTZ,
+        result JSONB,
+        last_error TEXT,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS job_queue_ready_idx ON job_queue (kind, status, run_at)",
+    # 동일 요청 중복 등록 방지: 대기/실행 중인 작업 사이에서만 dedupe_key 유일
+    "ALTER TABLE job_queue ADD COLUMN IF NOT EXISTS dedupe_key TEXT",
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS job_queue_dedupe_active_idx ON job_queue (kind, dedupe_key)
+    WHERE dedupe_key IS NOT NULL AND status IN ('queued', 'running')
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS job_events (
+        id BIGSERIAL PRIMARY KEY,
+        job_id UUID NOT NULL,
+        event TEXT NOT NULL,
+        data JSONB NOT NULL DEFAULT '{}'::jsonb,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS job_events_job_idx ON job_events (job_id, id)",
+]
+
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+
+def _get_engine():
+    if engine is None:
+        logger.error("Database engine is not initialized. Cannot use job queue.")
+        raise ConnectionError("Database connection not established.")
+    return engine
+
+
+def ensure_schema():
+    """
+    job_queue 테이블이 없으면 생성합니다. (프로세스당 1회)
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if _schema_ready:
+            return
+        with _get_engine().begin() as conn:
+            for stmt in _SCHEMA_SQL:
+                conn.execute(text(stmt))
+        _schema_ready = True
+
+
+def _row_to_dict(row) -> Dict[str, Any]:
+    job = dict(row)
+    job["id"] = str(job["id"])
+    for key in ("run_at", "locked_until", "created_at", "updated_at"):
+        if job.get(key) is not None:
+            job[key] = job[key].isoformat()
+    return job
+
+
+@traced("postgres.job_queue")
+def enqueue_job(kind: str, payload: Dict[str, Any], max_attempts: Optional[int] = None, delay_sec: int = 0,
+                dedupe_key: Optional[str] = None) -> str:
+    """
+    작업을 큐에 등록하고 job id를 반환합니다.
+    dedupe_key가 같은 작업이 이미 대기/실행 중이면 새로 등록하지 않고 그 작업의 id를 반환합니다.
+    """
+    ensure_schema()
+    job_id = str(uuid.uuid4())
+    params = {
+        "id": job_id,
+        "kind": kind,
+        "payload": json.dumps(payload, ensure_ascii=False),
+        "max_attempts": max_attempts or settings.JOB_MAX_ATTEMPTS,
+        "delay_sec": delay_sec,
+        "dedupe_key": dedupe_key,
+    }
+    with _get_engine().begin() as conn:
+        inserted = conn.execute(
+            text("""
+                INSERT INTO job_queue (id, kind, payload, max_attempts, run_at, dedupe_key)
+                VALUES (:id, :kind, CAST(:payload AS JSONB), :max_attempts,
+                        now() + make_interval(secs => :delay_sec), :dedupe_key)
+                ON CONFLICT (kind, dedupe_key) WHERE dedupe_key IS NOT NULL AND status IN ('queued', 'running')
+                DO NOTHING
+                RETURNING id
+            """),
+            params,
+        ).first()
+        if inserted is None:
+            existing = conn.execute(
+                text("""
+                    SELECT id FROM job_queue
+                    WHERE kind = :kind AND dedupe_key = :dedupe_key AND status IN ('queued', 'running')
+                """),
+                {"kind": kind, "dedupe_key": dedupe_key},
+            ).first()
+            if existing is not None:
+                logger.info(f"Duplicate job attached: {existing[0]} (kind={kind})")
+                return str(existing[0])
+            # 조회 직전에 기존 작업이 끝난 경우 — 새로 등록
+            conn.execute(
+                text("""
+                    INSERT INTO job_queue (id, kind, payload, max_attempts, run_at, dedupe_key)
+                    VALUES (:id, :kind, CAST(:payload AS JSONB), :max_attempts,
+                            now() + make_interval(secs => :delay_sec), :dedupe_key)
+                """),
+                params,
+            )
+    logger.info(f"Job enqueued: {job_id} (kind={kind})")
+    return job_id
+
+
+def claim_job(worker_id: str, kinds: List[str], visibility_timeout_sec: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    실행 가능한 작업 1건을 점유합니다. (SELECT ... FOR UPDATE SKIP LOCKED)
+    - queued 이면서 run_at이 지난 작업
+    - running 이지만 visibility timeout(locked_until)이 지난 작업 (워커 비정상 종료 복구)
+    """
+    ensure_schema()
+    vt = visibility_timeout_sec or settings.JOB_VISIBILITY_TIMEOUT_SEC
+    with _get_engine().begin() as conn:
+        # 재시도 한도를 넘긴 채 timeout 된 작업은 실패 처리
+        conn.execute(
+            text("""
+                UPDATE job_queue
+                SET status = :failed, locked_by = NULL, locked_until = NULL, updated_at = now(),
+                    last_error = COALESCE(last_error, 'visibility timeout exceeded')
+                WHERE status = :running AND locked_until < now() AND attempts >= max_attempts
+            """),
+            {"failed": JOB_STATUS_FAILED, "running": JOB_STATUS_RUNNING},
+        )
+        row = conn.execute(
+            text("""
+                WITH next_job AS (
+                    SELECT id FROM job_queue
+                    WHERE kind = ANY(:kinds)
+                      AND ((status = :queued AND run_at <= now())
+                           OR (status = :running AND locked_until < now()))
+                    ORDER BY run_at
+                    FOR UPDATE SKIP LOCKED
+                    LIMIT 1
+                )
+                UPDATE job_queue j
+                SET status = :running,
+                    attempts = j.attempts + 1,
+                    locked_by = :worker_id,
+                    locked_until = now() + make_interval(secs => :vt),
+                    updated_at = now()
+                FROM next_job
+                WHERE j.id = next_job.id
+                RETURNING j.*
+            """),
+            {
+                "kinds": list(kinds),
+                "queued": JOB_STATUS_QUEUED,
+                "running": JOB_STATUS_RUNNING,
+                "worker_id": worker_id,
+                "vt": vt,
+            },
+        ).mappings().first()
+    return _row_to_dict(row) if row else None
+
+
+def heartbeat_job(job_id: str, worker_id: str, visibility_timeout_sec: Optional[int] = None) -> bool:
+    """
+    실행 중인 작업의 점유 시간을 연장합니다. 점유권을 잃었으면 False.
+    """
+    vt = visibility_timeout_sec or settings.JOB_VISIBILITY_TIMEOUT_SEC
+    with _get_engine().begin() as conn:
+        result = conn.execute(
+            text("""
+                UPDATE job_queue
+                SET locked_until = now() + make_interval(secs => :vt), updated_at = now()
+                WHERE id = :id AND locked_by = :worker_id AND status = :running
+            """),
+            {"id": job_id, "worker_id": worker_id, "vt": vt, "running": JOB_STATUS_RUNNING},
+        )
+    return result.rowcount > 0
+
+
+@traced("postgres.job_queue")
+def complete_job(job_id: str, worker_id: str, result: Any = None):
+    with _get_engine().begin() as conn:
+        conn.execute(
+            text("""
+                UPDATE job_queue
+                SET status = :succeeded, result = CAST(:result AS JSONB),
+                    locked_by = NULL, locked_until = NULL, last_error = NULL, updated_at = now()
+                WHERE id = :id AND locked_by = :worker_id
+            """),
+            {
+                "id": job_id,
+                "worker_id": worker_id,
+                "succeeded": JOB_STATUS_SUCCEEDED,
+                "result": json.dumps(result, ensure_ascii=False, default=str),
+            },
+        )
+    logger.info(f"Job succeeded: {job_id}")
+
+
+@traced("postgres.job_queue")
+def fail_job(job_id: str, worker_id: str, error: str):
+    """
+    실패 처리: 재시도 여유가 있으면 지수 백오프 후 재등록, 아니면 failed.
+    """
+    with _get_engine().begin() as conn:
+        row = conn.execute(
+            text("""
+                UPDATE job_queue
+                SET status = CASE WHEN attempts < max_attempts THEN :queued ELSE :failed END,
+                    run_at = CASE WHEN attempts < max_attempts
+                                  THEN now() + make_interval(secs => :base_delay * power(2, attempts - 1))
+                                  ELSE run_at END,
+                    locked_by = NULL, locked_until = NULL,
+                    last_error = :error, updated_at = now()
+                WHERE id = :id AND locked_by = :worker_id
+                RETURNING status, attempts, max_attempts
+            """),
+            {
+                "id": job_id,
+                "worker_id": worker_id,
+                "queued": JOB_STATUS_QUEUED,
+                "failed": JOB_STATUS_FAILED,
+                "base_delay": settings.JOB_RETRY_BASE_DELAY_SEC,
+                "error": error[:4000],
+            },
+        ).mappings().first()
+    if row:
+        logger.warning(f"Job failed: {job_id} (attempt {row['attempts']}/{row['max_attempts']}) -> {row['status']}")
+
+
+@traced("postgres.job_queue")
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    ensure_schema()
+    try:
+        uuid.UUID(job_id)
+    except ValueError:
+        return None
+    with _get_engine().connect() as conn:
+        row = conn.execute(
+            text("SELECT * FROM job_queue WHERE id = :id"), {"id": job_id}
+        ).mappings().first()
+    return _row_to_dict(row) if row else None
+
+
+@traced("postgres.job_queue")
+def append_job_event(job_id: str, event: str, data: Optional[Dict[str, Any]] = None) -> int:
+    """
+    작업 진행 이벤트(단계 완료 등)를 기록하고 이벤트 id를 반환합니다. (SSE 스트림에서 조회)
+    """
+    ensure_schema()
+    with _get_engine().begin() as conn:
+        event_id = conn.execute(
+            text("""
+                INSERT INTO job_events (job_id, event, data)
+                VALUES (:job_id, :event, CAST(:data AS JSONB))
+                RETURNING id
+            """),
+            {
+                "job_id": job_id,
+                "event": event,
+                "data": json.dumps(data or {}, ensure_ascii=False, default=str),
+            },
+        ).scalar()
+    return event_id
+
+
+@traced("postgres.job_queue")
+def list_job_events(job_id: str, after_id: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+    """
+    after_id 이후의 작업 이벤트를 순서대로 반환합니다.
+    """
+    ensure_schema()
+    with _get_engine().connect() as conn:
+        rows = conn.execute(
+            text("""
+                SELECT id, event, data, created_at FROM job_events
+                WHERE job_id = :job_id AND id > :after_id
+                ORDER BY id
+                LIMIT :limit
+            """),
+            {"job_id": job_id, "after_id": after_id, "limit": limit},
+        ).mappings().all()
+    return [
+        {"id": r["id"], "event": r["event"], "data": r["data"], "created_at": r["created_at"].isoformat()}
+        for r in rows
+    ]
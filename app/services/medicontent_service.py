@@ -1,7 +1,11 @@
 import os
 import sys
 import json
+import asyncio
 import logging
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from pathlib import Path
@@ -13,6 +17,10 @@ sys.path.append(str(agents_path))
 
 from dotenv import load_dotenv
 from pyairtable import Api
+from app.services.job_queue import append_job_event
+from app.services.idempotency import make_idempotency_key, get_recent_result, save_result
+from app.utils.tracing import span, set_trace_attribute
+from app.agents import deadline
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +39,25 @@ GOOGLE_API_KEY = os.getenv('GEMINI_API_KEY')
 if not GOOGLE_API_KEY:
     logger.warning('GEMINI_API_KEY가 설정되지 않았습니다. 메디컨텐츠 생성 기능이 제한될 수 있습니다.')
 
+# 에이전트 파이프라인(블로킹, 수 분 소요) 전용 실행기 — 동시 생성 개수 상한
+MEDICONTENT_MAX_WORKERS = int(os.getenv('MEDICONTENT_MAX_WORKERS', '4'))
+_pipeline_executor = ThreadPoolExecutor(
+    max_workers=MEDICONTENT_MAX_WORKERS,
+    thread_name_prefix='medicontent-pipeline'
+)
+
+# 파이프라인 1건 내부 단계 병렬도 (제목 생성과 섹션 초안 동시 실행)
+MEDICONTENT_DAG_MAX_WORKERS = int(os.getenv('MEDICONTENT_DAG_MAX_WORKERS', '8'))
+
+# 에이전트 산출물 디스크 저장(test_logs/...) 여부 — 파이프라인 핸드오프는 항상 메모리(PipelineContext)
+MEDICONTENT_PERSIST_LOGS = os.getenv('MEDICONTENT_PERSIST_LOGS', 'true').lower() != 'false'
+
+# 섹션 본문 스트리밍 생성 — 진행 이벤트 구독(job_id) 시 section_partial 미리보기 전달
+MEDICONTENT_STREAM_SECTIONS = os.getenv('MEDICONTENT_STREAM_SECTIONS', 'true').lower() != 'false'
+
+# 배치 생성 기본 동시 실행 수 (실제 병렬도는 MEDICONTENT_MAX_WORKERS 스레드풀로도 제한됨)
+MEDICONTENT_BATCH_CONCURRENCY = int(os.getenv('MEDICONTENT_BATCH_CONCURRENCY', str(MEDICONTENT_MAX_WORKERS)))
+
 api = Api(AIRTABLE_API_KEY)
 base = api.base(AIRTABLE_BASE_ID)
 
@@ -38,6 +65,38 @@ base = api.base(AIRTABLE_BASE_ID)
 table_post_data_requests = base.table('Post Data Requests')
 table_medicontent_posts = base.table('Medicontent Posts')
 
+# 진행 중인 생성 (idempotency key → Future) — 동일 요청 중복 제출 시 같은 결과를 공유 (single-flight)
+_inflight: Dict[str, asyncio.Future] = {}
+
+async def _run_pipeline_blocking(func, *args):
+    """블로킹 에이전트 실행을 이벤트 루프 밖(바운디드 스레드풀)에서 수행"""
+    loop = asyncio.get_running_loop()
+    # trace span 등 contextvars를 실행기 스레드로 전달
+    return await loop.run_in_executor(_pipeline_executor, contextvars.copy_context().run, func, *args)
+
+async def _airtable(fn, *args, **kwargs):
+    """Airtable 블로킹 호출 — 요청 마감 시간이 있으면 남은 시간까지만 대기"""
+    return await asyncio.wait_for(asyncio.to_thread(fn, *args, **kwargs), timeout=deadline.timeout(None))
+
+def _job_event_sink(job_id: Optional[str]):
+    """job_id가 있으면 진행 이벤트를 job_events 테이블에 기록하는 콜백 반환 (SSE 스트림용)"""
+    if not job_id:
+        return None
+    
+    def _sink(event: str, data: Dict[str, Any]):
+        append_job_event(job_id, event, data)
+    
+    return _sink
+
+async def _emit_job_event(sink, event: str, data: Dict[str, Any]):
+    """이벤트 기록 실패는 생성 결과에 영향을 주지 않음"""
+    if sink is None:
+        return
+    try:
+        await asyncio.to_thread(sink, event, data)
+    except Exception as e:
+        logger.warning(f"진행 이벤트 기록 실패({event}): {e}")
+
 async def save_to_post_data_requests(data):
     """Post Data Requests 테이블에 저장"""
     try:
@@ -58,7 +117,8 @@ async def save_to_post_data_requests(data):
             'Status': '대기'
         }
         
-        result = table_post_data_requests.create(record_data)
+        with span("airtable.create", table="Post Data Requests"):
+            result = await _airtable(table_post_data_requests.create, record_data)
         return result['id']
         
     except Exception as e:
@@ -85,7 +145,8 @@ async def update_post_data_request_status(record_id: str, status: str, results:
             if 'evaluation' in results:
                 update_data['Evaluation'] = json.dumps(results['evaluation'], ensure_ascii=False)
         
-        table_post_data_requests.update(record_id, update_data)
+        with span("airtable.update", table="Post Data Requests", status=status):
+            await _airtable(table_post_data_requests.update, record_id, update_data)
         logger.info(f"상태 업데이트 완료: {record_id} -> {status}")
         
     except Exception as e:
@@ -96,7 +157,10 @@ async def update_medicontent_post_status(post_id: str, status: str):
     """Medicontent Posts 테이블의 상태 업데이트"""
     try:
         # Post ID로 레코드를 검색하여 찾기
-        medicontent_records = table_medicontent_posts.all(formula=f"{{Post Id}} = '{post_id}'")
+        with span("airtable.all", table="Medicontent Posts"):
+            medicontent_records = await _airtable(
+                table_medicontent_posts.all, formula=f"{{Post Id}} = '{post_id}'"
+            )
         
         if not medicontent_records:
             logger.warning(f"Post ID '{post_id}'에 해당하는 Medicontent Posts 레코드를 찾을 수 없습니다.")
@@ -113,7 +177,8 @@ async def update_medicontent_post_status(post_id: str, status: str):
             # 'Updated At': current_time.strftime('%Y-%m-%d %H:%M')
         }
         
-        table_medicontent_posts.update(record_id, update_data)
+        with span("airtable.update", table="Medicontent Posts", status=status):
+            await _airtable(table_medicontent_posts.update, record_id, update_data)
         logger.info(f"Medicontent Posts 상태 업데이트 완료: {record_id} (Post ID: {post_id}) → {status}")
         
     except Exception as e:
@@ -134,36 +199,168 @@ def split_image_descriptions(text: str, count: int) -> List[str]:
         result.append(descriptions[i] if i < len(descriptions) else "")
     return result
 
-async def generate_content_complete(request):
-    """완전한 워크플로우 실행"""
+def _fetch_hospital_info():
+    """Hospital 테이블에서 병원 정보 조회 (실패 시 기본값)"""
+    hospital_table = base.table('Hospital')
+    try:
+        with span("airtable.all", table="Hospital"):
+            hospital_records = hospital_table.all()
+        if hospital_records:
+            hospital_record = hospital_records[0]['fields']
+            return (
+                hospital_record.get('Hospital Name', '병원'),
+                hospital_record.get('Address', ''),
+                hospital_record.get('Phone', '')
+            )
+        raise Exception("Hospital 테이블에 데이터가 없음")
+    except Exception as e:
+        logger.warning(f"Settings - Hospital 테이블 조회 실패: {e}, 기본값 사용")
+        return (
+            "내이튼치과의원",
+            "B동 507호 라스플로레스 경기도 화성시 동탄대로 537",
+            "031-526-2246"
+        )
+
+def _load_reference_data():
+    """참조 데이터/프롬프트 일괄 로딩 (블로킹)"""
+    from app.agents.reference_data import load_reference_data
+    return load_reference_data()
+
+def _run_agent_pipeline(input_data: Dict[str, Any], on_event=None, reference=None, force: bool = False,
+                        model_tiers: Optional[Dict[str, str]] = None):
+    """Input → Plan → (Title ∥ 섹션 초안) → Content 에이전트 DAG 실행 (블로킹, 스레드풀 전용)"""
+    # AI 에이전트들 import (ai-api 내부 경로)
+    try:
+        from app.agents.pipeline_context import PipelineContext
+        from app.agents.pipeline_dag import run_generation_pipeline
+        from app.agents.content_agent import format_full_article
+    except ImportError as e:
+        logger.error(f"AI 에이전트 import 실패: {e}")
+        raise Exception("AI 에이전트 모듈을 찾을 수 없습니다. app/agents 폴더를 확인해주세요.")
+    
+    # 단계 간 산출물은 PipelineContext로 직접 전달 (최신 로그 파일 탐색 없음)
+    ctx = PipelineContext(
+        mode="use", persist=MEDICONTENT_PERSIST_LOGS, force=force, reference=reference, on_event=on_event,
+        stream=MEDICONTENT_STREAM_SECTIONS and on_event is not None, model_tiers=dict(model_tiers or {}),
+    )
+    
+    logger.info("Step 3~6: 에이전트 파이프라인(DAG) 실행...")
+    run_generation_pipeline(ctx, input_data=input_data, max_workers=MEDICONTENT_DAG_MAX_WORKERS)
+    logger.info(f"단계별 소요 시간(초): {ctx.stage_timings}")
+    if ctx.llm_usage:
+        total = ctx.llm_usage["total"]
+        logger.info(
+            f"LLM 사용량: {total['calls']}회, 입력 {total['prompt_tokens']} / 출력 {total['output_tokens']} 토큰, "
+            f"누적 {total['latency_ms']}ms (프롬프트별: "
+            f"{ {k: v['latency_ms'] for k, v in ctx.llm_usage['by_prompt_file'].items()} })"
+        )
+    
+    # 전체 글 생성
+    full_article = format_full_article(
+        ctx.content, input_data={**ctx.input_row, **ctx.plan, 'title': ctx.selected_title}
+    )
+    
+    return ctx.plan, ctx.selected_title, full_article
+
+async def generate_content_complete(request, job_id: Optional[str] = None,
+                                    hospital_info: Optional[tuple] = None, reference=None,
+                                    deadline_sec: Optional[float] = None):
+    """
+    완전한 워크플로우 실행
+    - job_id가 있으면 단계별 진행 이벤트를 기록
+    - hospital_info / reference가 주어지면 재조회 없이 사용 (배치 실행)
+    - deadline_sec(엔드포인트/작업별 기본값, 요청의 deadlineSec가 우선)을 마감 시간으로 에이전트·LLM·Airtable 호출에 전파
+    - 전체 구간을 "medicontent.generate" span으로 추적 (postId/jobId/case_id 부착)
+    """
+    trace_id = job_id.replace('-', '') if job_id else None
+    budget = getattr(request, 'deadlineSec', None) or deadline_sec
+    with span("medicontent.generate", trace_id=trace_id) as sp, deadline.scope(budget) as dl:
+        set_trace_attribute("postId", request.postId)
+        if job_id:
+            set_trace_attribute("jobId", job_id)
+        if dl is not None:
+            sp.set(deadline_sec=round(dl.remaining(), 2))
+        return await _generate_single_flight(request, job_id, hospital_info, reference, sp)
+
+def _idempotency_key(request) -> str:
+    return make_idempotency_key(request.postId, request.model_dump(exclude={"force", "deadlineSec"}))
+
+async def _generate_single_flight(request, job_id, hospital_info, reference, sp):
+    """
+    동일 요청(postId + 본문 해시) 중복 실행 방지
+    - 진행 중이면 해당 실행에 합류해 같은 결과를 반환
+    - IDEMPOTENCY_RESULT_TTL_SEC 이내 완료 결과가 있으면 재생성 없이 반환 (force=True면 생략)
+    - 결과 테이블 조회/저장 실패는 무시 (DB 미연결 시 프로세스 내 합류만 동작)
+    """
+    key = _idempotency_key(request)
+    force = getattr(request, 'force', False)
+    event_sink = _job_event_sink(job_id)
+    
+    fut = _inflight.get(key)
+    if fut is not None:
+        logger.info(f"진행 중인 동일 요청에 합류: {request.postId}")
+        sp.set(dedup="inflight")
+        result = await asyncio.wait_for(asyncio.shield(fut), timeout=deadline.remaining())
+        await _emit_job_event(event_sink, "completed", {"postId": request.postId, "dedup": "inflight",
+                                                        "recordId": result.get("recordId")})
+        return {**result, "dedup": "inflight"}
+    
+    if not force:
+        try:
+            cached = await asyncio.to_thread(get_recent_result, key)
+        except Exception as e:
+            logger.warning(f"최근 결과 조회 실패 (무시하고 생성): {e}")
+            cached = None
+        # 조회 도중 다른 요청이 먼저 시작했을 수 있음
+        if cached is None and key in _inflight:
+            return await _generate_single_flight(request, job_id, hospital_info, reference, sp)
+        if cached is not None:
+            logger.info(f"최근 완료 결과 재사용: {request.postId}")
+            sp.set(dedup="result")
+            await _emit_job_event(event_sink, "completed", {"postId": request.postId, "dedup": "result",
+                                                            "recordId": cached.get("recordId")})
+            return {**cached, "dedup": "result"}
+    
+    fut = asyncio.get_running_loop().create_future()
+    _inflight[key] = fut
+    try:
+        result = await _generate_content_complete(request, job_id, hospital_info, reference)
+    except asyncio.CancelledError:
+        fut.cancel()
+        raise
+    except BaseException as e:
+        fut.set_exception(e)
+        fut.exception()  # 합류한 요청이 없어도 "never retrieved" 경고가 나지 않도록
+        raise
+    else:
+        fut.set_result(result)
+        try:
+            await asyncio.to_thread(save_result, key, request.postId, result)
+        except Exception as e:
+            logger.warning(f"결과 저장 실패 (idempotency): {e}")
+        return result
+    finally:
+        _inflight.pop(key, None)
+
+async def _generate_content_complete(request, job_id, hospital_info, reference):
     record_id = None
+    event_sink = _job_event_sink(job_id)
     
     try:
         # 1단계: Post Data Requests에 저장 (상태: 대기)
         logger.info("Step 1: Post Data Requests에 저장...")
         record_id = await save_to_post_data_requests(request)
         logger.info(f"레코드 생성 완료: {record_id}")
+        await _emit_job_event(event_sink, "started", {"postId": request.postId, "recordId": record_id})
         
         # 2단계: 상태를 '처리 중'으로 변경
         logger.info("Step 2: 상태를 '처리 중'으로 변경...")
         await update_post_data_request_status(record_id, '처리 중')
         
         # 3단계: 병원 정보 조회
-        hospital_table = base.table('Hospital')
-        try:
-            hospital_records = hospital_table.all()
-            if hospital_records:
-                hospital_record = hospital_records[0]['fields']
-                hospital_name = hospital_record.get('Hospital Name', '병원')
-                hospital_address = hospital_record.get('Address', '')
-                hospital_phone = hospital_record.get('Phone', '')
-            else:
-                raise Exception("Hospital 테이블에 데이터가 없음")
-        except Exception as e:
-            logger.warning(f"Settings - Hospital 테이블 조회 실패: {e}, 기본값 사용")
-            hospital_name = "내이튼치과의원"
-            hospital_address = "B동 507호 라스플로레스 경기도 화성시 동탄대로 537"
-            hospital_phone = "031-526-2246"
+        if hospital_info is None:
+            hospital_info = await _airtable(_fetch_hospital_info)
+        hospital_name, hospital_address, hospital_phone = hospital_info
         
         # 4단계: UI 데이터를 InputAgent 형식으로 변환
         input_data = {
@@ -206,42 +403,16 @@ async def generate_content_complete(request):
             "representative_persona": ""
         }
         
-        # 5단계: AI 에이전트들 import 및 실행 (ai-api 내부 경로)
-        try:
-            from app.agents.input_agent import InputAgent
-            from app.agents.plan_agent import main as plan_agent_main
-            from app.agents.title_agent import run as title_agent_run
-            from app.agents.content_agent import run as content_agent_run
-        except ImportError as e:
-            logger.error(f"AI 에이전트 import 실패: {e}")
-            raise Exception("AI 에이전트 모듈을 찾을 수 없습니다. app/agents 폴더를 확인해주세요.")
-        
-        # 6단계: 전체 파이프라인 실행
-        logger.info("Step 3: InputAgent 실행...")
-        input_agent = InputAgent(input_data=input_data)
-        input_result = input_agent.collect(mode="use")
-        
-        logger.info("Step 4: PlanAgent 실행...")
-        plan = plan_agent_main(mode='use', input_data=input_result)
-        
-        logger.info("Step 5: TitleAgent 실행...")
-        title_result = title_agent_run(plan=plan, mode='use')
-        title = title_result.get('selected', {}).get('title', '')
-        
-        logger.info("Step 6: ContentAgent 실행...")
-        # ContentAgent는 파일 경로를 사용하므로 input_data 파라미터 제거
-        content_result = content_agent_run(mode='use')
-        content = content_result
-        
-        # 7단계: 전체 글 생성 (content_agent의 format_full_article 함수 사용)
-        try:
-            from app.agents.content_agent import format_full_article
-            full_article = format_full_article(content, input_data={**input_result, **plan, 'title': title})
-        except ImportError:
-            # format_full_article 함수가 없으면 content를 그대로 사용
-            full_article = content if isinstance(content, str) else str(content)
+        # 5~7단계: AI 에이전트 파이프라인 (블로킹 → 전용 스레드풀에서 실행)
+        plan, title, full_article = await _run_pipeline_blocking(
+            _run_agent_pipeline, input_data, event_sink, reference, getattr(request, 'force', False),
+            getattr(request, 'modelTiers', None)
+        )
         
         logger.info("텍스트 생성 완료!")
+        dl = deadline.current()
+        if dl is not None and dl.degraded:
+            logger.warning(f"마감 임박으로 축소된 단계: {dl.degraded} (남은 {dl.remaining():.1f}초)")
         
         # 8단계: 결과를 Post Data Requests에 업데이트 (상태: 완료)
         results = {
@@ -254,6 +425,7 @@ async def generate_content_complete(request):
                 "content_evaluation": "콘텐츠 생성 완료"
             }
         }
+        await _emit_job_event(event_sink, "evaluation", results["evaluation"])
         
         logger.info("Step 7: 결과를 Airtable에 저장...")
         try:
@@ -270,19 +442,30 @@ async def generate_content_complete(request):
             logger.warning(f"Medicontent Posts 상태 업데이트 실패 (무시하고 계속 진행): {e}")
             # Medicontent Posts 업데이트 실패해도 성공으로 처리
         
-        return {
+        await _emit_job_event(event_sink, "completed", {
+            "postId": request.postId,
+            "recordId": record_id,
+            "title": title,
+            "content": full_article,
+        })
+        
+        response = {
             "status": "success",
             "postId": request.postId,
             "recordId": record_id,
             "results": results,
             "message": "메디컨텐츠 생성 및 DB 저장 완료!"
         }
+        if dl is not None:
+            response["deadline"] = dl.to_dict()
+        return response
         
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
         logger.error(f"오류 발생: {str(e)}")
         logger.error(f"상세: {error_details}")
+        await _emit_job_event(event_sink, "error", {"postId": request.postId, "error": str(e)})
         
         # 오류 발생 시 상태를 '대기'로 되돌리기
         if record_id:
@@ -291,8 +474,70 @@ async def generate_content_complete(request):
             except:
                 pass
         
+        if isinstance(e, (TimeoutError, asyncio.TimeoutError)):
+            raise deadline.DeadlineExceeded(f"텍스트 생성 마감 시간 초과: {str(e)}") from e
         raise Exception(f"텍스트 생성 실패: {str(e)}")
 
+async def generate_content_batch(requests, concurrency: Optional[int] = None,
+                                 deadline_sec: Optional[float] = None):
+    """
+    여러 건 동시 생성 (동시 실행 수 제한)
+    - Hospital 테이블/참조 데이터/프롬프트는 배치당 1회만 로딩
+    - 건별 상태/소요 시간 반환 (한 건 실패가 배치 전체를 중단시키지 않음)
+    - deadline_sec: 배치 전체 마감 시간 (건별 deadlineSec는 그 안에서만 적용)
+    """
+    with deadline.scope(deadline_sec):
+        return await _generate_content_batch(requests, concurrency)
+
+async def _generate_content_batch(requests, concurrency: Optional[int]):
+    concurrency = max(1, concurrency or MEDICONTENT_BATCH_CONCURRENCY)
+    batch_started = time.perf_counter()
+    
+    hospital_info, reference = await asyncio.gather(
+        _airtable(_fetch_hospital_info),
+        asyncio.to_thread(_load_reference_data),
+    )
+    logger.info(f"배치 생성 시작: {len(requests)}건 (동시 실행 {concurrency})")
+    
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def _run_one(request):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result = await generate_content_complete(
+                    request, hospital_info=hospital_info, reference=reference
+                )
+                return {
+                    "postId": request.postId,
+                    "status": "success",
+                    "recordId": result.get("recordId"),
+                    "title": result.get("results", {}).get("title"),
+                    "elapsedSec": round(time.perf_counter() - started, 2),
+                }
+            except Exception as e:
+                return {
+                    "postId": request.postId,
+                    "status": "failed",
+                    "error": str(e),
+                    "elapsedSec": round(time.perf_counter() - started, 2),
+                }
+    
+    items = await asyncio.gather(*(_run_one(r) for r in requests))
+    succeeded = sum(1 for item in items if item["status"] == "success")
+    elapsed = round(time.perf_counter() - batch_started, 2)
+    logger.info(f"배치 생성 완료: 성공 {succeeded}/{len(items)}건, {elapsed}초")
+    
+    return {
+        "status": "success" if succeeded == len(items) else ("partial" if succeeded else "failed"),
+        "total": len(items),
+        "succeeded": succeeded,
+        "failed": len(items) - succeeded,
+        "concurrency": concurrency,
+        "elapsedSec": elapsed,
+        "items": items,
+    }
+
 async def evaluate_content(request: Dict[str, Any]):
     """생성된 콘텐츠 평가"""
     try:
@@ -0,0 +1,211 @@
+"""
+경량 트레이싱 (중첩 span + 소요 시간)
+
+- span("llm.generate", model=...) 컨텍스트 매니저 / @traced 데코레이터로 구간 측정
+- 부모-자식 관계와 trace_id는 contextvars로 전파
+  (asyncio.to_thread는 자동 전파, 스레드풀 submit은 contextvars.copy_context().run 으로 감싸야 함)
+- set_trace_attribute("case_id", ...) 로 요청/케이스 식별자를 trace 전체 span에 부착
+- 내보내기
+    * JSONL(선택): TRACE_JSONL_DIR 설정 시 {TRACE_JSONL_DIR}/{YYYYMMDD}.jsonl — span 1개당 1줄,
+      TRACE_JSONL_KEEP_DAYS(기본 7)일이 지난 파일은 날짜가 바뀔 때 삭제
+    * OTLP(선택): OTEL_EXPORTER_OTLP_ENDPOINT 설정 + opentelemetry 패키지 설치 시
+- TRACE_ENABLED=false 면 모든 span이 no-op
+"""
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "true").lower() != "false"
+_TRACE_JSONL_DIR = os.getenv("TRACE_JSONL_DIR", "").strip()
+TRACE_JSONL_DIR = Path(_TRACE_JSONL_DIR) if _TRACE_JSONL_DIR else None  # 미설정이면 JSONL 기록 안 함
+TRACE_JSONL_KEEP_DAYS = int(os.getenv("TRACE_JSONL_KEEP_DAYS", "7"))
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attrs", "trace_attrs",
+                 "start", "_t0", "duration_ms", "status", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str],
+                 attrs: Dict[str, Any], trace_attrs: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attrs = attrs
+        self.trace_attrs = trace_attrs  # trace 전체가 공유하는 dict (case_id, postId 등)
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def to_record(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": datetime.fromtimestamp(self.start).isoformat(timespec="milliseconds"),
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "error": self.error,
+            "thread": threading.current_thread().name,
+            "attrs": self.attrs,
+            **self.trace_attrs,
+        }
+
+
+class _NoopSpan:
+    trace_id = None
+    attrs: Dict[str, Any] = {}
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("trace_span", default=None)
+
+# --- Exporters ---
+_write_lock = threading.Lock()
+_otel_lock = threading.Lock()
+_otel_tracer = None
+_otel_ready = False
+_jsonl_day: Optional[str] = None
+
+
+def _prune_jsonl(today: str) -> None:
+    """보관 기간(TRACE_JSONL_KEEP_DAYS)이 지난 일자별 JSONL 삭제 (0 이하면 보관 무제한)"""
+    if TRACE_JSONL_KEEP_DAYS <= 0:
+        return
+    cutoff = (datetime.strptime(today, "%Y%m%d") - timedelta(days=TRACE_JSONL_KEEP_DAYS)).strftime("%Y%m%d")
+    for old in TRACE_JSONL_DIR.glob("*.jsonl"):
+        if old.stem.isdigit() and old.stem <= cutoff:
+            old.unlink(missing_ok=True)
+
+
+def _export_jsonl(record: Dict[str, Any]) -> None:
+    global _jsonl_day
+    if TRACE_JSONL_DIR is None:
+        return
+    try:
+        today = datetime.now().strftime('%Y%m%d')
+        path = TRACE_JSONL_DIR / f"{today}.jsonl"
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with _write_lock:
+            if today != _jsonl_day:
+                TRACE_JSONL_DIR.mkdir(parents=True, exist_ok=True)
+                _prune_jsonl(today)
+                _jsonl_day = today
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+    except Exception as e:
+        logger.debug(f"Trace export failed: {e}")
+
+
+def _get_otel_tracer():
+    """OTLP 내보내기 (엔드포인트 설정 + opentelemetry 설치 시에만, 프로세스당 1회 초기화)"""
+    global _otel_tracer, _otel_ready
+    if _otel_ready:
+        return _otel_tracer
+    with _otel_lock:
+        if _otel_ready:
+            return _otel_tracer
+        if OTLP_ENDPOINT:
+            try:
+                from opentelemetry import trace as otel_trace
+                from opentelemetry.sdk.resources import Resource
+                from opentelemetry.sdk.trace import TracerProvider
+                from opentelemetry.sdk.trace.export import BatchSpanProcessor
+                from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+                provider = TracerProvider(resource=Resource.create({
+                    "service.name": os.getenv("OTEL_SERVICE_NAME", "ai-api")
+                }))
+                provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+                otel_trace.set_tracer_provider(provider)
+                _otel_tracer = otel_trace.get_tracer("app.utils.tracing")
+            except ImportError:
+                logger.warning("OTEL_EXPORTER_OTLP_ENDPOINT is set but opentelemetry packages are not installed.")
+        _otel_ready = True
+    return _otel_tracer
+
+
+def _otel_attr(value: Any):
+    return value if isinstance(value, (str, bool, int, float)) else json.dumps(value, ensure_ascii=False, default=str)
+
+
+# --- Public API ---
+@contextmanager
+def span(name: str, trace_id: Optional[str] = None, **attrs: Any):
+    """
+    구간 측정. 현재 span이 없으면 새 trace의 루트가 됩니다. (trace_id 지정 가능: job id 등)
+    """
+    if not TRACE_ENABLED:
+        yield _NOOP
+        return
+
+    parent = _current.get()
+    sp = Span(
+        name=name,
+        trace_id=parent.trace_id if parent else (trace_id or uuid.uuid4().hex),
+        parent_id=parent.span_id if parent else None,
+        attrs=dict(attrs),
+        trace_attrs=parent.trace_attrs if parent else {},
+    )
+    token = _current.set(sp)
+    tracer = _get_otel_tracer()
+    with (tracer.start_as_current_span(name) if tracer else nullcontext()) as otel_span:
+        try:
+            yield sp
+        except BaseException as e:
+            sp.status = "error"
+            sp.error = f"{type(e).__name__}: {e}"[:500]
+            raise
+        finally:
+            _current.reset(token)
+            sp.duration_ms = round((time.perf_counter() - sp._t0) * 1000, 2)
+            if otel_span is not None:
+                for k, v in {**sp.trace_attrs, **sp.attrs}.items():
+                    otel_span.set_attribute(k, _otel_attr(v))
+            _export_jsonl(sp.to_record())
+
+
+def traced(name: Optional[str] = None):
+    """함수 전체를 span으로 감싸는 데코레이터 (동기 함수용)"""
+    def deco(fn):
+        span_name = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name, fn=fn.__name__):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def set_trace_attribute(key: str, value: Any) -> None:
+    """현재 trace 전체(이후 기록되는 모든 span)에 식별자 부착 — 예: case_id, postId"""
+    sp = _current.get()
+    if sp is not None:
+        sp.trace_attrs[key] = value
+
+
+def current_trace_id() -> Optional[str]:
+    sp = _current.get()
+    return sp.trace_id if sp else None
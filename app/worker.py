@@ -0,0 +1,125 @@
+"""
+Job Worker 엔트리포인트 (PostgreSQL job_queue 소비)
+
+사용 예:
+    python -m app.worker                                   # 모든 작업 종류 처리
+    python -m app.worker --kinds medicontent.generate --concurrency 2
+    python -m app.worker --kinds postgres.sync_thread,airtable.sync_thread --concurrency 8
+
+API 파드와 분리된 노드에서 여러 개 실행할 수 있습니다. (SKIP LOCKED로 작업 중복 점유 없음)
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import traceback
+import uuid
+
+from app.config import settings
+from app.services import job_queue
+from app.utils.tracing import span
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# --- Job Handlers ---
+async def _handle_medicontent_generate(payload, job_id: str):
+    from app.api.medicontent import ContentGenerationRequest
+    from app.services.medicontent_service import generate_content_complete
+    return await generate_content_complete(ContentGenerationRequest(**payload), job_id=job_id,
+                                           deadline_sec=settings.MEDICONTENT_JOB_DEADLINE_SEC)
+
+
+async def _handle_postgres_sync_thread(payload, job_id: str):
+    from app.services.postgres_airtable_service import process_and_save_postgres_thread
+    processed = await asyncio.to_thread(process_and_save_postgres_thread, payload["threadId"])
+    return {"threadId": payload["threadId"], "recordId": processed.get("id")}
+
+
+async def _handle_airtable_sync_thread(payload, job_id: str):
+    from app.services.airtable_service import process_and_save_thread_data
+    processed = await asyncio.to_thread(process_and_save_thread_data, payload["threadId"])
+    return {"threadId": payload["threadId"], "recordId": processed.get("id")}
+
+
+HANDLERS = {
+    job_queue.JOB_MEDICONTENT_GENERATE: _handle_medicontent_generate,
+    job_queue.JOB_POSTGRES_SYNC_THREAD: _handle_postgres_sync_thread,
+    job_queue.JOB_AIRTABLE_SYNC_THREAD: _handle_airtable_sync_thread,
+}
+
+
+# --- Worker Loop ---
+async def _heartbeat(job_id: str, worker_id: str, stop: asyncio.Event):
+    interval = max(settings.JOB_VISIBILITY_TIMEOUT_SEC / 3, 1)
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            try:
+                if not await asyncio.to_thread(job_queue.heartbeat_job, job_id, worker_id):
+                    logger.warning(f"Lost lease on job {job_id}")
+                    return
+            except Exception as e:
+                logger.error(f"Heartbeat failed for job {job_id}: {e}")
+
+
+async def _run_job(job, worker_id: str):
+    job_id = job["id"]
+    handler = HANDLERS[job["kind"]]
+    logger.info(f"[{worker_id}] Running job {job_id} (kind={job['kind']}, attempt={job['attempts']})")
+
+    stop = asyncio.Event()
+    hb = asyncio.create_task(_heartbeat(job_id, worker_id, stop))
+    try:
+        with span(f"job.{job['kind']}", trace_id=job_id.replace("-", ""), jobId=job_id, attempt=job["attempts"]):
+            result = await handler(job["payload"] or {}, job_id)
+        await asyncio.to_thread(job_queue.complete_job, job_id, worker_id, result)
+    except Exception as e:
+        logger.error(f"[{worker_id}] Job {job_id} failed: {e}", exc_info=True)
+        error = f"{e}\n{traceback.format_exc()}"
+        await asyncio.to_thread(job_queue.fail_job, job_id, worker_id, error)
+    finally:
+        stop.set()
+        await hb
+
+
+async def _slot_loop(slot: int, base_worker_id: str, kinds):
+    worker_id = f"{base_worker_id}:{slot}"
+    while True:
+        try:
+            job = await asyncio.to_thread(job_queue.claim_job, worker_id, kinds)
+        except Exception as e:
+            logger.error(f"[{worker_id}] Failed to claim job: {e}")
+            job = None
+        if job is None:
+            await asyncio.sleep(settings.JOB_POLL_INTERVAL_SEC)
+            continue
+        await _run_job(job, worker_id)
+
+
+async def run_worker(kinds, concurrency: int):
+    base_worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+    logger.info(f"Worker {base_worker_id} started (kinds={kinds}, concurrency={concurrency})")
+    await asyncio.to_thread(job_queue.ensure_schema)
+    await asyncio.gather(*(_slot_loop(i, base_worker_id, kinds) for i in range(concurrency)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PostgreSQL job_queue 워커")
+    parser.add_argument("--kinds", default=",".join(HANDLERS.keys()), help="처리할 작업 종류(쉼표 구분)")
+    parser.add_argument("--concurrency", type=int, default=int(os.environ.get("WORKER_CONCURRENCY", "2")))
+    args = parser.parse_args()
+
+    kinds = [k.strip() for k in args.kinds.split(",") if k.strip()]
+    unknown = [k for k in kinds if k not in HANDLERS]
+    if unknown:
+        parser.error(f"알 수 없는 작업 종류: {unknown}")
+
+    asyncio.run(run_worker(kinds, max(args.concurrency, 1)))
+
+
+if __name__ == "__main__":
+    main()
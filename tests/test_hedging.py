@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+hedging 테스트 (가짜 호출 — threading.Event로 원 호출/중복 호출의 완료 시점을 제어)
+- 예산 계산(중복 요청 수 ≤ budget × 원 호출 수), 호출 한도 거절 시 예산 환원, 승자/패자 처리
+"""
+
+import threading
+
+import pytest
+
+from app.agents import hedging as hedging_mod
+from app.agents.hedging import HEDGE, PRIMARY, HedgePolicy
+
+DELAY = 0.02  # 중복 요청까지 대기 (초)
+WAIT = 5.0    # 테스트 안전 장치 — 정상이면 도달하지 않음
+
+
+class _FakeCall:
+    """n번째 호출(0부터)마다 지정한 Event가 set될 때까지 대기 후 결과 반환/예외"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)  # (event 또는 None, 결과 또는 예외)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            gate, outcome = self.outcomes[self.calls]
+            self.calls += 1
+        if gate is not None:
+            assert gate.wait(WAIT)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+class _Abandoned:
+    def __init__(self):
+        self.kinds = []
+        self.done = threading.Event()
+
+    def __call__(self, kind, fut):
+        self.kinds.append(kind)
+        self.done.set()
+
+
+def _policy(budget=1.0, calls=1):
+    policy = HedgePolicy(enabled=True, agents=frozenset({"content"}), percentile=95, budget=budget,
+                         min_delay_ms=0)
+    for _ in range(calls):
+        policy.note_call()
+    return policy
+
+
+def test_fast_primary_is_not_hedged():
+    policy = _policy()
+    call = _FakeCall((None, "primary"))
+
+    result, winner = policy.run(call, delay=WAIT, acquire=lambda: pytest.fail("hedge acquired"),
+                                on_abandon=_Abandoned())
+
+    assert (result, winner) == ("primary", PRIMARY)
+    assert call.calls == 1
+    assert policy.stats()["hedged"] == 0
+
+
+def test_slow_primary_is_hedged_and_loser_is_abandoned():
+    policy = _policy()
+    release_primary = threading.Event()
+    call = _FakeCall((release_primary, "slow"), (None, "fast"))
+    abandoned = _Abandoned()
+
+    result, winner = policy.run(call, delay=DELAY, acquire=lambda: True, on_abandon=abandoned)
+    assert (result, winner) == ("fast", HEDGE)
+    assert abandoned.kinds == []  # 원 호출은 아직 실행 중 — 완료 후 1회 보고
+    release_primary.set()
+    assert abandoned.done.wait(WAIT)
+
+    assert abandoned.kinds == [PRIMARY]
+    stats = policy.stats()
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1 and stats["primary_wins"] == 0
+    assert stats["hedge_ratio"] == 1.0
+
+
+def test_budget_limits_hedges_to_fraction_of_calls():
+    policy = _policy(budget=0.1, calls=9)
+    spent = [policy._spend()]
+    policy.note_call()               # 10번째 원 호출 → 1건 허용
+    spent += [policy._spend(), policy._spend()]
+    for _ in range(10):
+        policy.note_call()           # 20건 → 누적 2건까지
+    spent += [policy._spend(), policy._spend()]
+
+    assert spent == [False, True, False, True, False]
+    stats = policy.stats()
+    assert stats["hedged"] == 2
+    assert stats["skipped_budget"] == 3
+    assert stats["hedge_ratio"] == pytest.approx(0.1)
+
+
+def test_out_of_budget_waits_for_primary_only():
+    policy = _policy(budget=0.0)
+    release_primary = threading.Event()
+    call = _FakeCall((release_primary, "slow"))
+    threading.Timer(DELAY * 3, release_primary.set).start()
+
+    result, winner = policy.run(call, delay=DELAY, acquire=lambda: pytest.fail("hedge acquired"),
+                                on_abandon=_Abandoned())
+
+    assert (result, winner) == ("slow", PRIMARY)
+    assert call.calls == 1
+    assert policy.stats()["skipped_budget"] == 1
+
+
+def test_rate_limit_refusal_refunds_budget():
+    policy = _policy(budget=1.0, calls=1)
+    release_primary = threading.Event()
+    call = _FakeCall((release_primary, "slow"))
+    threading.Timer(DELAY * 3, release_primary.set).start()
+
+    result, winner = policy.run(call, delay=DELAY, acquire=lambda: False, on_abandon=_Abandoned())
+
+    assert (result, winner) == ("slow", PRIMARY)
+    stats = policy.stats()
+    assert stats["hedged"] == 0
+    assert stats["skipped_rate_limit"] == 1
+    assert policy._spend() is True  # 거절된 중복 요청은 예산을 쓰지 않음
+
+
+def test_failed_primary_falls_back_to_hedge_result():
+    policy = _policy()
+    fail_primary = threading.Event()
+    call = _FakeCall((fail_primary, RuntimeError("primary failed")), (fail_primary, "hedge"))
+
+    threading.Timer(DELAY * 3, fail_primary.set).start()
+    result, winner = policy.run(call, delay=DELAY, acquire=lambda: True, on_abandon=_Abandoned())
+
+    assert (result, winner) == ("hedge", HEDGE)
+
+
+def test_both_failing_raises_first_error_and_abandons_other():
+    policy = _policy()
+    release = threading.Event()
+    call = _FakeCall((release, RuntimeError("first")), (release, RuntimeError("second")))
+    abandoned = _Abandoned()
+    threading.Timer(DELAY * 3, release.set).start()
+
+    with pytest.raises(RuntimeError):
+        policy.run(call, delay=DELAY, acquire=lambda: True, on_abandon=abandoned)
+
+    assert abandoned.done.wait(WAIT)
+    assert len(abandoned.kinds) == 1
+
+
+def test_delay_uses_agent_latency_percentile(monkeypatch):
+    policy = HedgePolicy(enabled=True, agents=frozenset({"content"}), percentile=95, budget=0.1,
+                         min_delay_ms=1000)
+    samples = {"content": 2500.0}
+    monkeypatch.setattr(hedging_mod.llm_metrics, "latency_percentile", lambda agent, p: samples.get(agent))
+
+    assert policy.delay("content") == pytest.approx(2.5)
+    samples["content"] = 300.0
+    assert policy.delay("content") == pytest.approx(1.0)  # 최소 대기 보장
+    assert policy.delay("title") is None                  # 지연 표본 없음 → 중복 요청 안 함
+
+
+def test_applies_to_configured_agents_unless_overridden():
+    policy = HedgePolicy(enabled=True, agents=frozenset({"content"}))
+
+    assert policy.applies("content")
+    assert not policy.applies("title")
+    assert policy.applies("title", hedge=True)
+    assert not policy.applies("content", hedge=False)
+    assert not HedgePolicy(enabled=False).applies("content")
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+job_queue 점유/만료/실패 처리 테스트 (PostgreSQL 없이 SQLite로 실행)
+- job_queue의 SQL을 그대로 실행하되 PostgreSQL 전용 구문만 SQLite 구문으로 바꿈
+  (now()는 가짜 시계, make_interval → 초 더하기, ANY(:kinds) → json_each, CAST AS JSONB 제거)
+- SQLite에는 행 잠금이 없으므로 SKIP LOCKED는 구문 포함 여부와 순차 점유 결과로만 확인
+"""
+
+import os
+import re
+import json
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+# app.config.Settings 필수값 (.env 없이 실행할 때만 자리값 — 이 테스트는 실제 DB에 접속하지 않음)
+for _name in ("AIRTABLE_API_KEY", "AIRTABLE_BASE_ID", "DB_USER", "DB_PASSWORD", "DB_HOST", "DB_NAME",
+              "NAVER_ADVISOR_COOKIE", "BLOG_AIRTABLE_API_KEY", "BLOG_AIRTABLE_BASE_ID"):
+    os.environ.setdefault(_name, "test")
+os.environ.setdefault("DB_PORT", "5432")
+
+pytest.importorskip("dotenv")
+pytest.importorskip("pydantic_settings")
+sqlalchemy = pytest.importorskip("sqlalchemy")
+pytest.importorskip("pyairtable")  # job_queue → postgres_airtable_service → airtable_service
+
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from app.services import job_queue  # noqa: E402
+
+T0 = datetime(2026, 1, 1, 9, 0, 0)
+_TS_FMT = "%Y-%m-%d %H:%M:%S.%f"
+
+_DDL = """
+CREATE TABLE job_queue (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 3,
+    run_at TIMESTAMPTZ NOT NULL,
+    locked_by TEXT,
+    locked_until TIMESTAMPTZ,
+    result TEXT,
+    last_error TEXT,
+    created_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ,
+    dedupe_key TEXT
+)
+"""
+_DEDUPE_INDEX = """
+CREATE UNIQUE INDEX job_queue_dedupe_active_idx ON job_queue (kind, dedupe_key)
+WHERE dedupe_key IS NOT NULL AND status IN ('queued', 'running')
+"""
+
+
+def _take_call(sql: str, start: int):
+    """sql[start]의 '('부터 짝이 맞는 ')'까지 — (괄호 안 문자열, 닫는 괄호 다음 위치)"""
+    depth = 0
+    for i in range(start, len(sql)):
+        if sql[i] == "(":
+            depth += 1
+        elif sql[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return sql[start + 1:i], i + 1
+    raise ValueError(f"unbalanced parentheses: {sql}")
+
+
+def _to_sqlite(sql: str) -> str:
+    # now() + make_interval(secs => EXPR) → ts_add(now(), EXPR)
+    marker = "now() + make_interval("
+    while marker in sql:
+        start = sql.index(marker)
+        inner, end = _take_call(sql, start + len("now() + make_interval"))
+        sql = sql[:start] + f"ts_add(now(), {inner.split('=>', 1)[1].strip()})" + sql[end:]
+    sql = re.sub(r"CAST\((\?) AS JSONB\)", r"\1", sql)
+    sql = re.sub(r"= ANY\((\?)\)", r"IN (SELECT value FROM json_each(\1))", sql)
+    sql = sql.replace("FOR UPDATE SKIP LOCKED", "")
+    sql = sql.replace("UPDATE job_queue j", "UPDATE job_queue AS j").replace("RETURNING j.*", "RETURNING *")
+    return sql
+
+
+class _Clock:
+    def __init__(self):
+        self.now = T0
+
+    def advance(self, seconds: float) -> None:
+        self.now += timedelta(seconds=seconds)
+
+
+@pytest.fixture
+def clock():
+    return _Clock()
+
+
+@pytest.fixture
+def queue(monkeypatch, clock):
+    """SQLite 엔진을 끼운 job_queue 모듈 + 실행된 원본 SQL 목록"""
+    sqlite3.register_converter("TIMESTAMPTZ", lambda b: datetime.strptime(b.decode(), _TS_FMT))
+    engine = sqlalchemy.create_engine(
+        "sqlite://",
+        poolclass=StaticPool,
+        connect_args={"detect_types": sqlite3.PARSE_DECLTYPES, "check_same_thread": False},
+    )
+    executed = []
+
+    @event.listens_for(engine, "connect")
+    def _register_functions(dbapi_conn, _):
+        dbapi_conn.create_function("now", 0, lambda: clock.now.strftime(_TS_FMT))
+        dbapi_conn.create_function(
+            "ts_add", 2,
+            lambda ts, secs: (datetime.strptime(ts, _TS_FMT) + timedelta(seconds=secs)).strftime(_TS_FMT),
+        )
+
+    @event.listens_for(engine, "before_cursor_execute", retval=True)
+    def _rewrite(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+        params = tuple(json.dumps(p) if isinstance(p, list) else p for p in parameters)
+        return _to_sqlite(statement), params
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql(_DDL)
+        conn.exec_driver_sql(_DEDUPE_INDEX)
+
+    monkeypatch.setattr(job_queue, "engine", engine)
+    monkeypatch.setattr(job_queue, "_schema_ready", True)
+    monkeypatch.setattr(job_queue.settings, "JOB_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(job_queue.settings, "JOB_VISIBILITY_TIMEOUT_SEC", 60)
+    monkeypatch.setattr(job_queue.settings, "JOB_RETRY_BASE_DELAY_SEC", 10)
+    monkeypatch.setattr(job_queue, "executed_sql", executed, raising=False)
+    yield job_queue
+    engine.dispose()
+
+
+def _add(queue, kind=job_queue.JOB_MEDICONTENT_GENERATE, max_attempts=None):
+    return queue.enqueue_job(kind, {"postId": "p1"}, max_attempts=max_attempts)
+
+
+def test_claim_leases_job_and_bumps_attempts(queue, clock):
+    job_id = _add(queue)
+
+    job = queue.claim_job("w1", [queue.JOB_MEDICONTENT_GENERATE])
+
+    assert job["id"] == job_id
+    assert job["status"] == queue.JOB_STATUS_RUNNING
+    assert job["attempts"] == 1
+    assert job["locked_by"] == "w1"
+    assert datetime.fromisoformat(job["locked_until"]) == T0 + timedelta(seconds=60)
+    claim_sql = next(s for s in queue.executed_sql if "WITH next_job" in s)
+    assert "FOR UPDATE SKIP LOCKED" in claim_sql
+
+
+def test_claim_skips_leased_jobs_and_other_kinds(queue):
+    first = _add(queue)
+    second = _add(queue)
+    _add(queue, kind=queue.JOB_AIRTABLE_SYNC_THREAD)
+
+    a = queue.claim_job("w1", [queue.JOB_MEDICONTENT_GENERATE])
+    b = queue.claim_job("w2", [queue.JOB_MEDICONTENT_GENERATE])
+
+    assert {a["id"], b["id"]} == {first, second}
+    assert queue.claim_job("w3", [queue.JOB_MEDICONTENT_GENERATE]) is None
+
+
+def test_claim_waits_for_run_at(queue, clock):
+    queue.enqueue_job(queue.JOB_MEDICONTENT_GENERATE, {}, delay_sec=30)
+
+    assert queue.claim_job("w1", [queue.JOB_MEDICONTENT_GENERATE]) is None
+    clock.advance(30)
+    assert queue.claim_job("w1", [queue.JOB_MEDICONTENT_GENERATE]) is not None
+
+
+def test_expired_lease_is_reclaimed_by_another_worker(queue, clock):
+    job_id = _add(queue)
+    queue.claim_job("w1", [queue.JOB_MEDICONTENT_GENERATE])
+
+    clock.advance(59)
+    assert queue.claim_job("w2", [queue.JOB_MEDICONTENT_GENERATE]) is None
+    clock.advance(2)
+    job = queue.claim_job("w2", [queue.JOB_MEDICONTENT_GENERATE])
+
+    assert job["id"] == job_id
+    assert job["locked_by"] == "w2"
+    assert job["attempts"] == 2
+    # 점유권을 잃은 워커의 완료·heartbeat는 반영되지 않음
+    assert queue.heartbeat_job(job_id, "w1") is False
+    queue.complete_job(job_id, "w1", {"ok": True})
+    assert queue.get_job(job_id)["status"] == queue.JOB_STATUS_RUNNING
+
+
+def test_heartbeat_extends_lease(queue, clock):
+    job_id = _add(queue)
+    queue.claim_job("w1", [queue.JOB_MEDICONTENT_GENERATE])
+
+    clock.advance(50)
+    assert queue.heartbeat_job(job_id, "w1") is True
+    clock.advance(50)  # 최초 점유 기준으로는 만료, heartbeat 기준으로는 유효
+
+    assert queue.claim_job("w2", [queue.JOB_MEDICONTENT_GENERATE]) is None
+    assert datetime.fromisoformat(queue.get_job(job_id)["locked_until"]) == T0 + timedelta(seconds=110)
+
+
+def test_expired_lease_past_max_attempts_fails(queue, clock):
+    job_id = _add(queue, max_attempts=1)
+    queue.claim_job("w1", [queue.JOB_MEDICONTENT_GENERATE])
+
+    clock.advance(61)
+    assert queue.claim_job("w2", [queue.JOB_MEDICONTENT_GENERATE]) is None
+
+    job = queue.get_job(job_id)
+    assert job["status"] == queue.JOB_STATUS_FAILED
+    assert job["last_error"] == "visibility timeout exceeded"
+    assert job["locked_by"] is None
+
+
+def test_fail_job_requeues_with_exponential_backoff(queue, clock):
+    job_id = _add(queue, max_attempts=3)
+
+    for attempt, delay in ((1, 10), (2, 20)):
+        queue.claim_job("w1", [queue.JOB_MEDICONTENT_GENERATE])
+        queue.fail_job(job_id, "w1", f"boom {attempt}")
+
+        job = queue.get_job(job_id)
+        assert job["status"] == queue.JOB_STATUS_QUEUED
+        assert job["attempts"] == attempt
+        assert job["locked_by"] is None
+        assert job["last_error"] == f"boom {attempt}"
+        assert datetime.fromisoformat(job["run_at"]) == clock.now + timedelta(seconds=delay)
+        assert queue.claim_job("w1", [queue.JOB_MEDICONTENT_GENERATE]) is None
+        clock.advance(delay)
+
+
+def test_fail_job_at_max_attempts_is_terminal(queue, clock):
+    job_id = _add(queue, max_attempts=2)
+    for _ in range(2):
+        queue.claim_job("w1", [queue.JOB_MEDICONTENT_GENERATE])
+        queue.fail_job(job_id, "w1", "x" * 5000)
+        clock.advance(3600)
+
+    job = queue.get_job(job_id)
+    assert job["status"] == queue.JOB_STATUS_FAILED
+    assert job["attempts"] == 2
+    assert len(job["last_error"]) == 4000
+    assert queue.claim_job("w1", [queue.JOB_MEDICONTENT_GENERATE]) is None
+
+
+def test_fail_job_from_stale_worker_is_ignored(queue, clock):
+    job_id = _add(queue)
+    queue.claim_job("w1", [queue.JOB_MEDICONTENT_GENERATE])
+    clock.advance(61)
+    queue.claim_job("w2", [queue.JOB_MEDICONTENT_GENERATE])
+
+    queue.fail_job(job_id, "w1", "late failure")
+
+    job = queue.get_job(job_id)
+    assert job["status"] == queue.JOB_STATUS_RUNNING
+    assert job["locked_by"] == "w2"
+    assert job["last_error"] is None
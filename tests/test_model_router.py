@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""model_router 테스트 — 작업별 티어, 요청 단위 덮어쓰기, 티어별 출력 한도(thinking 여유분)"""
+
+import os
+
+import pytest
+
+# app.config.Settings 필수값 (.env 없이 실행할 때만 자리값)
+for _name in ("AIRTABLE_API_KEY", "AIRTABLE_BASE_ID", "DB_USER", "DB_PASSWORD", "DB_HOST", "DB_NAME",
+              "NAVER_ADVISOR_COOKIE", "BLOG_AIRTABLE_API_KEY", "BLOG_AIRTABLE_BASE_ID"):
+    os.environ.setdefault(_name, "test")
+os.environ.setdefault("DB_PORT", "5432")
+
+pytest.importorskip("dotenv")
+pytest.importorskip("pydantic_settings")
+
+from app.agents import model_router  # noqa: E402
+from app.agents.model_router import LITE, STRONG  # noqa: E402
+
+
+def test_override_beats_routes():
+    assert model_router.tier_for("content.section") == STRONG
+    with model_router.override({"content.section": LITE}):
+        assert model_router.tier_for("content.section") == LITE
+        assert model_router.tier_for("plan.generate") == STRONG
+    with model_router.override({"*": LITE}):
+        assert model_router.tier_for("plan.generate") == LITE
+    with pytest.raises(ValueError):
+        model_router.validate_tiers({"content.section": "huge"})
+
+
+def test_output_limit_adds_thinking_headroom_per_tier(monkeypatch):
+    monkeypatch.setattr(model_router, "TIER_THINKING_TOKENS", {LITE: 0, STRONG: 8192})
+
+    assert model_router.output_limit(STRONG, 4096) == 4096 + 8192
+    assert model_router.output_limit(LITE, 4096) == 4096
+    assert model_router.output_limit(None, 4096) == 4096    # 모델 직접 지정
+    assert model_router.output_limit(STRONG, None) is None  # 모델 기본 한도
+
+
+def test_thinking_env_parsing():
+    assert model_router._parse_thinking("strong=16384, lite=1024") == {STRONG: 16384, LITE: 1024}
+    assert model_router._parse_thinking("strong=abc,huge=1,lite=-5") == {LITE: 0}
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""prompt_context 압축 테스트 — 빈 값/리스트 중복 제거, 알려진 중복 필드만 값 비교"""
+
+from app.agents import prompt_context
+
+
+def test_dedupe_drops_only_known_redundant_fields():
+    ctx = {"hospital_name": "하니 치과", "save_name": "하니  치과", "city": "세종", "district": "세종",
+           "question1_concept": "네", "question8_extra": "네"}
+
+    out = prompt_context.dedupe_values(ctx)
+
+    assert "save_name" not in out
+    assert out["district"] == "세종"
+    assert out["question8_extra"] == "네"
+
+
+def test_dedupe_keeps_save_name_that_differs_or_has_no_source():
+    assert prompt_context.dedupe_values({"hospital_name": "하니 치과", "save_name": "hani"}) == {
+        "hospital_name": "하니 치과", "save_name": "hani"}
+    assert prompt_context.dedupe_values({"save_name": "hani"}) == {"save_name": "hani"}
+
+
+def test_compact_selects_prunes_and_dedupes():
+    ctx = {"category": "충치치료", "tooth_numbers": ["16", "16", ""], "question2_condition": "  시린  증상 ",
+           "question4_treatment": "", "hospital_name": "A", "save_name": "A", "map_link": "http://x"}
+
+    out = prompt_context.compact(ctx, ["category", "tooth_numbers", "question2_condition",
+                                       "question4_treatment", "hospital_name", "save_name"])
+
+    assert out == {"category": "충치치료", "tooth_numbers": ["16"], "question2_condition": "시린 증상",
+                   "hospital_name": "A"}
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+rate_limiter 테스트 (가짜 시계 — time.monotonic/sleep을 교체해 실제 대기 없이 실행)
+- 토큰 버킷 예약/정산, 429 기반 AIMD 축소·회복, Retry-After 쿨다운, 마감 시간(timeout) 초과 시 포기
+"""
+
+import pytest
+
+from app.agents import rate_limiter as rl
+from app.agents.deadline import DeadlineExceeded
+
+
+class _FakeTime:
+    """monotonic()은 가짜 현재 시각, sleep()은 시각만 진행하고 대기 시간을 기록"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, sec: float) -> None:
+        self.slept.append(sec)
+        self.now += sec
+
+
+class _Throttled(Exception):
+    code = 429
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = _FakeTime()
+    monkeypatch.setattr(rl, "time", fake)
+    return fake
+
+
+def test_bucket_reserve_returns_wait_for_deficit(clock):
+    bucket = rl.TokenBucket(per_minute=60)  # 초당 1, 용량 60
+
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(3) == pytest.approx(3.0)  # 잔량 -3 → 3초 뒤 0
+    clock.now += 3
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+
+def test_bucket_refill_is_capped_and_oversized_requests_clip(clock):
+    bucket = rl.TokenBucket(per_minute=60)
+    bucket.reserve(30)
+
+    clock.now += 3600
+    assert bucket.available(61)  # 용량보다 큰 요청은 용량으로 잘림 (가득 차면 통과)
+    assert bucket.tokens == 60.0  # 조회 시점에 채워지되 용량을 넘지 않음
+    assert bucket.reserve(10_000) == 0.0
+    assert bucket.tokens == 0.0
+
+
+def test_bucket_adjust_settles_actual_usage(clock):
+    bucket = rl.TokenBucket(per_minute=600)  # 초당 10
+
+    bucket.reserve(500)       # 예상 500
+    bucket.adjust(200 - 500)  # 실제 200 → 300 환급
+    assert bucket.tokens == pytest.approx(400)
+    bucket.adjust(900 - 400)  # 예상 400, 실제 900 → 500 추가 차감
+    assert bucket.tokens == pytest.approx(-100)
+    assert bucket.reserve(1) == pytest.approx(10.1)
+
+
+def test_disabled_bucket_never_waits(clock):
+    bucket = rl.TokenBucket(per_minute=0)
+
+    assert not bucket.enabled
+    assert bucket.reserve(1_000_000) == 0.0
+    assert bucket.available(1_000_000)
+
+
+def test_acquire_sleeps_for_rpm_deficit(clock):
+    lim = rl.ModelLimiter("m", rpm=2, tpm=0, max_concurrency=4)
+
+    for _ in range(2):
+        lim.acquire(est_tokens=10)
+        lim.release()
+    assert clock.slept == []
+    lim.acquire(est_tokens=10)  # 분당 2회 — 3번째는 30초 대기
+    assert clock.slept == [pytest.approx(30.0)]
+    assert lim.stats()["waited_sec"] == pytest.approx(30.0)
+
+
+def test_release_settles_token_reservation(clock):
+    lim = rl.ModelLimiter("m", rpm=0, tpm=6000, max_concurrency=4)  # 초당 100 토큰
+
+    lim.acquire(est_tokens=5000)
+    assert lim.tokens.tokens == pytest.approx(1000)
+    lim.release(est_tokens=5000, used_tokens=1200)
+    assert lim.tokens.tokens == pytest.approx(4800)
+    assert lim.stats()["in_flight"] == 0
+
+
+def test_throttle_halves_concurrency_down_to_one(clock):
+    lim = rl.ModelLimiter("m", rpm=0, tpm=0, max_concurrency=8)
+
+    limits = []
+    for _ in range(5):
+        lim.acquire(est_tokens=1)
+        lim.release(ok=False, throttled=True)
+        limits.append(lim.limit)
+
+    assert limits == [4.0, 2.0, 1.0, 1.0, 1.0]
+    assert lim.stats()["throttled"] == 5
+
+
+def test_success_recovers_additively_up_to_max(clock):
+    lim = rl.ModelLimiter("m", rpm=0, tpm=0, max_concurrency=4)
+    lim.acquire(est_tokens=1)
+    lim.release(ok=False, throttled=True)
+    lim.acquire(est_tokens=1)
+    lim.release(ok=False, throttled=True)
+    assert lim.limit == 1.0
+
+    lim.acquire(est_tokens=1)
+    lim.release(ok=True)
+    assert lim.limit == pytest.approx(2.0)   # 1 + 1/1
+    lim.acquire(est_tokens=1)
+    lim.release(ok=True)
+    assert lim.limit == pytest.approx(2.5)   # 2 + 1/2
+    for _ in range(20):
+        lim.acquire(est_tokens=1)
+        lim.release(ok=True)
+    assert lim.limit == 4.0
+
+
+def test_failure_that_is_not_throttle_keeps_limit(clock):
+    lim = rl.ModelLimiter("m", rpm=0, tpm=0, max_concurrency=4)
+    lim.acquire(est_tokens=1)
+    lim.release(ok=False, throttled=True)
+
+    lim.acquire(est_tokens=1)
+    lim.release(ok=False)
+    assert lim.limit == 2.0
+
+
+def test_concurrency_limit_blocks_new_slots(clock):
+    lim = rl.ModelLimiter("m", rpm=0, tpm=0, max_concurrency=2)
+    lim.acquire(est_tokens=1)
+    lim.acquire(est_tokens=1)
+
+    assert lim.try_acquire(est_tokens=1) is False
+    lim.release(ok=False, throttled=True)  # 한도 1, 진행 중 1
+    assert lim.try_acquire(est_tokens=1) is False
+    lim.release()
+    assert lim.try_acquire(est_tokens=1) is True
+
+
+def test_retry_after_cools_down_new_calls(clock):
+    lim = rl.ModelLimiter("m", rpm=0, tpm=0, max_concurrency=4)
+    lim.acquire(est_tokens=1)
+    lim.release(ok=False, throttled=True, retry_after=5)
+
+    assert lim.stats()["cooldown_sec"] == pytest.approx(5.0)
+    assert lim.try_acquire(est_tokens=1) is False
+    clock.now += 4.9
+    assert lim.try_acquire(est_tokens=1) is False
+    clock.now += 0.2
+    assert lim.try_acquire(est_tokens=1) is True
+
+
+def test_try_acquire_does_not_reserve_when_tokens_short(clock):
+    lim = rl.ModelLimiter("m", rpm=0, tpm=600, max_concurrency=4)
+    lim.acquire(est_tokens=550)
+
+    assert lim.try_acquire(est_tokens=100) is False
+    assert lim.tokens.tokens == pytest.approx(50)
+    assert lim.stats()["in_flight"] == 1  # 실패한 시도는 슬롯을 돌려줌
+
+
+def test_throttle_detection_and_retry_hint():
+    assert rl.is_throttle_error(_Throttled("quota"))
+    assert rl.is_throttle_error(RuntimeError("503 Service Unavailable"))
+    assert not rl.is_throttle_error(ValueError("bad request"))
+    assert rl.retry_after_hint(RuntimeError("429 ... retry_delay { seconds: 12 }")) == 12.0
+    assert rl.retry_after_hint(RuntimeError("Please retry in 3.5s")) == 3.5
+    assert rl.retry_after_hint(RuntimeError("429")) is None
+
+
+def test_per_model_overrides():
+    limiter = rl.RateLimiter(rpm=100, tpm=1000, max_concurrency=8,
+                             overrides={"gemini-2.5-pro": {"rpm": 5, "concurrency": 2}})
+
+    pro = limiter.for_model("models/gemini-2.5-pro")
+    flash = limiter.for_model("gemini-2.5-flash")
+
+    assert pro.stats()["rpm"] == 5 and pro.max_concurrency == 2 and pro.stats()["tpm"] == 1000
+    assert flash.stats()["rpm"] == 100 and flash.max_concurrency == 8
+    assert limiter.for_model("models/gemini-2.5-pro") is pro
+
+
+def test_acquire_gives_up_when_token_wait_exceeds_timeout(clock):
+    lim = rl.ModelLimiter("m", rpm=1, tpm=600, max_concurrency=4)
+    lim.acquire(est_tokens=100)
+    lim.release(est_tokens=100, used_tokens=100)
+
+    with pytest.raises(DeadlineExceeded):
+        lim.acquire(est_tokens=100, timeout=30)  # 분당 1회 — 60초 대기 필요
+
+    assert clock.slept == []
+    assert lim.stats()["in_flight"] == 0
+    assert lim.requests.tokens == pytest.approx(0)   # 예약 환원
+    assert lim.tokens.tokens == pytest.approx(500)
+    lim.acquire(est_tokens=100, timeout=61)
+    assert clock.slept == [pytest.approx(60.0)]
+
+
+def test_acquire_gives_up_when_cooldown_outlasts_timeout(clock):
+    lim = rl.ModelLimiter("m", rpm=0, tpm=0, max_concurrency=4)
+    lim.acquire(est_tokens=1)
+    lim.release(ok=False, throttled=True, retry_after=10)
+
+    with pytest.raises(DeadlineExceeded):
+        lim.acquire(est_tokens=1, timeout=5)
+    assert lim.stats()["in_flight"] == 0
+
+
+def test_acquire_gives_up_waiting_for_a_slot():
+    lim = rl.ModelLimiter("m", rpm=0, tpm=0, max_concurrency=1)  # 실제 시계 — 슬롯 대기는 Condition.wait
+    lim.acquire(est_tokens=1)
+
+    with pytest.raises(DeadlineExceeded):
+        lim.acquire(est_tokens=1, timeout=0.05)
+    assert lim.stats()["in_flight"] == 1
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+medicontent_service._generate_single_flight 테스트 (동일 요청 중복 실행 방지)
+- 실제 생성(_generate_content_complete)과 결과 테이블(get_recent_result/save_result)은 가짜 함수로 교체
+"""
+
+import os
+import asyncio
+
+import pytest
+
+# app.config.Settings / medicontent_service 필수값 (.env 없이 실행할 때만 자리값 — Airtable/DB에 접속하지 않음)
+for _name in ("AIRTABLE_API_KEY", "AIRTABLE_BASE_ID", "DB_USER", "DB_PASSWORD", "DB_HOST", "DB_NAME",
+              "NAVER_ADVISOR_COOKIE", "BLOG_AIRTABLE_API_KEY", "BLOG_AIRTABLE_BASE_ID",
+              "NEXT_PUBLIC_AIRTABLE_API_KEY", "NEXT_PUBLIC_AIRTABLE_BASE_ID"):
+    os.environ.setdefault(_name, "test")
+os.environ.setdefault("DB_PORT", "5432")
+
+pytest.importorskip("dotenv")
+pytest.importorskip("pydantic_settings")
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("pyairtable")
+
+from app.services import medicontent_service as svc  # noqa: E402
+
+
+class _Request:
+    def __init__(self, post_id="p1", body="본문", force=False):
+        self.postId = post_id
+        self.body = body
+        self.force = force
+        self.deadlineSec = None
+
+    def model_dump(self, exclude=()):
+        data = {"postId": self.postId, "body": self.body, "force": self.force, "deadlineSec": self.deadlineSec}
+        return {k: v for k, v in data.items() if k not in exclude}
+
+
+class _Span:
+    def __init__(self):
+        self.attrs = {}
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class _FakeGenerator:
+    """호출 횟수를 세고 release()까지 완료를 미루는 가짜 생성기"""
+
+    def __init__(self, error=None):
+        self.calls = 0
+        self.error = error
+        self.release = asyncio.Event()
+
+    async def __call__(self, request, job_id, hospital_info, reference):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return {"status": "success", "postId": request.postId, "run": self.calls}
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """가짜 결과 테이블 (idempotency key → result)"""
+    saved = {}
+    monkeypatch.setattr(svc, "get_recent_result", lambda key: saved.get(key))
+    monkeypatch.setattr(svc, "save_result", lambda key, post_id, result: saved.__setitem__(key, result))
+    monkeypatch.setattr(svc, "_inflight", {})
+    return saved
+
+
+def _flight(request, span=None):
+    return svc._generate_single_flight(request, None, None, None, span or _Span())
+
+
+def test_concurrent_duplicates_share_one_run(monkeypatch, store):
+    async def scenario():
+        gen = _FakeGenerator()
+        monkeypatch.setattr(svc, "_generate_content_complete", gen)
+        joiner_span = _Span()
+        first = asyncio.create_task(_flight(_Request()))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(_flight(_Request(), joiner_span))
+        third = asyncio.create_task(_flight(_Request(force=True)))  # force도 진행 중 실행에는 합류
+        await asyncio.sleep(0.01)
+        gen.release.set()
+        return gen, joiner_span, await asyncio.gather(first, second, third)
+
+    gen, joiner_span, (a, b, c) = asyncio.run(scenario())
+
+    assert gen.calls == 1
+    assert a == {"status": "success", "postId": "p1", "run": 1}
+    assert b == {**a, "dedup": "inflight"}
+    assert c == {**a, "dedup": "inflight"}
+    assert joiner_span.attrs["dedup"] == "inflight"
+    assert svc._inflight == {}
+    assert list(store.values()) == [a]
+
+
+def test_different_bodies_run_separately(monkeypatch, store):
+    async def scenario():
+        gen = _FakeGenerator()
+        gen.release.set()
+        monkeypatch.setattr(svc, "_generate_content_complete", gen)
+        return gen, await asyncio.gather(_flight(_Request(body="A")), _flight(_Request(body="B")))
+
+    gen, results = asyncio.run(scenario())
+
+    assert gen.calls == 2
+    assert all("dedup" not in r for r in results)
+
+
+def test_failure_propagates_to_joiners_and_clears_inflight(monkeypatch, store):
+    async def scenario():
+        gen = _FakeGenerator(error=RuntimeError("pipeline failed"))
+        monkeypatch.setattr(svc, "_generate_content_complete", gen)
+        first = asyncio.create_task(_flight(_Request()))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(_flight(_Request()))
+        await asyncio.sleep(0.01)
+        gen.release.set()
+        outcomes = await asyncio.gather(first, second, return_exceptions=True)
+        # 실패한 결과는 공유·저장되지 않으므로 다음 요청은 새로 실행
+        gen.error = None
+        retry = await _flight(_Request())
+        return gen, outcomes, retry
+
+    gen, outcomes, retry = asyncio.run(scenario())
+
+    assert [type(o) for o in outcomes] == [RuntimeError, RuntimeError]
+    assert gen.calls == 2
+    assert retry["run"] == 2
+    assert svc._inflight == {}
+
+
+def test_recent_result_is_reused_unless_forced(monkeypatch, store):
+    async def scenario():
+        gen = _FakeGenerator()
+        gen.release.set()
+        monkeypatch.setattr(svc, "_generate_content_complete", gen)
+        first = await _flight(_Request())
+        cached_span = _Span()
+        cached = await _flight(_Request(), cached_span)
+        forced = await _flight(_Request(force=True))
+        return gen, first, cached, cached_span, forced
+
+    gen, first, cached, cached_span, forced = asyncio.run(scenario())
+
+    assert cached == {**first, "dedup": "result"}
+    assert cached_span.attrs["dedup"] == "result"
+    assert forced["run"] == 2
+    assert gen.calls == 2
+
+
+def test_result_store_errors_do_not_block_generation(monkeypatch, store):
+    def broken(*args):
+        raise ConnectionError("Database connection not established.")
+
+    monkeypatch.setattr(svc, "get_recent_result", broken)
+    monkeypatch.setattr(svc, "save_result", broken)
+
+    async def scenario():
+        gen = _FakeGenerator()
+        gen.release.set()
+        monkeypatch.setattr(svc, "_generate_content_complete", gen)
+        return gen, await _flight(_Request())
+
+    gen, result = asyncio.run(scenario())
+
+    assert gen.calls == 1
+    assert result["status"] == "success"
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+TitleAgent 스모크 테스트 (LLM_BACKEND=replay — 네트워크/Gemini 키 불필요)
+- 모듈 import + 후보 생성 → 선택까지 1회 실행 (정의되지 않은 헬퍼/상수 참조 시 NameError로 실패)
+"""
+
+import os
+import json
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# 모듈 상수가 import 시점에 환경변수를 읽으므로 import 전에 설정
+os.environ["LLM_BACKEND"] = "replay"
+os.environ.setdefault("LLM_REPLAY_LATENCY_MS", "0")
+os.environ.setdefault("LLM_REPLAY_JITTER_MS", "0")
+os.environ.setdefault("LLM_REPLAY_MS_PER_TOKEN", "0")
+os.environ.setdefault("STAGE_CACHE_ENABLED", "false")
+# app.config.Settings 필수값 (.env 없이 실행할 때만 자리값 — 이 테스트는 Airtable/DB에 접속하지 않음)
+for _name in ("AIRTABLE_API_KEY", "AIRTABLE_BASE_ID", "DB_USER", "DB_PASSWORD", "DB_HOST", "DB_NAME",
+              "NAVER_ADVISOR_COOKIE", "BLOG_AIRTABLE_API_KEY", "BLOG_AIRTABLE_BASE_ID"):
+    os.environ.setdefault(_name, "test")
+os.environ.setdefault("DB_PORT", "5432")
+
+pytest.importorskip("dotenv")
+pytest.importorskip("pydantic_settings")
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("google.generativeai")
+pytest.importorskip("pydantic")
+
+
+def _sample_plan():
+    plans = sorted((ROOT / "test_logs").rglob("*_plan.json"))
+    if not plans:
+        pytest.skip("test_logs에 plan 녹화가 없습니다")
+    return json.loads(plans[-1].read_text(encoding="utf-8"))
+
+
+def test_title_agent_runs_on_replay_backend(monkeypatch):
+    monkeypatch.chdir(ROOT)  # 프롬프트/녹화 경로가 저장소 루트 기준 상대경로
+    from app.agents import title_agent
+    from app.agents.pipeline_context import PipelineContext
+
+    ctx = PipelineContext(mode="test", persist=False, force=True, plan=_sample_plan())
+    final = title_agent.run(ctx=ctx, N=3)
+
+    assert final["candidates"], "제목 후보가 비어 있음"
+    assert final["selected"].get("title")
+    assert ctx.title is final